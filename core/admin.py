@@ -22,7 +22,7 @@ class CaseAdmin(admin.ModelAdmin):
     list_display = ('name', 'other_id', 'project', 'status', 'tier', 'created_at', 'updated_at')
     list_filter = ('status', 'tier', 'project')
     search_fields = ('name', 'other_id', 'project__name')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('created_at', 'updated_at', 'accessions_count', 'comments_count')
     date_hierarchy = 'created_at'
     inlines = [AccessionInline, CommentInline]
 
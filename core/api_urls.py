@@ -7,7 +7,7 @@ from rest_framework_simplejwt.views import (
 
 from .api_views import (
     ProjectViewSet, CaseViewSet, ProjectLeadViewSet,
-    CommentViewSet, AccessionViewSet, UserViewSet
+    CommentViewSet, AccessionViewSet, JobViewSet, SearchViewSet, ChangeViewSet, UserViewSet
 )
 
 router = DefaultRouter()
@@ -16,9 +16,14 @@ router.register(r'cases', CaseViewSet, basename='case')
 router.register(r'project-leads', ProjectLeadViewSet, basename='projectlead')
 router.register(r'comments', CommentViewSet, basename='comment')
 router.register(r'accessions', AccessionViewSet, basename='accession')
+router.register(r'jobs', JobViewSet, basename='job')
+router.register(r'search', SearchViewSet, basename='search')
+router.register(r'changes', ChangeViewSet, basename='change')
 router.register(r'users', UserViewSet, basename='user')
 
 urlpatterns = [
+    # Cases of one project, paged and filtered like /api/cases/
+    path('projects/<int:project_pk>/cases/', CaseViewSet.as_view({'get': 'list'}), name='project-cases'),
     path('', include(router.urls)),
     path('auth/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
@@ -1,23 +1,55 @@
+from collections import Counter
+from datetime import datetime, time
+
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
+from django.db import IntegrityError
 from django.db.models import Count, Q
 from django.contrib.auth.models import User
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 
-from .models import Project, Case, Accession, Comment, ProjectLead
+from .changes import CHANGES_LIMIT, CHANGES_MAX_LIMIT, read_changes
+from .conditional import ConditionalListMixin, Validator, conditional_response
+from .fragments import get_case_list_version
+from .importers import upsert_cases
+from .models import Project, Case, Accession, Comment, Job, ProjectLead, TransitionRollup
+from .stats import annotate_cases_count, get_case_statistics
+from .pagination import KeysetPagination
+from .roles import get_user_roles
+from .search import SEARCH_LIMIT, SEARCH_MAX_LIMIT, parse_query, search_cases
+from .transitions import (
+    REPORT_GROUPS, TIMESERIES_GROUPS, count_buckets, get_period, get_stage_durations, get_throughput,
+    get_timeseries, get_transitions
+)
 from .serializers import (
-    ProjectSerializer, ProjectListSerializer, CaseSerializer, 
+    ProjectSerializer, ProjectListSerializer, CaseSerializer, CaseListSerializer,
     CommentSerializer, AccessionSerializer, ProjectLeadSerializer,
-    CaseCreateSerializer, CommentCreateSerializer, UserSerializer
+    CaseCreateSerializer, CaseBulkRecordSerializer, CommentCreateSerializer, JobSerializer, SearchHitSerializer, UserSerializer,
+    ChangeSerializer
 )
 
+# Records accepted by one POST /api/cases/bulk/
+CASE_BULK_MAX_RECORDS = getattr(settings, 'CASE_BULK_MAX_RECORDS', 10000)
+
+# Accession numbers accepted by one POST /api/accessions/resolve/
+ACCESSION_RESOLVE_MAX_NUMBERS = getattr(settings, 'ACCESSION_RESOLVE_MAX_NUMBERS', 10000)
+
+# Days or weeks in one series of GET /api/projects/statistics/timeseries/
+TIMESERIES_MAX_BUCKETS = getattr(settings, 'TIMESERIES_MAX_BUCKETS', 1000)
+
 
-class ProjectViewSet(viewsets.ModelViewSet):
+class ProjectViewSet(ConditionalListMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing projects
     """
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -25,7 +57,14 @@ class ProjectViewSet(viewsets.ModelViewSet):
         return ProjectSerializer
     
     def get_queryset(self):
-        queryset = Project.objects.annotate(cases_count=Count('cases')).select_related('project_lead', 'created_by')
+        queryset = self.get_filtered_queryset().select_related('project_lead', 'created_by')
+        if self.action == 'list':
+            # ProjectSerializer reads the counts itself
+            queryset = annotate_cases_count(queryset)
+        return queryset.order_by('-created_at', '-id')
+    
+    def get_filtered_queryset(self):
+        queryset = Project.objects.all()
         
         # Filter by project lead
         project_lead = self.request.query_params.get('project_lead', None)
@@ -37,7 +76,11 @@ class ProjectViewSet(viewsets.ModelViewSet):
         if name:
             queryset = queryset.filter(name__icontains=name)
         
-        return queryset.order_by('-created_at')
+        return queryset
+    
+    def get_list_validator(self):
+        # Case counts change with the version, not with the project rows
+        return Validator.for_queryset(self.request, self.get_filtered_queryset(), get_case_list_version())
     
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
@@ -45,39 +88,156 @@ class ProjectViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def statistics(self, request):
         """Get project statistics"""
+        validator = Validator.for_queryset(request, Project.objects.all(), get_case_list_version())
+        return conditional_response(request, validator, self.get_statistics)
+    
+    @action(detail=False, methods=['get'], url_path='statistics/stages')
+    def stage_statistics(self, request):
+        """
+        Time spent in each status and cases entering each status over a period:
+        ?since=&until= (dates or times), ?project=, ?project_lead=, ?by=project|lead
+        """
+        params = request.query_params
+        bounds = {}
+        for name in ('since', 'until'):
+            value = params.get(name)
+            if value:
+                bounds[name] = _parse_moment(value)
+                if bounds[name] is None:
+                    raise ValidationError({name: ['Give a date (YYYY-MM-DD) or a date and time.']})
+        group_by = self.get_report_group(REPORT_GROUPS)
+        transitions = get_transitions(projects=self.get_report_projects(), **bounds)
+        return Response({
+            'since': params.get('since'),
+            'until': params.get('until'),
+            'by': group_by,
+            'stages': get_stage_durations(transitions, group_by),
+            'throughput': get_throughput(transitions, group_by),
+        })
+    
+    @action(detail=False, methods=['get'], url_path='statistics/timeseries')
+    def timeseries(self, request):
+        """
+        Cases entering each status per day or week, from the transition rollup:
+        ?period=day|week, ?since=&until= (dates), ?status=received,completed, ?tier=,
+        ?project=, ?project_lead=, ?by=project|lead|tier
+        """
+        params = request.query_params
+        period = params.get('period') or TransitionRollup.PERIOD_WEEK
+        if period not in dict(TransitionRollup.PERIOD_CHOICES):
+            raise ValidationError({'period': ['Choose day or week.']})
+        bounds = {}
+        for name in ('since', 'until'):
+            value = params.get(name)
+            if value:
+                try:
+                    bounds[name] = parse_date(value)
+                except ValueError:
+                    bounds[name] = None
+                if bounds[name] is None:
+                    raise ValidationError({name: ['Give a date (YYYY-MM-DD).']})
+        since, until = get_period(**bounds)
+        if since > until:
+            raise ValidationError({'since': ['The period ends before it starts.']})
+        # Checked before any bucket is made or counted
+        if count_buckets(since, until, period) > TIMESERIES_MAX_BUCKETS:
+            raise ValidationError({'since': [f'At most {TIMESERIES_MAX_BUCKETS} {period}s per series.']})
+        statuses = [status for status in params.get('status', '').split(',') if status]
+        group_by = self.get_report_group(TIMESERIES_GROUPS)
+        
+        buckets, series = get_timeseries(
+            period, since, until, statuses=statuses, tier=params.get('tier'),
+            projects=self.get_report_projects(), group_by=group_by
+        )
+        return Response({
+            'period': period,
+            'by': group_by,
+            'buckets': buckets,
+            'series': series,
+        })
+    
+    def get_report_group(self, groups):
+        """The dimension a report is split by, from ?by=, or None."""
+        group_by = self.request.query_params.get('by') or None
+        if group_by is not None and group_by not in groups:
+            raise ValidationError({'by': [f"Choose one of: {', '.join(groups)}."]})
+        return group_by
+    
+    def get_report_projects(self):
+        """The projects of a report: those of the list filters and ?project=, or None for all."""
+        params = self.request.query_params
+        if not any(params.get(name) for name in ('project', 'project_lead', 'name')):
+            return None
+        projects = self.get_filtered_queryset()
+        if params.get('project'):
+            if not params['project'].isdigit():
+                raise ValidationError({'project': ['A valid integer is required.']})
+            projects = projects.filter(pk=params['project'])
+        return projects
+    
+    def get_statistics(self):
         total_projects = Project.objects.count()
-        total_cases = Case.objects.count()
         
         projects_by_lead = Project.objects.values('project_lead__name').annotate(
             count=Count('id')
         ).order_by('-count')
         
-        cases_by_status = Case.objects.values('status').annotate(
-            count=Count('id')
-        ).order_by('-count')
-        
-        cases_by_tier = Case.objects.values('tier').annotate(
-            count=Count('id')
-        ).order_by('-count')
+        # Case counts come from the statistics rollup
+        case_statistics = get_case_statistics()
         
         return Response({
             'total_projects': total_projects,
-            'total_cases': total_cases,
+            'total_cases': case_statistics['total_cases'],
             'projects_by_lead': projects_by_lead,
-            'cases_by_status': cases_by_status,
-            'cases_by_tier': cases_by_tier,
+            'cases_by_status': case_statistics['cases_by_status'],
+            'cases_by_tier': case_statistics['cases_by_tier'],
+            'cases_by_lead': case_statistics['cases_by_lead'],
         })
 
 
-class CaseViewSet(viewsets.ModelViewSet):
+def _parse_moment(value):
+    """A datetime from a date (midnight, in the current time zone) or a date and time, or None."""
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            moment = day and datetime.combine(day, time.min)
+    except ValueError:
+        return None
+    if moment is not None and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class CaseViewSet(ConditionalListMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing cases
     """
     permission_classes = [IsAuthenticated]
     serializer_class = CaseSerializer
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
-        project_id = self.request.query_params.get('project', None)
+        queryset = self.get_filtered_queryset()
+        if self.action == 'list':
+            # Only the relations the client asked for
+            fields, include = self.get_list_fields()
+            prefetch = [CaseListSerializer.expandable_fields[name][1] for name in include]
+            return queryset.prefetch_related(*prefetch).order_by('-created_at', '-id')
+        return queryset.select_related('project').prefetch_related('comments__user', 'accessions').order_by('-created_at', '-id')
+    
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # /api/projects/{id}/cases/
+        if 'project_pk' in kwargs and not Project.objects.filter(pk=kwargs['project_pk']).exists():
+            raise NotFound('Project not found.')
+    
+    def get_project_id(self):
+        """Project of the nested route, or of ?project=."""
+        return self.kwargs.get('project_pk') or self.request.query_params.get('project', None)
+    
+    def get_filtered_queryset(self):
+        project_id = self.get_project_id()
         if project_id:
             queryset = Case.objects.filter(project_id=project_id)
         else:
@@ -98,18 +258,104 @@ class CaseViewSet(viewsets.ModelViewSet):
         if name:
             queryset = queryset.filter(name__icontains=name)
         
-        return queryset.select_related('project').prefetch_related('comments__user', 'accessions').order_by('-created_at')
+        return queryset
+    
+    def get_list_validator(self):
+        project_id = self.get_project_id()
+        # One project's list only changes with that project's version,
+        # which includes the names version
+        version = get_case_list_version(project_id or None)
+        return Validator.for_queryset(self.request, self.get_filtered_queryset(), version)
+    
+    def get_list_fields(self):
+        """
+        Fields named by ``?fields=`` (None for all) and relations named by
+        ``?include=``, both comma-separated.
+        """
+        params = {}
+        for param, allowed in (
+            ('fields', CaseListSerializer.Meta.fields),
+            ('include', CaseListSerializer.expandable_fields),
+        ):
+            value = self.request.query_params.get(param)
+            if value is None:
+                continue
+            names = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+            unknown = [name for name in names if name not in allowed]
+            if unknown:
+                raise ValidationError({param: [f"Unknown: {', '.join(unknown)}. Choose from: {', '.join(allowed)}."]})
+            params[param] = names
+        return params.get('fields'), params.get('include', [])
     
     def get_serializer_class(self):
         if self.action == 'create':
             return CaseCreateSerializer
+        if self.action == 'list':
+            return CaseListSerializer
         return CaseSerializer
     
+    def get_serializer(self, *args, **kwargs):
+        if self.action == 'list':
+            kwargs['fields'], kwargs['include'] = self.get_list_fields()
+        return super().get_serializer(*args, **kwargs)
+    
     def perform_create(self, serializer):
         project_id = self.request.data.get('project_id')
         project = Project.objects.get(id=project_id)
+        if Case.objects.filter(project=project, name=serializer.validated_data['name']).exists():
+            raise ValidationError({'name': ['A case with this name already exists in this project.']})
         serializer.save(project=project)
     
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Create or update many cases at once, matched on (project, name)"""
+        records = request.data
+        if not isinstance(records, list):
+            return Response({'error': 'Expected a JSON list of case records'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(records) > CASE_BULK_MAX_RECORDS:
+            return Response(
+                {'error': f'At most {CASE_BULK_MAX_RECORDS} records per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        results = [None] * len(records)
+        valid = []
+        # One serializer for all records: building its fields costs ten times the validation
+        serializer = CaseBulkRecordSerializer()
+        for index, record in enumerate(records):
+            try:
+                valid.append((index, serializer.run_validation(record)))
+            except ValidationError as error:
+                results[index] = {'index': index, 'status': 'error', 'errors': error.detail}
+        
+        project_ids = set(Project.objects.filter(
+            pk__in={data['project_id'] for index, data in valid}
+        ).values_list('pk', flat=True))
+        for index, data in valid:
+            if data['project_id'] not in project_ids:
+                results[index] = {'index': index, 'status': 'error', 'errors': {'project': ['Project not found.']}}
+        valid = [(index, data) for index, data in valid if data['project_id'] in project_ids]
+        
+        try:
+            outcomes = upsert_cases([data for index, data in valid])
+        except IntegrityError:
+            # Another request created one of the cases in the meantime
+            return Response(
+                {'error': 'Cases were written concurrently; send the records again'},
+                status=status.HTTP_409_CONFLICT
+            )
+        for (index, data), (outcome, case) in zip(valid, outcomes):
+            results[index] = {'index': index, 'status': outcome, 'id': case.pk}
+        
+        counts = Counter(result['status'] for result in results)
+        return Response({
+            'created': counts['created'],
+            'updated': counts['updated'],
+            'unchanged': counts['unchanged'],
+            'errors': counts['error'],
+            'results': results,
+        })
+    
     @action(detail=True, methods=['post'])
     def add_comment(self, request, pk=None):
         """Add a comment to a case"""
@@ -129,10 +375,15 @@ class CaseViewSet(viewsets.ModelViewSet):
         accession_number = request.data.get('accession_number')
         
         if accession_number:
-            accession = Accession.objects.create(
-                case=case,
-                accession_number=accession_number
-            )
+            try:
+                accession = Accession.objects.create(
+                    case=case,
+                    accession_number=accession_number
+                )
+            except IntegrityError:
+                return Response(
+                    {'error': 'The case already has this accession number'}, status=status.HTTP_400_BAD_REQUEST
+                )
             serializer = AccessionSerializer(accession)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         
@@ -151,7 +402,7 @@ class ProjectLeadViewSet(viewsets.ModelViewSet):
     def projects(self, request, pk=None):
         """Get projects for a specific project lead"""
         project_lead = self.get_object()
-        projects = project_lead.projects.annotate(cases_count=Count('cases'))
+        projects = annotate_cases_count(project_lead.projects.all())
         serializer = ProjectListSerializer(projects, many=True)
         return Response(serializer.data)
 
@@ -162,12 +413,13 @@ class CommentViewSet(viewsets.ModelViewSet):
     """
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         case_id = self.request.query_params.get('case', None)
         if case_id:
-            return Comment.objects.filter(case_id=case_id).select_related('user').order_by('-created_at')
-        return Comment.objects.all().select_related('user').order_by('-created_at')
+            return Comment.objects.filter(case_id=case_id).select_related('user').order_by('-created_at', '-id')
+        return Comment.objects.all().select_related('user').order_by('-created_at', '-id')
 
 
 class AccessionViewSet(viewsets.ModelViewSet):
@@ -176,12 +428,129 @@ class AccessionViewSet(viewsets.ModelViewSet):
     """
     serializer_class = AccessionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    # Accessions have no creation date; ids grow with insertion order
+    keyset_ordering = ('-id',)
     
     def get_queryset(self):
+        accessions = Accession.objects.all().order_by('-id')
         case_id = self.request.query_params.get('case', None)
         if case_id:
-            return Accession.objects.filter(case_id=case_id)
-        return Accession.objects.all()
+            accessions = accessions.filter(case_id=case_id)
+        accession_number = self.request.query_params.get('accession_number', None)
+        if accession_number:
+            accessions = accessions.filter(accession_number=accession_number)
+        return accessions
+    
+    @action(detail=False, methods=['post'])
+    def resolve(self, request):
+        """
+        Find the case of each accession number of a JSON list, in one query.
+        Each result lists the cases having the number: one if it is 'found',
+        none if 'unknown', several if 'duplicated'.
+        """
+        numbers = request.data
+        if not isinstance(numbers, list):
+            return Response({'error': 'Expected a JSON list of accession numbers'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(numbers) > ACCESSION_RESOLVE_MAX_NUMBERS:
+            return Response(
+                {'error': f'At most {ACCESSION_RESOLVE_MAX_NUMBERS} accession numbers per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Scanners may add spaces or a line break around the number
+        numbers = [number.strip() if isinstance(number, str) else None for number in numbers]
+        cases_by_number = {number: [] for number in numbers if number}
+        rows = Accession.objects.filter(accession_number__in=cases_by_number).values_list(
+            'accession_number', 'case_id', 'case__name', 'case__status', 'case__tier',
+            'case__project_id', 'case__project__name'
+        ).order_by('case_id')
+        for number, case_id, name, case_status, tier, project_id, project_name in rows:
+            cases_by_number[number].append({
+                'id': case_id, 'name': name, 'status': case_status, 'tier': tier,
+                'project': project_id, 'project_name': project_name,
+            })
+        
+        results = []
+        for index, number in enumerate(numbers):
+            if not number:
+                results.append({'index': index, 'status': 'error', 'error': 'Expected a non-empty string'})
+                continue
+            cases = cases_by_number[number]
+            outcome = 'found' if len(cases) == 1 else 'duplicated' if cases else 'unknown'
+            results.append({'index': index, 'accession_number': number, 'status': outcome, 'cases': cases})
+        
+        counts = Counter(result['status'] for result in results)
+        scans = Counter(number for number in numbers if number)
+        return Response({
+            'found': counts['found'],
+            'unknown': counts['unknown'],
+            'duplicated': counts['duplicated'],
+            'errors': counts['error'],
+            # Numbers sent more than once, such as a tube scanned twice
+            'repeated': [number for number, total in scans.items() if total > 1],
+            'results': results,
+        })
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for following background jobs: the user's own, or all for an admin
+    """
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    
+    def get_queryset(self):
+        jobs = Job.objects.defer('input_text', 'params').order_by('-created_at', '-id')
+        if self.request.user.is_superuser:
+            return jobs
+        return jobs.filter(created_by=self.request.user)
+
+
+class SearchViewSet(viewsets.ViewSet):
+    """
+    Full-text search over case names, other IDs, accessions and comments:
+    GET /api/search/?q=<words>&limit=<n>, best hits first
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def list(self, request):
+        query = request.query_params.get('q', '')
+        if not parse_query(query):
+            raise ValidationError({'q': ['Give at least one word to search for.']})
+        try:
+            limit = min(max(int(request.query_params.get('limit', SEARCH_LIMIT)), 1), SEARCH_MAX_LIMIT)
+        except ValueError:
+            raise ValidationError({'limit': ['A valid integer is required.']})
+        
+        hits = search_cases(query, limit)
+        return Response({'query': query, 'results': SearchHitSerializer(hits, many=True).data})
+
+
+class ChangeViewSet(viewsets.ViewSet):
+    """
+    Changes of projects, cases, accessions and comments after a cursor:
+    GET /api/changes/?since=<seq>&limit=<n>, oldest first, deletions included
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def list(self, request):
+        params = {}
+        for name, default, minimum in (('since', 0, 0), ('limit', CHANGES_LIMIT, 1)):
+            try:
+                params[name] = max(int(request.query_params.get(name, default)), minimum)
+            except ValueError:
+                raise ValidationError({name: ['A valid integer is required.']})
+        
+        changes, last_seq, has_more = read_changes(params['since'], min(params['limit'], CHANGES_MAX_LIMIT))
+        return Response({
+            'since': params['since'],
+            'last_seq': last_seq,
+            'has_more': has_more,
+            'next': replace_query_param(request.build_absolute_uri(), 'since', last_seq) if has_more else None,
+            'results': ChangeSerializer(changes, many=True).data,
+        })
 
 
 class UserViewSet(viewsets.ReadOnlyModelViewSet):
@@ -199,12 +568,13 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
         user_data = serializer.data
         
         # Add user groups information
-        user_data['groups'] = [group.name for group in request.user.groups.all()]
+        roles = get_user_roles(request.user)
+        user_data['groups'] = roles.groups
         user_data['permissions'] = {
-            'can_edit': request.user.groups.filter(name='editor').exists() or request.user.is_superuser,
-            'is_admin': request.user.is_superuser,
-            'is_viewer': request.user.groups.filter(name='viewer').exists(),
-            'is_editor': request.user.groups.filter(name='editor').exists(),
+            'can_edit': roles.can_edit,
+            'is_admin': roles.is_admin,
+            'is_viewer': roles.is_viewer,
+            'is_editor': roles.is_editor,
         }
         
         return Response(user_data) 
\ No newline at end of file
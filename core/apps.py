@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # Register the role cache invalidation receivers
+        from . import roles  # noqa: F401
+        # Register the SQLite connection setup
+        from . import sqlite  # noqa: F401
+        # Register the check of the SQLite triggers
+        from . import triggers  # noqa: F401
@@ -0,0 +1,56 @@
+"""
+Incremental change feed of projects, cases, accessions and comments.
+
+Every insert, update and delete of these four tables writes a ``Change`` row
+with a new ``seq``, from database triggers (migration ``0026_change_feed``),
+so bulk statements, queryset updates and the deletions cascading from a
+project or case are recorded like the writes of the ORM. The log keeps only
+the last change of each row: a row changed ten times since a client last
+read is sent once, and a deleted row leaves a tombstone. On PostgreSQL the
+changes of a transaction get their seq when it commits
+(``0030_change_feed_commit_order``).
+
+A client reads ``GET /api/changes/?since=<seq>`` until ``has_more`` is false
+and keeps ``last_seq`` for its next read. Since the log holds a change for
+every row, reading from 0 is also the first copy of a new mirror. Each read
+costs an index range scan of the changes after its cursor and one query per
+kind of row changed, however large the tables are.
+"""
+from django.conf import settings
+
+from .models import Accession, Case, Change, Comment, Project
+
+# Changes returned by default and at most by one read
+CHANGES_LIMIT = 500
+CHANGES_MAX_LIMIT = getattr(settings, 'CHANGES_MAX_LIMIT', 5000)
+
+_MODELS = {
+    Change.KIND_PROJECT: Project,
+    Change.KIND_CASE: Case,
+    Change.KIND_ACCESSION: Accession,
+    Change.KIND_COMMENT: Comment,
+}
+
+
+def read_changes(since=0, limit=CHANGES_LIMIT):
+    """
+    ``(changes, last_seq, has_more)``: the changes after seq ``since``,
+    oldest first, the seq to read from next, and whether more follow. Each
+    change gets its current row as ``instance``, None for a deletion.
+    """
+    changes = list(Change.objects.filter(seq__gt=since).order_by('seq')[:limit + 1])
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    last_seq = changes[-1].seq if changes else since
+
+    ids = {}
+    for change in changes:
+        if not change.deleted:
+            ids.setdefault(change.kind, []).append(change.object_id)
+    instances = {kind: _MODELS[kind].objects.in_bulk(kind_ids) for kind, kind_ids in ids.items()}
+
+    for change in changes:
+        change.instance = None if change.deleted else instances[change.kind].get(change.object_id)
+    # A row deleted since its change was read has a tombstone further on
+    changes = [change for change in changes if change.deleted or change.instance is not None]
+    return changes, last_seq, has_more
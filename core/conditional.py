@@ -0,0 +1,67 @@
+"""
+Conditional GET for the REST API lists polled by the dashboard.
+
+A list or statistics response gets a validator before anything is
+serialized: the newest ``updated_at`` and the row count of the filtered
+queryset, read in one aggregate query, plus the case list version of
+``core.fragments``. The version is bumped by every write that a row's
+``updated_at`` does not show, such as counter changes, nested comments,
+deletions, and lead or user renames. The ETag hashes the validator and the
+query string, and Last-Modified is the later of ``updated_at`` and the
+version time. A client that sends either one back in ``If-None-Match`` or
+``If-Modified-Since`` gets 304 Not Modified without a body.
+"""
+import hashlib
+import math
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+class Validator:
+    """ETag and Last-Modified of one response."""
+
+    def __init__(self, request, version, last_updated=None, count=None):
+        source = f'{request.get_full_path()}|{version}|{last_updated and last_updated.isoformat()}|{count}'
+        # Weak: the same data may be rendered as JSON or as the browsable API
+        self.etag = 'W/' + quote_etag(hashlib.md5(source.encode()).hexdigest())
+        # Versions are nanosecond times; rounded up to whole seconds like HTTP dates
+        timestamps = [math.ceil(version / 1e9)]
+        if last_updated is not None:
+            timestamps.append(math.ceil(last_updated.timestamp()))
+        self.last_modified = max(timestamps)
+
+    @classmethod
+    def for_queryset(cls, request, queryset, version):
+        """Validator of a filtered queryset, read in one aggregate query."""
+        aggregate = queryset.order_by().aggregate(last_updated=Max('updated_at'), count=Count('pk'))
+        return cls(request, version, **aggregate)
+
+
+def conditional_response(request, validator, get_response):
+    """
+    304 Not Modified if the client copy is still current, else the response
+    of ``get_response()``; both carry the validator headers.
+    """
+    response = get_conditional_response(request, etag=validator.etag, last_modified=validator.last_modified)
+    if response is None:
+        response = get_response()
+    if response.status_code in (200, 304):
+        response['ETag'] = validator.etag
+        response['Last-Modified'] = http_date(validator.last_modified)
+        # Clients may keep the response but must ask again before using it
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+class ConditionalListMixin:
+    """
+    Answer ``list`` requests conditionally. Views implement
+    ``get_list_validator()``, usually with ``Validator.for_queryset()`` on
+    the filtered queryset without its joins and annotations.
+    """
+
+    def list(self, request, *args, **kwargs):
+        validator = self.get_list_validator()
+        return conditional_response(request, validator, lambda: super(ConditionalListMixin, self).list(request, *args, **kwargs))
@@ -0,0 +1,11 @@
+from django.utils.functional import SimpleLazyObject
+
+from .roles import get_user_roles
+
+
+def user_roles(request):
+    """
+    Expose the roles of the current user to templates as ``user_roles``
+    (``user_roles.can_edit``, ``user_roles.role``...), resolved on first use.
+    """
+    return {'user_roles': SimpleLazyObject(lambda: get_user_roles(request.user))}
@@ -0,0 +1,96 @@
+"""
+Streaming CSV export of cases.
+
+Rows are read with ``values_list(...).iterator()`` and written out as they
+are produced, so memory use does not grow with the number of cases and the
+first bytes reach the client before the query is exhausted.
+"""
+import csv
+import zipfile
+
+from django.utils.text import get_valid_filename
+
+from .models import Case
+
+# Rows fetched from the database per round trip
+EXPORT_CHUNK_SIZE = 2000
+
+# Column contract shared with the CSV import (see core/importers.py)
+EXPORT_HEADERS = ['CaseID', 'Other_ID', 'Status', 'DNAT', 'DNAN', 'RNA', 'Tier']
+
+EXPORT_FIELDS = ['name', 'other_id', 'status', 'dna_t_coverage', 'dna_n_coverage', 'rna_coverage', 'tier']
+
+
+class Echo:
+    """File-like object whose write() returns the value instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def iter_case_rows(project, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the header row, then one row per case of the project."""
+    yield EXPORT_HEADERS
+
+    rows = Case.objects.filter(project=project).values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+    for name, other_id, status, dna_t, dna_n, rna, tier in rows:
+        yield [name, other_id or '', status, dna_t or '', dna_n or '', rna or '', tier]
+
+
+def stream_project_csv(project, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the CSV export of a project line by line."""
+    writer = csv.writer(Echo())
+    for row in iter_case_rows(project, chunk_size):
+        yield writer.writerow(row)
+
+
+def get_project_csv_name(project):
+    """File name of a project export inside a zip archive."""
+    return get_valid_filename(f'cases_{project.id}_{project.name}.csv')
+
+
+class _ZipStream:
+    """Write-only, unseekable file object buffering what zipfile writes."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        """Return and forget everything written since the last call."""
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_projects_zip(projects, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield a zip archive holding one CSV export per project."""
+    stream = _ZipStream()
+    writer = csv.writer(Echo())
+
+    with zipfile.ZipFile(stream, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for project in projects:
+            with archive.open(get_project_csv_name(project), mode='w') as entry:
+                for row_num, row in enumerate(iter_case_rows(project, chunk_size), start=1):
+                    entry.write(writer.writerow(row).encode('utf-8'))
+
+                    if row_num % chunk_size == 0:
+                        data = stream.pop()
+                        if data:
+                            yield data
+
+            yield stream.pop()
+
+    # Central directory, written when the archive is closed
+    yield stream.pop()
@@ -6,6 +6,7 @@ import string
 import random
 
 from .models import Project, Case, Comment, Accession, ProjectLead
+from .roles import get_user_roles
 
 class ProjectLeadForm(forms.ModelForm):
     """Form for creating and updating project leads."""
@@ -62,6 +63,17 @@ class CaseForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         # Make tier field read-only - it will be calculated automatically
         self.fields['tier'].disabled = True
+    
+    def clean_name(self):
+        """Case names are unique within a project (pass the project on the instance)."""
+        name = self.cleaned_data['name']
+        project_id = self.instance.project_id
+        if project_id and Case.objects.filter(project_id=project_id, name=name).exclude(pk=self.instance.pk).exists():
+            raise forms.ValidationError(_('A case with this name already exists in this project.'))
+        return name
+
+# Largest number of cases a single batch may create
+BATCH_CASE_MAX_SIZE = 10000
 
 class BatchCaseForm(forms.Form):
     """Form for creating multiple cases in a batch."""
@@ -120,6 +132,11 @@ class BatchCaseForm(forms.Form):
             # Check that at least 2 cases will be created
             if (max_case_number - min_case_number + 1) < 2:
                 raise forms.ValidationError(_("You must create at least 2 cases in a batch."))
+            
+            if (max_case_number - min_case_number + 1) > BATCH_CASE_MAX_SIZE:
+                raise forms.ValidationError(
+                    _("A batch can create at most %(max)d cases.") % {'max': BATCH_CASE_MAX_SIZE}
+                )
         
         return cleaned_data
 
@@ -156,6 +173,16 @@ class AccessionForm(forms.ModelForm):
         labels = {
             'accession_number': '',
         }
+    
+    def clean_accession_number(self):
+        """A case has each accession number once (the formset sets the case on the instance)."""
+        accession_number = self.cleaned_data['accession_number']
+        case_id = self.instance.case_id
+        if case_id and Accession.objects.filter(
+            case_id=case_id, accession_number=accession_number
+        ).exclude(pk=self.instance.pk).exists():
+            raise forms.ValidationError(_('This case already has this accession number.'))
+        return accession_number
 
 # Create a formset for handling multiple accessions for a case
 AccessionFormSet = inlineformset_factory(
@@ -406,13 +433,8 @@ class UserUpdateForm(forms.ModelForm):
         self.fields['last_name'].required = True
         
         # Set initial role based on user's current role
-        if self.instance:
-            if self.instance.is_superuser:
-                self.fields['role'].initial = 'admin'
-            elif self.instance.groups.filter(name='editor').exists():
-                self.fields['role'].initial = 'editor'
-            elif self.instance.groups.filter(name='viewer').exists():
-                self.fields['role'].initial = 'viewer'
+        if self.instance.pk:
+            self.fields['role'].initial = get_user_roles(self.instance).role
     
     def clean(self):
         cleaned_data = super().clean()
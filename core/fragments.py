@@ -0,0 +1,70 @@
+"""
+Cache versions of the rendered case lists.
+
+The case list of ``project_detail`` is cached as a template fragment under
+the project's case list version, and every case card inside it under
+``(case id, updated_at, counters)``. Each project has its version in the
+shared cache. Every write that changes what the list shows calls
+``invalidate_case_lists()`` for its projects. The next view then renders the
+list again, reusing the cached cards of the cases that did not change.
+
+The version of all projects together, bumped by every invalidation, is part
+of the ETag of the API lists and statistics (``core.conditional``). Lead and
+user renames change no project in particular: they bump a names version,
+which every project's version includes. Versions are ``time.time_ns()``
+values, so they also tell when the data last changed.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+# Seconds a rendered case list or case card stays in the cache
+CASE_FRAGMENT_TIMEOUT = 24 * 60 * 60
+
+
+# Version of the lead and user names nested in every project's list
+_NAMES_VERSION_KEY = 'case-list-version:names'
+
+
+def _version_key(project_id):
+    return f'case-list-version:{"all" if project_id is None else project_id}'
+
+
+def get_case_list_version(project_id=None):
+    """
+    Current case list version of a project, or of all projects if
+    ``project_id`` is None. A project's version is the later of its own and
+    the names version.
+    """
+    version = cache.get_or_set(_version_key(project_id), time.time_ns, timeout=None)
+    if project_id is None:
+        return version
+    return max(version, cache.get_or_set(_NAMES_VERSION_KEY, time.time_ns, timeout=None))
+
+
+def invalidate_case_lists(project_ids=()):
+    """
+    Give the projects, and all projects together, a new case list version,
+    now and once the transaction commits. Without ``project_ids`` only the
+    version of all projects changes.
+    """
+    keys = {_version_key(project_id) for project_id in project_ids if project_id is not None}
+    keys.add(_version_key(None))
+    _bump_versions(keys)
+
+
+def invalidate_names():
+    """A lead or user name changed: give every project a new case list version."""
+    _bump_versions({_version_key(None), _NAMES_VERSION_KEY})
+
+
+def _bump_versions(keys):
+    def bump():
+        version = time.time_ns()
+        cache.set_many({key: version for key in keys}, timeout=None)
+
+    bump()
+    # A list rendered by another request from the rows before the commit
+    # was stored under the version set above; it must not be reused
+    transaction.on_commit(bump)
@@ -0,0 +1,337 @@
+"""
+Set-based import engine for cases.
+
+Rows are validated in memory, then matched against the cases already
+stored for the project (loaded with a single query) and written with
+chunked ``bulk_create`` and ``executemany`` UPDATE calls, all inside one
+transaction.
+"""
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .fragments import invalidate_case_lists
+from .models import Case, Comment, increment_case_counters, record_case_stats
+from .sqlite import retry_on_lock
+from .tiers import assign_tiers
+
+# Rows sent to the database per bulk statement
+IMPORT_BATCH_SIZE = 500
+
+# Headers expected in an import file (see static/csv/template_csv.csv)
+REQUIRED_HEADERS = ['CaseID', 'Other_ID', 'Status', 'DNAT', 'DNAN', 'RNA']
+OPTIONAL_HEADERS = ['source_other_comments']
+
+# Fields rewritten on existing cases by an import
+CASE_UPDATE_FIELDS = [
+    'other_id', 'status', 'dna_t_coverage', 'dna_n_coverage', 'rna_coverage',
+    'tier', 'updated_at',
+]
+
+# Fields a bulk upsert may set; the others follow from them
+CASE_UPSERT_FIELDS = ['other_id', 'status', 'dna_t_coverage', 'dna_n_coverage', 'rna_coverage']
+
+
+def get_status_mapping():
+    """
+    Map CSV status values to model status values.
+    Accept both lowercase (from export) and display values (legacy).
+    """
+    status_mapping = {}
+    for status_value, status_display in Case.STATUS_CHOICES:
+        status_mapping[status_display] = status_value  # Accept display values (e.g., "Completed")
+        status_mapping[status_value] = status_value    # Accept storage values (e.g., "completed")
+    return status_mapping
+
+
+class CaseImportResult:
+    """Counts and per-row errors of a case import."""
+
+    def __init__(self):
+        self.created_count = 0
+        self.updated_count = 0
+        self.error_rows = []
+
+
+def import_cases(project, rows, user, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Create or update the cases of a project from CSV rows.
+
+    ``rows`` is an iterable of dicts keyed by the CSV headers, as produced
+    by ``csv.DictReader``. Invalid rows are skipped and reported in
+    ``error_rows``; a case listed several times is created once and then
+    updated, the last row winning. Nothing is written if the import fails.
+    """
+    result = CaseImportResult()
+    status_mapping = get_status_mapping()
+
+    # Rows are checked before the transaction, which then reads the cases
+    entries = []
+
+    for row_num, row in enumerate(rows, start=2):  # Start at 2 to account for header row
+        case_id = row['CaseID'].strip()
+
+        # Skip empty rows
+        if not case_id:
+            continue
+
+        # Get Other_ID (optional field)
+        other_id = row['Other_ID'].strip() if row['Other_ID'].strip() else None
+
+        # Get source_other_comments (optional field)
+        source_comment = row.get('source_other_comments', '').strip() if 'source_other_comments' in row else None
+
+        status = row['Status'].strip()
+        if status not in status_mapping:
+            result.error_rows.append(f"Row {row_num}: Invalid status '{status}'")
+            continue
+
+        # Parse coverage values
+        try:
+            dna_t = float(row['DNAT']) if row['DNAT'].strip() else None
+            dna_n = float(row['DNAN']) if row['DNAN'].strip() else None
+            rna = float(row['RNA']) if row['RNA'].strip() else None
+        except ValueError:
+            result.error_rows.append(f"Row {row_num}: Invalid numeric values")
+            continue
+
+        fields = {
+            'other_id': other_id,
+            'status': status_mapping[status],
+            'dna_t_coverage': dna_t,
+            'dna_n_coverage': dna_n,
+            'rna_coverage': rna,
+        }
+        entries.append((case_id, fields, source_comment))
+
+    try:
+        result.created_count, result.updated_count = _save_import(project, user, entries, batch_size)
+    except IntegrityError:
+        # A case of the same name was created since the cases were read,
+        # which READ COMMITTED allows on PostgreSQL: read them again
+        result.created_count, result.updated_count = _save_import(project, user, entries, batch_size)
+
+    return result
+
+
+@retry_on_lock
+def _save_import(project, user, entries, batch_size):
+    """
+    Write the cases and comments of an import in one transaction, from the
+    cases of the project as that transaction reads them, so the statistics
+    deltas match the rows it replaces. Returns ``(created, updated)``.
+    """
+    with transaction.atomic():
+        # All existing cases of the project, keyed by name (one query)
+        cases_by_name = {case.name: case for case in project.cases.all()}
+
+        cases_to_create = {}
+        cases_to_update = {}
+        pending_comments = []
+        created_count = updated_count = 0
+
+        for case_id, fields, source_comment in entries:
+            case = cases_by_name.get(case_id)
+            if case is None:
+                case = Case(project=project, name=case_id)
+                cases_by_name[case_id] = case
+                cases_to_create[case_id] = case
+                created_count += 1
+            else:
+                if case_id not in cases_to_create:
+                    cases_to_update[case_id] = case
+                updated_count += 1
+
+            for field, value in fields.items():
+                setattr(case, field, value)
+
+            # Add comment if source_other_comments is provided
+            if source_comment:
+                pending_comments.append((case, source_comment))
+
+        new_cases = list(cases_to_create.values())
+        changed_cases = list(cases_to_update.values())
+
+        # Bulk writes bypass Case.save(), so tiers are set here in one pass
+        assign_tiers(new_cases + changed_cases)
+
+        # Bulk writes do not apply auto_now
+        now = timezone.now()
+        for case in changed_cases:
+            case.updated_at = now
+
+        # Status and tier transitions for the statistics rollup
+        stats_deltas = Counter(case.get_stats_key() for case in new_cases + changed_cases)
+        stats_deltas.subtract(case.get_loaded_stats_key() for case in changed_cases)
+
+        Case.objects.bulk_create(new_cases, batch_size=batch_size)
+        bulk_update_cases(changed_cases, CASE_UPDATE_FIELDS, batch_size=batch_size)
+        record_case_stats(stats_deltas)
+        invalidate_case_lists([project.pk])
+
+        if pending_comments:
+            _fill_missing_pks(project.pk, new_cases)
+            Comment.objects.bulk_create(
+                [Comment(case=case, text=text, user=user) for case, text in pending_comments],
+                batch_size=batch_size
+            )
+            increment_case_counters('comments_count', Counter(case.pk for case, text in pending_comments))
+
+    return created_count, updated_count
+
+
+@retry_on_lock
+def create_cases(project, cases, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Create unsaved cases of a project, skipping names already taken.
+
+    Existing names are found with chunked ``name__in`` queries, tiers are
+    computed in one pass and the new cases are written with ``bulk_create``
+    in a single transaction. Returns ``(created_cases, skipped_names)``.
+    """
+    names = [case.name for case in cases]
+    with transaction.atomic():
+        existing = set()
+        for start in range(0, len(names), batch_size):
+            existing.update(
+                project.cases.filter(name__in=names[start:start + batch_size]).values_list('name', flat=True)
+            )
+
+        new_cases = []
+        skipped_names = []
+        for case in cases:
+            if case.name in existing:
+                skipped_names.append(case.name)
+                continue
+            case.project = project
+            existing.add(case.name)
+            new_cases.append(case)
+
+        # Bulk writes bypass Case.save(), so tiers are set here in one pass
+        assign_tiers(new_cases)
+        Case.objects.bulk_create(new_cases, batch_size=batch_size)
+        record_case_stats(Counter(case.get_stats_key() for case in new_cases))
+        if new_cases:
+            invalidate_case_lists([project.pk])
+
+    return new_cases, skipped_names
+
+
+@retry_on_lock
+def upsert_cases(records, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Create or update cases of any projects, matched on ``(project_id, name)``.
+
+    ``records`` are dicts with ``project_id``, ``name`` and any of
+    ``CASE_UPSERT_FIELDS``; fields left out keep their stored value, or the
+    model default for a new case. Existing cases are loaded with chunked
+    ``name__in`` queries, tiers are computed in one pass and only the cases
+    that changed are written, with chunked bulk statements in a single
+    transaction. Returns one ``(outcome, case)`` per record, the outcome
+    being 'created', 'updated' or 'unchanged'; a case listed several times
+    is created once and then updated, the last record winning.
+    """
+    with transaction.atomic():
+        names_by_project = defaultdict(set)
+        for record in records:
+            names_by_project[record['project_id']].add(record['name'])
+
+        cases_by_key = {}
+        for project_id, names in names_by_project.items():
+            names = sorted(names)
+            for start in range(0, len(names), batch_size):
+                for case in Case.objects.filter(project_id=project_id, name__in=names[start:start + batch_size]):
+                    cases_by_key[(project_id, case.name)] = case
+
+        cases_to_create = {}
+        cases_to_update = {}
+        outcomes = []
+        for record in records:
+            key = (record['project_id'], record['name'])
+            case = cases_by_key.get(key)
+            created = case is None
+            if created:
+                case = Case(project_id=key[0], name=key[1])
+                cases_by_key[key] = case
+                cases_to_create[key] = case
+
+            changed = False
+            for field in CASE_UPSERT_FIELDS:
+                if field in record and getattr(case, field) != record[field]:
+                    setattr(case, field, record[field])
+                    changed = True
+
+            if created:
+                outcomes.append(('created', case))
+            elif changed:
+                if key not in cases_to_create:
+                    cases_to_update[key] = case
+                outcomes.append(('updated', case))
+            else:
+                outcomes.append(('unchanged', case))
+
+        new_cases = list(cases_to_create.values())
+        changed_cases = list(cases_to_update.values())
+
+        # Bulk writes bypass Case.save(), so tiers are set here in one pass
+        assign_tiers(new_cases + changed_cases)
+
+        # Bulk writes do not apply auto_now
+        now = timezone.now()
+        for case in changed_cases:
+            case.updated_at = now
+
+        stats_deltas = Counter(case.get_stats_key() for case in new_cases + changed_cases)
+        stats_deltas.subtract(case.get_loaded_stats_key() for case in changed_cases)
+
+        Case.objects.bulk_create(new_cases, batch_size=batch_size)
+        bulk_update_cases(changed_cases, CASE_UPDATE_FIELDS, batch_size=batch_size)
+        record_case_stats(stats_deltas)
+        if new_cases or changed_cases:
+            invalidate_case_lists({case.project_id for case in new_cases + changed_cases})
+
+        for project_id in {case.project_id for case in new_cases}:
+            _fill_missing_pks(project_id, [case for case in new_cases if case.project_id == project_id])
+
+    return outcomes
+
+
+def bulk_update_cases(cases, fields, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Write ``fields`` of existing cases in chunks of one ``executemany`` UPDATE.
+
+    Same effect as ``Case.objects.bulk_update`` without building a
+    ``CASE WHEN`` expression per row and field, which made updates about
+    fifteen times slower than inserts. Like ``bulk_update``, it skips
+    ``save()`` and signals.
+    """
+    if not cases:
+        return
+
+    meta = Case._meta
+    model_fields = [meta.get_field(name) for name in fields]
+    quote_name = connection.ops.quote_name
+    sql = 'UPDATE {} SET {} WHERE {} = %s'.format(
+        quote_name(meta.db_table),
+        ', '.join(f'{quote_name(field.column)} = %s' for field in model_fields),
+        quote_name(meta.pk.column),
+    )
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(cases), batch_size):
+            cursor.executemany(sql, [
+                [field.get_db_prep_save(getattr(case, field.attname), connection) for field in model_fields] + [case.pk]
+                for case in cases[start:start + batch_size]
+            ])
+
+
+def _fill_missing_pks(project_id, cases):
+    """Set primary keys on bulk-created cases of a project for backends that do not return them."""
+    missing = [case for case in cases if case.pk is None]
+    if not missing:
+        return
+
+    ids_by_name = dict(Case.objects.filter(project_id=project_id).values_list('name', 'id'))
+    for case in missing:
+        case.pk = ids_by_name[case.name]
@@ -0,0 +1,179 @@
+"""
+Per-request SQL instrumentation and query budgets.
+
+``SQLInstrumentationMiddleware`` counts the statements every request sends to
+the database, with their total time, the statements repeated with the same
+shape (usually an N+1 loop) and the slowest one. The figures are returned in
+a ``Server-Timing`` header, visible in the browser developer tools, and
+written as one JSON line to the ``core.sql`` logger (``logs/sql.log``).
+
+Views declare the most queries they may need with ``@query_budget(n)``.
+A request over budget is logged as a warning, or fails with
+``QueryBudgetExceeded`` when ``QUERY_BUDGET_STRICT`` is set, as the tests do.
+"""
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('core.sql')
+
+# Repeated statements and SQL characters kept in a log line
+LOGGED_DUPLICATES = 5
+LOGGED_SQL_LENGTH = 500
+
+_IN_LIST = re.compile(r'\bIN \((?:%s|\?)(?:, ?(?:%s|\?))*\)', re.IGNORECASE)
+_NUMBER = re.compile(r'\b\d+\b')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A view ran more queries than its ``@query_budget``."""
+
+
+def query_budget(max_queries):
+    """
+    Declare the most queries a view may run, whatever the amount of data:
+
+        @query_budget(8)
+        @login_required
+        def project_detail(request, project_id):
+            ...
+
+    Place it above the other decorators so the middleware sees it.
+    """
+    def decorator(view_func):
+        view_func.query_budget = max_queries
+        return view_func
+    return decorator
+
+
+def get_query_budget(view_func):
+    """Budget of a view function or of the API view class behind it, if any."""
+    budget = getattr(view_func, 'query_budget', None)
+    if budget is None:
+        view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        budget = getattr(view_class, 'query_budget', None)
+    return budget
+
+
+def fingerprint(sql):
+    """The shape of a statement: IN lists and inlined numbers collapsed."""
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _NUMBER.sub('?', sql)
+
+
+class QueryStats:
+    """Database execute wrapper collecting the statements of one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        self.slowest_sql = None
+        self.slowest_duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.count += 1
+            self.duration += duration
+            self.fingerprints[fingerprint(sql)] += 1
+            if self.slowest_sql is None or duration > self.slowest_duration:
+                self.slowest_sql = sql
+                self.slowest_duration = duration
+
+    def record(self):
+        """Enter the wrapper on every database connection; returns the context manager."""
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+        return stack
+
+    @property
+    def duplicates(self):
+        """Statements run more than once, most repeated first, as ``(sql, count)``."""
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count > 1]
+
+    def server_timing(self, total_duration):
+        """Value of the ``Server-Timing`` header."""
+        metrics = [
+            f'sql;dur={self.duration * 1000:.1f};desc="{self.count} queries"',
+            f'sql-slowest;dur={self.slowest_duration * 1000:.1f}',
+        ]
+        duplicated = sum(count - 1 for sql, count in self.duplicates)
+        if duplicated:
+            metrics.append(f'sql-duplicates;desc="{duplicated} repeated"')
+        metrics.append(f'app;dur={total_duration * 1000:.1f}')
+        return ', '.join(metrics)
+
+
+class SQLInstrumentationMiddleware:
+    """Record the SQL of every request and check it against the view's query budget."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        request.query_budget = None
+        started = time.perf_counter()
+
+        with stats.record():
+            response = self.get_response(request)
+
+        if response.streaming:
+            # Rows of an export are read while the response is sent, so the
+            # log line and the budget check wait for the end of the stream
+            response['Server-Timing'] = stats.server_timing(time.perf_counter() - started)
+            content = response.streaming_content
+            response.streaming_content = self._stream(request, response, content, stats, started)
+        else:
+            duration = time.perf_counter() - started
+            response['Server-Timing'] = stats.server_timing(duration)
+            self._finish(request, response, stats, duration)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_query_budget(view_func)
+
+    def _stream(self, request, response, content, stats, started):
+        with stats.record():
+            yield from content
+        self._finish(request, response, stats, time.perf_counter() - started)
+
+    def _finish(self, request, response, stats, duration):
+        budget = request.query_budget
+        over_budget = budget is not None and stats.count > budget
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 1),
+            'queries': stats.count,
+            'sql_ms': round(stats.duration * 1000, 1),
+            'budget': budget,
+            'over_budget': over_budget,
+            'duplicates': [
+                {'sql': sql[:LOGGED_SQL_LENGTH], 'count': count}
+                for sql, count in stats.duplicates[:LOGGED_DUPLICATES]
+            ],
+            'slowest': {
+                'sql': (stats.slowest_sql or '')[:LOGGED_SQL_LENGTH],
+                'ms': round(stats.slowest_duration * 1000, 1),
+            },
+        }
+        logger.log(logging.WARNING if over_budget else logging.INFO, json.dumps(record))
+
+        if over_budget and getattr(settings, 'QUERY_BUDGET_STRICT', False):
+            raise QueryBudgetExceeded(
+                f'{request.method} {request.path} ran {stats.count} queries, budget is {budget}'
+            )
@@ -0,0 +1,227 @@
+"""
+Background jobs without a broker.
+
+Views record the work in a ``Job`` row with ``enqueue()`` and return at once.
+``manage.py run_jobs`` claims queued jobs in creation order and runs each
+one in a pool of worker processes. A job is claimed with a conditional
+UPDATE from 'queued' to 'running', so a job never runs twice, on SQLite as on
+PostgreSQL. Jobs of different projects run in parallel.
+
+Handlers are registered with ``@job_handler(kind)``. They receive the job
+and a ``progress(done, total)`` callback, and return a JSON-serializable
+result. An exception marks the job failed with its message.
+
+Batch user jobs generate the passwords of the users they create, so no
+password is stored before its user exists. The credentials of the created
+users stay in the job's params until its creator downloads them, once, or
+for BATCH_USER_CREDENTIALS_EXPIRY seconds after the job ended.
+"""
+import csv
+import io
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from .importers import create_cases, import_cases
+from .models import Case, Job
+from .roles import assign_user_role
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two progress writes of a running job
+PROGRESS_INTERVAL = 0.5
+
+# Seconds the credentials of a batch user job wait to be downloaded
+BATCH_USER_CREDENTIALS_EXPIRY = getattr(settings, 'BATCH_USER_CREDENTIALS_EXPIRY', 60 * 60)
+
+_handlers = {}
+
+
+def job_handler(kind):
+    """Register the decorated function as the handler of ``kind`` jobs."""
+    def register(func):
+        _handlers[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind, user, project=None, params=None, input_text=''):
+    """Queue a job for ``manage.py run_jobs`` and return it."""
+    if kind not in _handlers:
+        raise ValueError(f'Unknown job kind: {kind}')
+    return Job.objects.create(
+        kind=kind, created_by=user, project=project, params=params or {}, input_text=input_text
+    )
+
+
+def claim_next_job():
+    """
+    Mark the oldest queued job running and return its id, or None if none
+    can start. Jobs of a project run one at a time, as two imports of the
+    same cases would collide.
+    """
+    busy_projects = Job.objects.filter(status=Job.STATUS_RUNNING, project__isnull=False).values('project_id')
+    queued = Job.objects.filter(status=Job.STATUS_QUEUED).exclude(project_id__in=busy_projects).order_by('created_at', 'id')
+    for job_id in queued.values_list('pk', flat=True)[:10]:
+        # Another runner may have claimed it since it was read
+        if Job.objects.filter(pk=job_id, status=Job.STATUS_QUEUED).update(
+            status=Job.STATUS_RUNNING, started_at=timezone.now()
+        ):
+            return job_id
+    return None
+
+
+def fail_job(job_id, error):
+    """Mark a job failed with an error message."""
+    Job.objects.filter(pk=job_id).update(status=Job.STATUS_FAILED, error=error, finished_at=timezone.now())
+
+
+def fail_interrupted_jobs():
+    """Fail the jobs a stopped runner left running; returns how many there were."""
+    return Job.objects.filter(status=Job.STATUS_RUNNING).update(
+        status=Job.STATUS_FAILED, error='Interrupted: the job runner stopped', finished_at=timezone.now()
+    )
+
+
+def pop_credentials(job_id):
+    """
+    Remove the credentials from a batch user job and return them as
+    ``[[username, password], ...]``, or None once they were taken or expired.
+    """
+    with transaction.atomic():
+        job = Job.objects.select_for_update().filter(pk=job_id, kind='batch_user_create').first()
+        if job is None or 'credentials' not in job.params:
+            return None
+        credentials = job.params.pop('credentials')
+        job.save(update_fields=['params'])
+    return credentials
+
+
+def forget_expired_credentials():
+    """Remove the credentials not downloaded BATCH_USER_CREDENTIALS_EXPIRY seconds after their job ended."""
+    expired = timezone.now() - timedelta(seconds=BATCH_USER_CREDENTIALS_EXPIRY)
+    jobs = Job.objects.filter(kind='batch_user_create', finished_at__lt=expired, params__has_key='credentials')
+    count = 0
+    for job_id in jobs.values_list('pk', flat=True):
+        count += pop_credentials(job_id) is not None
+    return count
+
+
+class JobProgress:
+    """Progress callback of a running job, writing at most every PROGRESS_INTERVAL seconds."""
+
+    def __init__(self, job):
+        self.job_id = job.pk
+        self.last_write = 0
+
+    def __call__(self, done, total=None):
+        now = time.monotonic()
+        if now - self.last_write < PROGRESS_INTERVAL and done != total:
+            return
+        self.last_write = now
+        fields = {'progress_done': done}
+        if total is not None:
+            fields['progress_total'] = total
+        Job.objects.filter(pk=self.job_id).update(**fields)
+
+
+def run_job(job_id):
+    """Run a claimed job and record its result or error. Runs in a worker process."""
+    job = Job.objects.select_related('project', 'created_by').get(pk=job_id)
+    started = time.perf_counter()
+    try:
+        result = _handlers[job.kind](job, JobProgress(job))
+    except Exception as error:
+        logger.exception('%s failed', job)
+        fail_job(job.pk, str(error) or type(error).__name__)
+        return Job.STATUS_FAILED
+
+    Job.objects.filter(pk=job.pk).update(status=Job.STATUS_SUCCEEDED, result=result, finished_at=timezone.now())
+    logger.info('%s succeeded in %.1fs', job, time.perf_counter() - started)
+    return Job.STATUS_SUCCEEDED
+
+
+# Handlers
+
+@job_handler('csv_case_import')
+def run_csv_case_import(job, progress):
+    """Import the uploaded CSV text into the job's project."""
+    rows = list(csv.DictReader(io.StringIO(job.input_text)))
+    progress(0, len(rows))
+
+    def reported(rows):
+        for count, row in enumerate(rows, start=1):
+            if count % 1000 == 0:
+                progress(count, len(rows))
+            yield row
+
+    result = import_cases(job.project, reported(rows), job.created_by)
+    progress(len(rows), len(rows))
+    return {'created': result.created_count, 'updated': result.updated_count, 'errors': result.error_rows}
+
+
+@job_handler('batch_case_create')
+def run_batch_case_create(job, progress):
+    """Create the cases ``{batch_name}-{number}`` of the number range, skipping taken names."""
+    params = job.params
+    numbers = range(params['min_case_number'], params['max_case_number'] + 1)
+    progress(0, len(numbers))
+    cases = [
+        Case(
+            name=f"{params['batch_name']}-{number}",
+            status=params['status'],
+            rna_coverage=params['rna_coverage'],
+            dna_t_coverage=params['dna_t_coverage'],
+            dna_n_coverage=params['dna_n_coverage'],
+        )
+        for number in numbers
+    ]
+    created_cases, skipped_names = create_cases(job.project, cases)
+    progress(len(numbers), len(numbers))
+    return {'created': len(created_cases), 'skipped': skipped_names}
+
+
+@job_handler('batch_user_create')
+def run_batch_user_create(job, progress):
+    """
+    Create the users listed in the job, each with a generated password. The
+    credentials of the users created are kept in the job's params, even if
+    it fails halfway, for its creator to download.
+    """
+    users = job.params['users']
+    role = job.params['role']
+    created = []
+    credentials = []
+    errors = []
+    try:
+        for count, user_data in enumerate(users, start=1):
+            user = User(
+                username=user_data['username'],
+                first_name=user_data['first_name'],
+                last_name=user_data['last_name'],
+                email=''  # Email is optional
+            )
+            password = get_random_string(12)
+            # Hashing the password is most of the time of a user creation
+            user.set_password(password)
+            try:
+                with transaction.atomic():
+                    user.save()
+                    assign_user_role(user, role)
+            except IntegrityError:
+                errors.append(f'{user.username}: username already taken')
+            else:
+                created.append(user.username)
+                credentials.append([user.username, password])
+            progress(count, len(users))
+    finally:
+        if credentials:
+            Job.objects.filter(pk=job.pk).update(params={**job.params, 'credentials': credentials})
+
+    return {'created': created, 'errors': errors}
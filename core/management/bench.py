@@ -0,0 +1,27 @@
+"""
+Throwaway databases for the benchmark commands.
+
+``create_bench_database()`` switches the default connection to an empty,
+migrated database and returns the name ``destroy_bench_database()`` needs
+to switch back. The real database is never touched. On SQLite the database
+is a file in a temporary directory, so disk I/O is measured as in
+production; on PostgreSQL it is the ``test_`` database of the configured one.
+"""
+import os
+import tempfile
+
+from django.db import connection
+
+
+def create_bench_database():
+    if connection.vendor == 'sqlite':
+        tmp_dir = tempfile.mkdtemp(prefix='lims_bench_')
+        connection.settings_dict.setdefault('TEST', {})
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tmp_dir, 'bench.sqlite3')
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    return old_name
+
+
+def destroy_bench_database(old_name):
+    connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -0,0 +1,140 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.importers import bulk_update_cases
+from core.management.bench import create_bench_database, destroy_bench_database
+from core.models import Case, Project
+from core.pagination import LIST_PAGE_SIZE, KeysetPaginator
+
+# Migration adding the Case indexes, and the one before it
+INDEX_MIGRATION = '0021_case_indexes'
+INDEX_MIGRATION_PARENT = '0020_project_stats'
+
+
+class Command(BaseCommand):
+    help = 'Show query plans and latencies of the case list queries before and after the Case index migration'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cases', type=int, default=100000,
+            help='Cases to create (default: 100000)'
+        )
+        parser.add_argument(
+            '--projects', type=int, default=20,
+            help='Projects the cases are spread over (default: 20)'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Runs per query; the median is reported'
+        )
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+
+        old_name = create_bench_database()
+
+        try:
+            project = self._populate(options['cases'], options['projects'])
+            queries = self._build_queries(project)
+
+            # Schema before and after the index migration
+            call_command('migrate', 'core', INDEX_MIGRATION_PARENT, verbosity=0)
+            before = self._run('without indexes', queries, options['repeat'])
+
+            started = time.perf_counter()
+            call_command('migrate', 'core', INDEX_MIGRATION, verbosity=0)
+            self.stdout.write(f'\n{INDEX_MIGRATION} applied in {time.perf_counter() - started:.1f}s')
+            after = self._run('with indexes', queries, options['repeat'])
+
+            self.stdout.write(f"\n{'query':<24} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+            for label in queries:
+                self.stdout.write(
+                    f"{label:<24} {before[label]:>10.2f} {after[label]:>10.2f} "
+                    f"{before[label] / after[label]:>7.1f}x"
+                )
+        finally:
+            destroy_bench_database(old_name)
+
+    def _populate(self, case_count, project_count):
+        """Create the cases and return the project the queries run against."""
+        user = User.objects.create(username='bench')
+        projects = [Project.objects.create(name=f'Bench {i}', created_by=user) for i in range(project_count)]
+        statuses = [value for value, display in Case.STATUS_CHOICES]
+        tiers = [value for value, display in Case.TIER_CHOICES]
+        start = timezone.now() - timedelta(days=365)
+
+        started = time.perf_counter()
+        cases = [
+            Case(
+                project=random.choice(projects),
+                name=f'BENCH-{i:07d}',
+                status=random.choice(statuses),
+                tier=random.choice(tiers),
+                dna_t_coverage=round(random.uniform(20, 120), 2),
+                dna_n_coverage=round(random.uniform(20, 60), 2),
+            )
+            for i in range(case_count)
+        ]
+        with transaction.atomic():
+            Case.objects.bulk_create(cases, batch_size=2000)
+            # Spread creation dates over a year, ten cases sharing each timestamp
+            for i, case in enumerate(cases):
+                case.created_at = start + timedelta(seconds=i // 10 * 30)
+            bulk_update_cases(cases, ['created_at'], batch_size=2000)
+
+        self.stdout.write(f'{case_count} cases in {project_count} projects created in {time.perf_counter() - started:.1f}s')
+        return projects[0]
+
+    def _build_queries(self, project):
+        """Queries issued by the case list, filters, pagination and imports."""
+        cases = Case.objects.filter(project=project)
+        deep_offset = cases.count() * 3 // 4
+        deep_row = cases.order_by('-created_at', '-id')[deep_offset]
+        deep_cursor = KeysetPaginator(cases).encode_cursor(deep_row)
+        all_deep_row = Case.objects.order_by('-created_at', '-id')[Case.objects.count() * 3 // 4]
+        all_deep_cursor = KeysetPaginator(Case.objects.all()).encode_cursor(all_deep_row)
+        existing_name = cases.values_list('name', flat=True).first()
+
+        def page(queryset, cursor):
+            return KeysetPaginator(queryset, LIST_PAGE_SIZE).page_queryset(cursor)
+
+        return {
+            'status filter': cases.filter(status=Case.STATUS_SEQUENCED),
+            'tier filter': cases.filter(tier=Case.TIER_B),
+            'first page': page(cases, None),
+            'deep page (keyset)': page(cases, deep_cursor),
+            'deep page (offset)': cases.order_by('-created_at', '-id')[deep_offset:deep_offset + LIST_PAGE_SIZE],
+            'API deep page': page(Case.objects.all(), all_deep_cursor),
+            'name exists': cases.filter(name=existing_name),
+        }
+
+    def _run(self, title, queries, repeat):
+        """Print the plan of every query and return its median latency in ms."""
+        self.stdout.write(f'\n=== {title} ===')
+        with connection.cursor() as cursor:
+            # Refresh the planner statistics
+            cursor.execute('ANALYZE')
+
+        latencies = {}
+        for label, queryset in queries.items():
+            self.stdout.write(f'\n{label}:')
+            for line in queryset.explain().splitlines():
+                self.stdout.write(f'    {line}')
+
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            latencies[label] = statistics.median(timings)
+            self.stdout.write(f'    median {latencies[label]:.2f} ms')
+        return latencies
@@ -0,0 +1,83 @@
+import csv
+import io
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from core.importers import IMPORT_BATCH_SIZE, REQUIRED_HEADERS, import_cases
+from core.management.bench import create_bench_database, destroy_bench_database
+from core.models import Case, Project
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the CSV case import (rows per second) on a throwaway database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, nargs='+', default=[1000, 10000, 100000],
+            help='Sheet sizes to import (default: 1000 10000 100000)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+            help='Rows per bulk statement'
+        )
+        parser.add_argument(
+            '--comment-ratio', type=float, default=0.1,
+            help='Fraction of rows carrying a source_other_comments value'
+        )
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+
+        old_name = create_bench_database()
+
+        try:
+            user = User.objects.create(username='bench')
+            self.stdout.write(f"{'rows':>8} {'pass':>8} {'seconds':>9} {'rows/s':>10}")
+
+            for size in options['rows']:
+                project = Project.objects.create(name=f'Bench {size}', created_by=user)
+                sheet = self._build_sheet(size, options['comment_ratio'])
+
+                # First pass creates every case, second pass updates them all
+                for label in ('create', 'update'):
+                    reader = csv.DictReader(io.StringIO(sheet))
+                    start = time.perf_counter()
+                    result = import_cases(project, reader, user, batch_size=options['batch_size'])
+                    elapsed = time.perf_counter() - start
+
+                    processed = result.created_count + result.updated_count
+                    self.stdout.write(
+                        f"{size:>8} {label:>8} {elapsed:>9.3f} {processed / elapsed:>10.0f}"
+                    )
+        finally:
+            destroy_bench_database(old_name)
+
+    def _build_sheet(self, size, comment_ratio):
+        """Return CSV text with ``size`` synthetic cases."""
+        statuses = [value for value, display in Case.STATUS_CHOICES]
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(REQUIRED_HEADERS + ['source_other_comments'])
+
+        for i in range(size):
+            writer.writerow([
+                f'BENCH-{i:07d}',
+                f'EXT-{i}' if i % 3 == 0 else '',
+                random.choice(statuses),
+                self._coverage(20, 120),
+                self._coverage(20, 60),
+                self._coverage(40, 150),
+                'Imported by benchmark' if random.random() < comment_ratio else '',
+            ])
+
+        return output.getvalue()
+
+    def _coverage(self, low, high):
+        """Random coverage value, missing one time in ten."""
+        if random.random() < 0.1:
+            return ''
+        return round(random.uniform(low, high), 2)
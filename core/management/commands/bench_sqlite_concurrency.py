@@ -0,0 +1,207 @@
+import multiprocessing
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+from django.test import override_settings
+
+from core.importers import create_cases, import_cases
+from core.management.bench import create_bench_database, destroy_bench_database
+from core.models import Case, Project
+from core.pagination import KeysetPaginator
+from core.sqlite import SQLITE_PRAGMAS, is_lock_error
+from core.stats import get_case_statistics, rebuild_project_stats
+from core.tiers import assign_tiers
+
+# Setup before WAL: rollback journal, deferred transactions, sqlite3's
+# default 5 s timeout and no retry
+LEGACY_MODE = {
+    'pragmas': {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'busy_timeout': 5000},
+    'transaction_mode': 'DEFERRED',
+    'retry_attempts': 1,
+}
+WAL_MODE = {
+    'pragmas': SQLITE_PRAGMAS,
+    'transaction_mode': 'IMMEDIATE',
+    'retry_attempts': None,  # core.sqlite default
+}
+
+# Rows per CSV import and cases per batch creation run by each writer
+IMPORT_ROWS = 500
+BATCH_CASES = 200
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure page reads per second while CSV imports and batch creations run, '
+        'with the rollback journal and deferred transactions, then with WAL and BEGIN IMMEDIATE'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cases', type=int, default=20000, help='Cases to create (default: 20000)')
+        parser.add_argument('--readers', type=int, default=4, help='Processes viewing project pages (default: 4)')
+        parser.add_argument('--writers', type=int, default=2, help='Processes importing cases (default: 2)')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds per mode (default: 10)')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+
+        if connection.vendor != 'sqlite':
+            raise CommandError('This benchmark compares SQLite setups; the default database is not SQLite')
+
+        old_options = dict(connection.settings_dict['OPTIONS'])
+        old_name = create_bench_database()
+
+        try:
+            user, projects = self._populate(options['cases'], options['readers'] + options['writers'])
+            results = {
+                'rollback journal, deferred': self._run(LEGACY_MODE, user, projects, options),
+                'WAL, immediate, retry': self._run(WAL_MODE, user, projects, options),
+            }
+        finally:
+            connection.settings_dict['OPTIONS'] = old_options
+            connection.close()
+            destroy_bench_database(old_name)
+
+        self.stdout.write(
+            f"\n{'mode':<28} {'reads/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'read errors':>12} "
+            f"{'writes':>7} {'write errors':>13}"
+        )
+        for mode, result in results.items():
+            self.stdout.write(
+                f"{mode:<28} {result['reads_per_second']:>8.1f} {result['p50']:>8.1f} {result['p95']:>8.1f} "
+                f"{result['read_errors']:>12} {result['writes']:>7} {result['write_errors']:>13}"
+            )
+
+    def _populate(self, case_count, project_count):
+        user = User.objects.create(username='bench')
+        projects = [Project.objects.create(name=f'Bench {i}', created_by=user) for i in range(project_count)]
+        statuses = [value for value, display in Case.STATUS_CHOICES]
+
+        started = time.perf_counter()
+        cases = [
+            Case(
+                project=projects[i % project_count],
+                name=f'BENCH-{i:07d}',
+                status=random.choice(statuses),
+                dna_t_coverage=round(random.uniform(20, 120), 2),
+                dna_n_coverage=round(random.uniform(20, 60), 2),
+            )
+            for i in range(case_count)
+        ]
+        assign_tiers(cases)
+        with transaction.atomic():
+            Case.objects.bulk_create(cases, batch_size=2000)
+        rebuild_project_stats()
+
+        self.stdout.write(f'{case_count} cases in {project_count} projects created in {time.perf_counter() - started:.1f}s')
+        return user, projects
+
+    def _run(self, mode, user, projects, options):
+        """Run readers and writers for ``duration`` seconds in one mode."""
+        # Connections are set up when opened, so every worker starts afresh
+        connection.close()
+        connection.settings_dict['OPTIONS'] = {'transaction_mode': mode['transaction_mode']}
+        retry_settings = {}
+        if mode['retry_attempts'] is not None:
+            retry_settings['SQLITE_LOCK_RETRY_ATTEMPTS'] = mode['retry_attempts']
+
+        with override_settings(SQLITE_PRAGMAS=mode['pragmas'], **retry_settings):
+            # Switch the journal mode while no other connection is open
+            connection.ensure_connection()
+            connection.close()
+
+            # Processes, as gunicorn workers are, each with its own connection
+            context = multiprocessing.get_context('fork')
+            stop = context.Event()
+            results = context.Queue()
+            readers = projects[:options['readers']]
+            writers = projects[options['readers']:]
+            processes = [
+                context.Process(target=self._reader, args=(project, stop, results))
+                for project in readers
+            ] + [
+                context.Process(target=self._writer, args=(project, user, index, stop, results))
+                for index, project in enumerate(writers)
+            ]
+            for process in processes:
+                process.start()
+            time.sleep(options['duration'])
+            stop.set()
+
+            latencies = []
+            counters = {'read_errors': 0, 'writes': 0, 'write_errors': 0}
+            for process in processes:
+                process_latencies, process_counters = results.get()
+                latencies.extend(process_latencies)
+                for name, value in process_counters.items():
+                    counters[name] += value
+            for process in processes:
+                process.join()
+
+        latencies.sort()
+        return {
+            'reads_per_second': len(latencies) / options['duration'],
+            'p50': statistics.median(latencies) if latencies else 0.0,
+            'p95': latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+            **counters,
+        }
+
+    def _reader(self, project, stop, results):
+        """View a project page again and again: one page of cases and the statistics."""
+        latencies = []
+        read_errors = 0
+        try:
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    list(KeysetPaginator(project.cases.all()).get_page())
+                    get_case_statistics(project)
+                except OperationalError as error:
+                    if not is_lock_error(error):
+                        raise
+                    read_errors += 1
+                    continue
+                latencies.append((time.perf_counter() - started) * 1000)
+        finally:
+            connection.close()
+            results.put((latencies, {'read_errors': read_errors}))
+
+    def _writer(self, project, user, index, stop, results):
+        """Alternate CSV imports (updates and new cases) and batch creations."""
+        statuses = [value for value, display in Case.STATUS_CHOICES]
+        names = list(project.cases.values_list('name', flat=True)[:IMPORT_ROWS // 2])
+        run = writes = write_errors = 0
+        try:
+            while not stop.is_set():
+                run += 1
+                prefix = f'W{index}-{run:05d}'
+                try:
+                    if run % 2:
+                        rows = [
+                            {
+                                'CaseID': name, 'Other_ID': '', 'Status': random.choice(statuses),
+                                'DNAT': f'{random.uniform(20, 120):.1f}', 'DNAN': f'{random.uniform(20, 60):.1f}',
+                                'RNA': f'{random.uniform(20, 120):.1f}',
+                            }
+                            for name in names + [f'{prefix}-{i:04d}' for i in range(IMPORT_ROWS - len(names))]
+                        ]
+                        import_cases(project, rows, user)
+                    else:
+                        create_cases(project, [
+                            Case(name=f'{prefix}-{i:04d}', dna_t_coverage=90, dna_n_coverage=40)
+                            for i in range(BATCH_CASES)
+                        ])
+                except OperationalError as error:
+                    if not is_lock_error(error):
+                        raise
+                    write_errors += 1
+                    continue
+                writes += 1
+        finally:
+            connection.close()
+            results.put(([], {'writes': writes, 'write_errors': write_errors}))
@@ -0,0 +1,409 @@
+import csv
+import io
+import json
+import resource
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+import django
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.urls import include, path
+
+from core.importers import REQUIRED_HEADERS
+from core.jobs import claim_next_job, run_job
+from core.management.bench import create_bench_database, destroy_bench_database
+from core.models import Accession, Case, Change, Comment, Project, ProjectLead
+from core.stats import rebuild_project_stats
+from core.tiers import assign_tiers
+
+# The site plus the REST API under /api/, which the default URLconf does not
+# mount; this module is used as ROOT_URLCONF while the benchmark runs
+urlpatterns = [
+    path('', include(settings.ROOT_URLCONF)),
+    path('api/', include('core.api_urls')),
+]
+
+# Cases written per bulk insert while seeding
+SEED_CHUNK_SIZE = 10000
+
+BENCH_PASSWORD = 'bench-password'
+
+# Endpoints that queue a background job; each request also runs the job, as
+# ``run_jobs`` would, so that it is timed and counted with the request
+JOB_ENDPOINTS = {'csv_case_import'}
+
+
+class QueryCounter:
+    """Database execute wrapper counting statements, without the 9,000 query cap of connection.queries."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway database with synthetic projects, cases, accessions, comments and users, '
+        'then report p50/p95 latency, SQL queries and peak Python allocations of every page and API endpoint, '
+        'and what ETag revalidation saves a polling client, as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cases', type=int, default=10000,
+            help='Cases to create, 10k to 1M (default: 10000)'
+        )
+        parser.add_argument('--projects', type=int, default=20, help='Projects (default: 20)')
+        parser.add_argument('--leads', type=int, default=8, help='Project leads (default: 8)')
+        parser.add_argument('--users', type=int, default=200, help='Editor and viewer accounts (default: 200)')
+        parser.add_argument(
+            '--comments-per-case', type=float, default=0.3,
+            help='Average comments per case (default: 0.3)'
+        )
+        parser.add_argument(
+            '--accessions-per-case', type=float, default=1.0,
+            help='Average accessions per case (default: 1.0)'
+        )
+        parser.add_argument(
+            '--import-rows', type=int, default=1000,
+            help='Rows of the CSV file posted to csv_case_import (default: 1000)'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Timed requests per endpoint, after one warm-up request (default: 20)'
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        self.rng = np.random.default_rng(options['seed'])
+
+        old_name = create_bench_database()
+        cache.clear()
+
+        try:
+            started = time.perf_counter()
+            fixtures = self._seed(options)
+            seed_seconds = time.perf_counter() - started
+            self.stderr.write(f'Seeded {options["cases"]} cases in {seed_seconds:.1f}s')
+
+            # Serve requests as production would, with the API mounted
+            with override_settings(
+                ROOT_URLCONF=__name__, DEBUG=False, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']
+            ):
+                endpoints = self._run_endpoints(fixtures, options)
+                polling = self._run_polling(fixtures, options)
+
+            report = {
+                'meta': {
+                    'commit': self._git_commit(),
+                    'django': django.get_version(),
+                    'database': connection.vendor,
+                    'cases': options['cases'],
+                    'projects': options['projects'],
+                    'users': options['users'],
+                    'repeat': options['repeat'],
+                    'seed': options['seed'],
+                    'seed_seconds': round(seed_seconds, 2),
+                    # High-water mark of the whole process, seeding included (Linux
+                    # reports KiB); endpoints report their tracemalloc peak instead
+                    'process_peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                },
+                'endpoints': endpoints,
+                'polling': polling,
+            }
+        finally:
+            destroy_bench_database(old_name)
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                report_file.write(output + '\n')
+            self.stderr.write(f'Report written to {options["output"]}')
+        else:
+            self.stdout.write(output)
+
+    # Seeding
+
+    def _seed(self, options):
+        """Create the synthetic data and return the objects the requests refer to."""
+        rng = self.rng
+        password = make_password(BENCH_PASSWORD)
+
+        admin = User.objects.create(username='bench-admin', password=password, is_superuser=True, is_staff=True)
+        editors = Group.objects.get_or_create(name='editor')[0]
+        viewers = Group.objects.get_or_create(name='viewer')[0]
+        users = User.objects.bulk_create([
+            User(username=f'user{i:05d}', first_name=f'User{i}', last_name='Bench', password=password)
+            for i in range(options['users'])
+        ])
+        User.groups.through.objects.bulk_create([
+            User.groups.through(user_id=user.pk, group_id=(editors if i % 4 == 0 else viewers).pk)
+            for i, user in enumerate(users)
+        ])
+
+        leads = ProjectLead.objects.bulk_create([ProjectLead(name=f'Lead {i}') for i in range(options['leads'])])
+        projects = Project.objects.bulk_create([
+            Project(name=f'Project {i}', project_lead=leads[i % len(leads)], created_by=admin)
+            for i in range(options['projects'])
+        ])
+
+        # Project sizes follow a long tail, as real cohorts do
+        weights = rng.pareto(1.5, len(projects)) + 1
+        weights /= weights.sum()
+        statuses = [value for value, display in Case.STATUS_CHOICES]
+
+        for start in range(0, options['cases'], SEED_CHUNK_SIZE):
+            size = min(SEED_CHUNK_SIZE, options['cases'] - start)
+            with transaction.atomic():
+                self._seed_cases(start, size, projects, weights, statuses, users, options)
+
+        rebuild_project_stats()
+
+        largest = max(projects, key=lambda project: project.cases.count())
+        case = Case.objects.filter(project=largest).order_by('-comments_count', '-accessions_count').first()
+        return {'admin': admin, 'project': largest, 'case': case, 'lead': leads[0], 'user': users[0]}
+
+    def _seed_cases(self, start, size, projects, weights, statuses, users, options):
+        rng = self.rng
+        project_indexes = rng.choice(len(projects), size=size, p=weights)
+        status_indexes = rng.integers(0, len(statuses), size=size)
+        dna_t = self._coverage(80, 30, size)
+        dna_n = self._coverage(40, 12, size)
+        rna = self._coverage(90, 35, size)
+        comment_counts = rng.poisson(options['comments_per_case'], size=size)
+        accession_counts = rng.poisson(options['accessions_per_case'], size=size)
+
+        cases = [
+            Case(
+                project=projects[project_indexes[i]],
+                name=f'CASE-{start + i:07d}',
+                other_id=f'EXT-{start + i}' if i % 3 == 0 else None,
+                status=statuses[status_indexes[i]],
+                dna_t_coverage=dna_t[i],
+                dna_n_coverage=dna_n[i],
+                rna_coverage=rna[i],
+                accessions_count=int(accession_counts[i]),
+                comments_count=int(comment_counts[i]),
+            )
+            for i in range(size)
+        ]
+        assign_tiers(cases)
+        Case.objects.bulk_create(cases, batch_size=2000)
+
+        Accession.objects.bulk_create([
+            Accession(case=case, accession_number=f'ACC-{case.pk}-{n}')
+            for case in cases for n in range(case.accessions_count)
+        ], batch_size=2000)
+        Comment.objects.bulk_create([
+            Comment(case=case, user=users[(case.pk + n) % len(users)], text=f'Synthetic comment {n} on {case.name}')
+            for case in cases for n in range(case.comments_count)
+        ], batch_size=2000)
+
+    def _coverage(self, mean, spread, size):
+        """Normally distributed coverage values, missing about one time in twelve."""
+        values = np.round(np.clip(self.rng.normal(mean, spread, size), 0, None), 2)
+        missing = self.rng.random(size) < 0.08
+        return [None if missing[i] else float(values[i]) for i in range(size)]
+
+    # Requests
+
+    def _build_requests(self, fixtures, options):
+        """(name, method, path, data) of every page and API endpoint."""
+        project = fixtures['project']
+        case = fixtures['case']
+        lead = fixtures['lead']
+        user = fixtures['user']
+        last_seq = Change.objects.order_by('-seq').values_list('seq', flat=True).first() or 0
+
+        return [
+            ('home', 'get', '/', None),
+            ('project_detail', 'get', f'/projects/{project.id}/', None),
+            ('case_detail', 'get', f'/cases/{case.id}/', None),
+            ('csv_case_import', 'post', f'/projects/{project.id}/cases/import-csv/', lambda: {
+                'csv_file': self._import_file(project, options['import_rows']),
+            }),
+            ('search', 'get', f'/search/?q={case.name}', None),
+            ('csv_case_export', 'get', f'/projects/{project.id}/cases/export-csv/', None),
+            ('api_project_list', 'get', '/api/projects/', None),
+            ('api_project_detail', 'get', f'/api/projects/{project.id}/', None),
+            ('api_project_stage_statistics', 'get', '/api/projects/statistics/stages/?by=lead', None),
+            ('api_project_timeseries', 'get', '/api/projects/statistics/timeseries/?by=lead', None),
+            ('api_project_cases', 'get', f'/api/projects/{project.id}/cases/', None),
+            ('api_project_statistics', 'get', '/api/projects/statistics/', None),
+            ('api_case_list', 'get', '/api/cases/', None),
+            ('api_case_list_project', 'get', f'/api/cases/?project={project.id}', None),
+            ('api_case_detail', 'get', f'/api/cases/{case.id}/', None),
+            ('api_case_patch', 'patch', f'/api/cases/{case.id}/', lambda: {'dna_t_coverage': 95.5}),
+            ('api_case_bulk', 'post', '/api/cases/bulk/', lambda: self._bulk_records(project, options['import_rows'])),
+            ('api_case_add_comment', 'post', f'/api/cases/{case.id}/add_comment/', lambda: {'text': 'Benchmark comment'}),
+            ('api_case_add_accession', 'post', f'/api/cases/{case.id}/add_accession/', lambda: {
+                # A case has each number once
+                'accession_number': f'ACC-BENCH-{self.rng.integers(1 << 62)}',
+            }),
+            ('api_search_case', 'get', f'/api/search/?q={case.name}', None),
+            ('api_search_accession', 'get', f'/api/search/?q=ACC-{case.pk}', None),
+            # A word found in every comment
+            ('api_search_common_word', 'get', '/api/search/?q=synthetic', None),
+            ('api_project_lead_list', 'get', '/api/project-leads/', None),
+            ('api_project_lead_detail', 'get', f'/api/project-leads/{lead.id}/', None),
+            ('api_project_lead_projects', 'get', f'/api/project-leads/{lead.id}/projects/', None),
+            ('api_comment_list', 'get', '/api/comments/', None),
+            ('api_comment_list_case', 'get', f'/api/comments/?case={case.id}', None),
+            ('api_accession_list', 'get', '/api/accessions/', None),
+            ('api_accession_list_case', 'get', f'/api/accessions/?case={case.id}', None),
+            ('api_accession_resolve', 'post', '/api/accessions/resolve/', lambda: self._scanned_accessions(options['import_rows'])),
+            # The last 500 changes, as a mirror catching up
+            ('api_changes', 'get', f'/api/changes/?since={max(last_seq - 500, 0)}', None),
+            ('api_user_list', 'get', '/api/users/', None),
+            ('api_user_detail', 'get', f'/api/users/{user.id}/', None),
+            ('api_user_me', 'get', '/api/users/me/', None),
+            ('api_token_obtain', 'post', '/api/auth/token/', lambda: {
+                'username': fixtures['admin'].username, 'password': BENCH_PASSWORD,
+            }),
+        ]
+
+    def _import_file(self, project, rows):
+        """CSV upload updating ``rows`` existing cases of the project."""
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(REQUIRED_HEADERS)
+        for name, status in project.cases.order_by('pk').values_list('name', 'status')[:rows]:
+            writer.writerow([name, '', status, '95.5', '41.2', '88.0'])
+        upload = io.BytesIO(output.getvalue().encode('utf-8'))
+        upload.name = 'bench.csv'
+        return upload
+
+    def _bulk_records(self, project, rows):
+        """Coverage updates of ``rows`` existing cases of the project, as a pipeline pushes them."""
+        # New values on every call, so each request writes every case
+        coverage = round(float(self.rng.uniform(30, 120)), 2)
+        return [
+            {'project': project.id, 'name': name, 'dna_t_coverage': coverage, 'rna_coverage': 41.2}
+            for name in project.cases.order_by('pk').values_list('name', flat=True)[:rows]
+        ]
+
+    def _scanned_accessions(self, count):
+        """``count`` accession numbers as a reception batch scans them, one in ten unknown."""
+        numbers = list(Accession.objects.order_by('pk').values_list('accession_number', flat=True)[:count])
+        return [f'UNKNOWN-{i}' if i % 10 == 0 else number for i, number in enumerate(numbers)]
+
+    def _run_endpoints(self, fixtures, options):
+        client = Client(HTTP_ACCEPT='application/json, text/html')
+        client.force_login(fixtures['admin'])
+        results = {}
+
+        for name, method, url, data in self._build_requests(fixtures, options):
+            def send():
+                payload = data() if data else None
+                if method == 'patch' or isinstance(payload, list):
+                    # The API reads these as JSON
+                    response = getattr(client, method)(url, json.dumps(payload), content_type='application/json')
+                else:
+                    response = getattr(client, method)(url, payload)
+                if response.streaming:
+                    # Exports are only produced while the body is read
+                    for chunk in response.streaming_content:
+                        pass
+                if name in JOB_ENDPOINTS:
+                    run_job(claim_next_job())
+                return response
+
+            response = send()  # Warm-up: caches, role lookup, first-query costs
+
+            timings = []
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    response = send()
+                    timings.append((time.perf_counter() - started) * 1000)
+
+            # Python allocations are traced in a separate request, as tracing
+            # slows everything down
+            tracemalloc.start()
+            send()
+            python_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            results[name] = {
+                'method': method.upper(),
+                'path': url,
+                'status': response.status_code,
+                'p50_ms': round(statistics.median(timings), 2),
+                'p95_ms': round(self._percentile(timings, 95), 2),
+                'queries': counter.count // options['repeat'],
+                # Python allocations only, not the RSS: C buffers of SQLite and numpy are not traced
+                'tracemalloc_peak_kb': python_peak // 1024,
+            }
+            self.stderr.write(
+                f"{name:<28} {results[name]['status']:>4} p50 {results[name]['p50_ms']:>9.2f} ms "
+                f"p95 {results[name]['p95_ms']:>9.2f} ms {results[name]['queries']:>5} queries"
+            )
+
+        return results
+
+    def _run_polling(self, fixtures, options):
+        """
+        Bytes, latency and CPU time of the endpoints the dashboard polls,
+        fetched in full and revalidated with If-None-Match while nothing changes.
+        """
+        client = Client(HTTP_ACCEPT='application/json')
+        client.force_login(fixtures['admin'])
+        polled = [
+            ('api_project_list', '/api/projects/'),
+            ('api_case_list_project', f"/api/cases/?project={fixtures['project'].id}"),
+            ('api_project_statistics', '/api/projects/statistics/'),
+        ]
+        results = {}
+
+        for name, url in polled:
+            etag = client.get(url)['ETag']
+            result = {'path': url}
+            for mode, headers in (('full', {}), ('conditional', {'HTTP_IF_NONE_MATCH': etag})):
+                timings = []
+                cpu_started = time.process_time()
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    response = client.get(url, **headers)
+                    timings.append((time.perf_counter() - started) * 1000)
+                result[mode] = {
+                    'status': response.status_code,
+                    'bytes': len(response.content),
+                    'p50_ms': round(statistics.median(timings), 2),
+                    'cpu_ms': round((time.process_time() - cpu_started) * 1000 / options['repeat'], 2),
+                }
+            results[name] = result
+            self.stderr.write(
+                f"{name:<28} full {result['full']['bytes']:>8} B {result['full']['cpu_ms']:>8.2f} ms CPU, "
+                f"revalidated {result['conditional']['status']} {result['conditional']['bytes']:>3} B "
+                f"{result['conditional']['cpu_ms']:>6.2f} ms CPU"
+            )
+
+        return results
+
+    def _percentile(self, values, percent):
+        values = sorted(values)
+        index = min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))
+        return values[index]
+
+    def _git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
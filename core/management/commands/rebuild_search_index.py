@@ -0,0 +1,29 @@
+import importlib
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+# The statements that created the index
+search_migration = importlib.import_module('core.migrations.0024_search_index')
+
+
+class Command(BaseCommand):
+    help = (
+        'Recreate the SQLite full-text search tables and their triggers from the case, accession and comment tables. '
+        'Run it after a migration that rebuilt one of these tables, which drops its triggers.'
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stdout.write('PostgreSQL searches the tables through their indexes; there is nothing to rebuild')
+            return
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            for statement in search_migration.sqlite_drop_statements() + search_migration.sqlite_create_statements():
+                cursor.execute(statement)
+            rows = 0
+            for index, *source in search_migration.SQLITE_INDEXES:
+                cursor.execute(f'SELECT count(*) FROM {index}')
+                rows += cursor.fetchone()[0]
+
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt with {rows} rows'))
@@ -0,0 +1,50 @@
+import importlib
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max
+
+from core.models import CaseTransition, TransitionRollup
+
+# The statements that filled the rollup
+rollup_migration = importlib.import_module('core.migrations.0028_transition_rollups')
+
+# Transitions added to the rollup per transaction
+ROLLUP_CHUNK_SIZE = 100000
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the day and week rollups of the case status log, in chunks of transitions so that '
+        'case writes are not held up. Transitions written while it runs are counted by the triggers.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=ROLLUP_CHUNK_SIZE,
+            help=f'Transitions added per transaction (default: {ROLLUP_CHUNK_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with transaction.atomic(), connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Wait for the transactions writing transitions, so that every
+                # id up to the last one read below is committed
+                cursor.execute('LOCK TABLE core_casetransition IN SHARE MODE')
+            TransitionRollup.objects.all().delete()
+            last_id = CaseTransition.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+
+        # Later transitions are counted by the triggers
+        for start in range(0, last_id, options['chunk_size']):
+            end = min(start + options['chunk_size'], last_id)
+            with transaction.atomic(), connection.cursor() as cursor:
+                for statement in rollup_migration.rollup_statements(connection.vendor, f'id > {start} AND id <= {end}'):
+                    cursor.execute(statement)
+            self.stdout.write(f'  transitions {start + 1} to {end} counted')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rollups rebuilt from {last_id} transitions in {time.perf_counter() - started:.1f}s '
+            f'({TransitionRollup.objects.count()} rows)'
+        ))
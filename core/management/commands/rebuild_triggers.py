@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core.triggers import get_applied_trigger_sets, get_missing_triggers
+
+# What the triggers of each set would have recorded while they were missing
+LOST_WRITES = {
+    'search': 'reindexed from the tables',
+    'changes': 'writes made without them are not in the change feed; mirrors should read again from since=0',
+    'transitions': 'status changes made without them are not logged; run rebuild_transition_rollups for the counts',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Recreate the SQLite triggers of the search index, change feed, status log and status rollups. '
+        'Run it after a migration that rebuilt one of their tables, which drops its triggers; '
+        '"manage.py check --database default" lists the missing ones.'
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stdout.write('PostgreSQL keeps the triggers of altered tables; there is nothing to rebuild')
+            return
+
+        missing = get_missing_triggers(connection)
+        trigger_sets = get_applied_trigger_sets(connection)
+        with transaction.atomic(), connection.cursor() as cursor:
+            for name, migration, drop, create in trigger_sets:
+                for statement in drop + create:
+                    cursor.execute(statement)
+
+        for name, triggers in missing.items():
+            self.stdout.write(f"  {name}: {', '.join(triggers)} were missing; {LOST_WRITES[name]}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Triggers recreated: {', '.join(name for name, *statements in trigger_sets) or 'none'}"
+        ))
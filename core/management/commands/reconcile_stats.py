@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from core.stats import count_cases, get_stored_counts, rebuild_project_stats
+
+
+class Command(BaseCommand):
+    help = 'Compare the ProjectStats rollup with the Case table and rebuild it'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report the rollup rows that do not match the cases'
+        )
+
+    def handle(self, *args, **options):
+        stored = get_stored_counts()
+        actual = count_cases()
+
+        drifted = sorted(key for key in set(stored) | set(actual) if stored[key] != actual[key])
+        for key in drifted:
+            project_id, status, tier = key
+            self.stdout.write(
+                f'  project {project_id}, {status}, tier {tier}: stored {stored[key]}, actual {actual[key]}'
+            )
+        self.stdout.write(f'{len(drifted)} statistics rows out of date')
+
+        if options['dry_run']:
+            return
+
+        rebuild_project_stats()
+        self.stdout.write(self.style.SUCCESS(f'Statistics rebuilt from {sum(actual.values())} cases'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from core.models import Case, case_counter_expressions, refresh_case_counters
+
+
+class Command(BaseCommand):
+    help = 'Rebuild Case.accessions_count and Case.comments_count from the accession and comment tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report how many cases have wrong counters'
+        )
+
+    def handle(self, *args, **options):
+        expressions = case_counter_expressions()
+        drifted = Case.objects.annotate(
+            real_accessions_count=expressions['accessions_count'],
+            real_comments_count=expressions['comments_count'],
+        ).exclude(
+            Q(accessions_count=F('real_accessions_count')) &
+            Q(comments_count=F('real_comments_count'))
+        ).count()
+
+        self.stdout.write(f'{drifted} cases have out-of-date counters')
+
+        if options['dry_run']:
+            return
+
+        updated = refresh_case_counters()
+        self.stdout.write(self.style.SUCCESS(f'Counters rebuilt for {updated} cases'))
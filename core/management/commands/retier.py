@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Case, Project
+from core.tiers import RETIER_CHUNK_SIZE, retier_cases
+
+
+class Command(BaseCommand):
+    help = 'Recalculate case tiers from coverage values and store the ones that changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report the tier changes without writing them'
+        )
+        parser.add_argument(
+            '--project', type=int,
+            help='Only recalculate the cases of this project ID'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=RETIER_CHUNK_SIZE,
+            help=f'Cases processed per round trip (default: {RETIER_CHUNK_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        queryset = Case.objects.all()
+
+        if options['project'] is not None:
+            if not Project.objects.filter(id=options['project']).exists():
+                raise CommandError(f"Project {options['project']} does not exist")
+            queryset = queryset.filter(project_id=options['project'])
+
+        result = retier_cases(queryset, chunk_size=options['chunk_size'], dry_run=options['dry_run'])
+
+        for (old_tier, new_tier), count in sorted(result.transitions.items()):
+            self.stdout.write(f'  {old_tier:>4} -> {new_tier:<4} {count}')
+
+        verb = 'would change' if options['dry_run'] else 'changed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.scanned} cases scanned, {result.changed} {verb}'
+        ))
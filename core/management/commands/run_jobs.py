@@ -0,0 +1,117 @@
+import multiprocessing
+import signal
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.core.management.base import BaseCommand
+
+from core.jobs import claim_next_job, fail_interrupted_jobs, fail_job, forget_expired_credentials, run_job
+
+# Worker processes, and seconds between two looks at an empty queue
+JOB_WORKERS = 2
+POLL_INTERVAL = 1.0
+
+# Seconds between two removals of the expired batch user credentials
+CREDENTIALS_PURGE_INTERVAL = 60.0
+
+
+class Command(BaseCommand):
+    help = (
+        'Run queued background jobs (CSV imports, batch creations) in a pool of worker processes. '
+        'Run one per database, next to gunicorn.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=JOB_WORKERS,
+            help=f'Jobs run at the same time, each in its own process; 0 runs them in this process (default: {JOB_WORKERS})'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=POLL_INTERVAL,
+            help=f'Seconds between two looks at an empty queue (default: {POLL_INTERVAL})'
+        )
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        self.purged_at = time.monotonic()
+        interrupted = fail_interrupted_jobs()
+        if interrupted:
+            self.stderr.write(f'{interrupted} jobs left running by a stopped runner marked failed')
+
+        # systemd stops services with SIGTERM: finish the running jobs, then exit
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+        if options['workers'] == 0:
+            self._run_inline(options)
+            return
+
+        pool = self._start_pool(options['workers'])
+        running = {}
+        try:
+            while True:
+                while len(running) < options['workers']:
+                    job_id = claim_next_job()
+                    if job_id is None:
+                        break
+                    self.stdout.write(f'Job {job_id} started')
+                    running[pool.submit(run_job, job_id)] = job_id
+
+                if not running:
+                    self._forget_expired_credentials()
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                done, pending = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                crashed = False
+                for future in done:
+                    job_id = running.pop(future)
+                    try:
+                        self.stdout.write(f'Job {job_id} {future.result()}')
+                    except BrokenProcessPool as error:
+                        # A worker process died (out of memory, killed): the pool
+                        # stopped the other workers and takes no more jobs
+                        crashed = True
+                        self._fail(job_id, f'Worker crashed: {error!r}')
+                    except Exception as error:
+                        self._fail(job_id, f'Worker failed: {error!r}')
+
+                if crashed:
+                    for job_id in running.values():
+                        self._fail(job_id, 'Worker crashed: another job of the pool stopped it')
+                    running.clear()
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    self.stderr.write('Worker pool crashed, starting a new one')
+                    pool = self._start_pool(options['workers'])
+        finally:
+            pool.shutdown()
+
+    def _start_pool(self, workers):
+        # Spawned, not forked: a worker must not share the database connection of this process
+        return ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup,
+        )
+
+    def _forget_expired_credentials(self):
+        if time.monotonic() - self.purged_at >= CREDENTIALS_PURGE_INTERVAL:
+            forget_expired_credentials()
+            self.purged_at = time.monotonic()
+
+    def _fail(self, job_id, error):
+        fail_job(job_id, error)
+        self.stderr.write(f'Job {job_id} failed: {error}')
+
+    def _run_inline(self, options):
+        while True:
+            job_id = claim_next_job()
+            if job_id is None:
+                self._forget_expired_credentials()
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+            self.stdout.write(f'Job {job_id} {run_job(job_id)}')
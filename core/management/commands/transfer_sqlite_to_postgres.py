@@ -0,0 +1,150 @@
+import importlib
+import sqlite3
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connections, models, transaction
+from django.db.migrations.recorder import MigrationRecorder
+
+# Tables with triggers that record their writes in other tables: the change
+# feed, the case status log and its rollups
+change_migration = importlib.import_module('core.migrations.0026_change_feed')
+TRIGGER_TABLES = [table for kind, table, parent in change_migration.CHANGE_SOURCES] + ['core_casetransition']
+
+# Rows read from SQLite and sent in one COPY
+TRANSFER_CHUNK_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy a SQLite LIMS database into the PostgreSQL database with chunked COPY batches. '
+        'Both databases must be migrated to the same state; existing PostgreSQL rows are replaced.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source', default=str(settings.BASE_DIR / 'db.sqlite3'),
+            help='SQLite database to copy (default: db.sqlite3)'
+        )
+        parser.add_argument(
+            '--database', default='default',
+            help='PostgreSQL database alias to copy into (default: default)'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=TRANSFER_CHUNK_SIZE,
+            help=f'Rows per COPY batch (default: {TRANSFER_CHUNK_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'postgresql':
+            raise CommandError(
+                f"Database '{options['database']}' is {connection.vendor}, not PostgreSQL; set DB_ENGINE=postgresql"
+            )
+
+        from django.db.backends.postgresql.psycopg_any import is_psycopg3
+        if not is_psycopg3:
+            raise CommandError('The transfer needs psycopg 3 (pip install "psycopg[binary,pool]")')
+
+        source_path = Path(options['source'])
+        if not source_path.is_file():
+            raise CommandError(f'SQLite database {source_path} not found')
+
+        source = sqlite3.connect(f'file:{source_path}?mode=ro', uri=True)
+        try:
+            self._check_migrations(source, connection)
+            model_list = [
+                model for model in apps.get_models(include_auto_created=True)
+                if model._meta.managed and not model._meta.proxy
+            ]
+
+            started = time.perf_counter()
+            total = 0
+            with transaction.atomic(using=connection.alias):
+                with connection.cursor() as cursor:
+                    quote_name = connection.ops.quote_name
+                    # Rows created by migrate (content types, permissions)
+                    # are replaced by the source rows, ids included
+                    cursor.execute('TRUNCATE {} CASCADE'.format(
+                        ', '.join(quote_name(model._meta.db_table) for model in model_list)
+                    ))
+                    # The triggers would record the copied rows again; the
+                    # tables they write are copied as they are
+                    for table in TRIGGER_TABLES:
+                        cursor.execute(f'ALTER TABLE {quote_name(table)} DISABLE TRIGGER USER')
+                    # Foreign keys are deferred, so tables load in any order and
+                    # are checked on commit
+                    for model in model_list:
+                        total += self._copy_table(source, cursor, model, options['chunk_size'])
+                    for table in TRIGGER_TABLES:
+                        cursor.execute(f'ALTER TABLE {quote_name(table)} ENABLE TRIGGER USER')
+
+                    for sql in connection.ops.sequence_reset_sql(no_style(), model_list):
+                        cursor.execute(sql)
+
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        finally:
+            source.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Copied {total} rows of {len(model_list)} tables in {time.perf_counter() - started:.1f}s'
+        ))
+
+    def _check_migrations(self, source, connection):
+        """Both databases must have the same schema, so every column maps one to one."""
+        source_applied = set(source.execute('SELECT app, name FROM django_migrations'))
+        target_applied = set(MigrationRecorder(connection).applied_migrations())
+        if source_applied != target_applied:
+            only_source = sorted(f'{app}.{name}' for app, name in source_applied - target_applied)
+            only_target = sorted(f'{app}.{name}' for app, name in target_applied - source_applied)
+            raise CommandError(
+                'Run migrate on both databases first. '
+                f'Only applied to SQLite: {", ".join(only_source) or "none"}. '
+                f'Only applied to PostgreSQL: {", ".join(only_target) or "none"}.'
+            )
+
+    def _copy_table(self, source, cursor, model, chunk_size):
+        """Copy one table in COPY batches of ``chunk_size`` rows; return the row count."""
+        meta = model._meta
+        fields = meta.concrete_fields
+        # SQLite stores booleans as 0 and 1, and durations as microseconds
+        converters = [
+            bool if isinstance(field, models.BooleanField)
+            else (lambda value: timedelta(microseconds=value)) if isinstance(field, models.DurationField)
+            else None
+            for field in fields
+        ]
+        quote_name = cursor.db.ops.quote_name
+        columns = ', '.join(quote_name(field.column) for field in fields)
+
+        started = time.perf_counter()
+        rows = source.execute(
+            f'SELECT {columns} FROM {quote_name(meta.db_table)} ORDER BY {quote_name(meta.pk.column)}'
+        )
+        copy_sql = f'COPY {quote_name(meta.db_table)} ({columns}) FROM STDIN'
+        count = 0
+        while True:
+            chunk = rows.fetchmany(chunk_size)
+            if not chunk:
+                break
+            with cursor.copy(copy_sql) as copy:
+                for row in chunk:
+                    copy.write_row([
+                        convert(value) if convert and value is not None else value
+                        for value, convert in zip(row, converters)
+                    ])
+            count += len(chunk)
+
+        cursor.execute(f'SELECT COUNT(*) FROM {quote_name(meta.db_table)}')
+        copied = cursor.fetchone()[0]
+        if copied != count:
+            raise CommandError(f'{meta.db_table}: {count} rows read but {copied} stored')
+
+        self.stdout.write(f'{meta.db_table}: {count} rows in {time.perf_counter() - started:.1f}s')
+        return count
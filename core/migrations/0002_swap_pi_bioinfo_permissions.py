@@ -12,8 +12,12 @@ def swap_permissions(apps, schema_editor):
     - Bioinformatician gets CRUD permissions
     """
     # Get the groups
-    pi_group = Group.objects.get(name='PI')
-    bioinfo_group = Group.objects.get(name='Bioinformatician')
+    try:
+        pi_group = Group.objects.get(name='PI')
+        bioinfo_group = Group.objects.get(name='Bioinformatician')
+    except Group.DoesNotExist:
+        # Fresh database: the groups are created by init_groups after migration
+        return
     
     # Clear existing permissions
     pi_group.permissions.clear()
@@ -71,8 +75,12 @@ def reverse_swap_permissions(apps, schema_editor):
     - Bioinformatician becomes read-only again
     """
     # Get the groups
-    pi_group = Group.objects.get(name='PI')
-    bioinfo_group = Group.objects.get(name='Bioinformatician')
+    try:
+        pi_group = Group.objects.get(name='PI')
+        bioinfo_group = Group.objects.get(name='Bioinformatician')
+    except Group.DoesNotExist:
+        # Fresh database: the groups are created by init_groups after migration
+        return
     
     # Clear existing permissions
     pi_group.permissions.clear()
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:46
+
+from django.db import migrations, models
+
+
+def populate_case_counters(apps, schema_editor):
+    """Fill the new counters from the existing accessions and comments."""
+    from core.models import case_counter_expressions
+    
+    Case = apps.get_model('core', 'Case')
+    Case.objects.update(**case_counter_expressions(
+        accession_model=apps.get_model('core', 'Accession'),
+        comment_model=apps.get_model('core', 'Comment'),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_auto_20250721_1553'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='case',
+            name='accessions_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='case',
+            name='comments_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_case_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_project_stats(apps, schema_editor):
+    """Count the existing cases into the new rollup."""
+    from core.stats import rebuild_project_stats
+    
+    rebuild_project_stats(
+        case_model=apps.get_model('core', 'Case'),
+        stats_model=apps.get_model('core', 'ProjectStats'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_case_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('created', 'Created'), ('received', 'Received'), ('incomplete', 'Incomplete'), ('unknown', 'Unknown'), ('library_prepped', 'Library Prepped'), ('sequenced', 'Sequenced'), ('transferred_to_nfl', 'Transferred to NFL'), ('bioinfo_analysis', 'Bioinfo Analysis'), ('completed', 'Completed')], max_length=50)),
+                ('tier', models.CharField(choices=[('A', 'A'), ('B', 'B'), ('FAIL', 'FAIL')], max_length=4)),
+                ('count', models.IntegerField(default=0)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='core.project')),
+            ],
+            options={
+                'verbose_name': 'Project Statistics',
+                'verbose_name_plural': 'Project Statistics',
+                'constraints': [models.UniqueConstraint(fields=('project', 'status', 'tier'), name='unique_project_stats')],
+            },
+        ),
+        migrations.RunPython(populate_project_stats, migrations.RunPython.noop),
+    ]
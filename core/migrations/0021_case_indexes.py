@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:52
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def rename_duplicate_cases(apps, schema_editor):
+    """
+    Make case names unique within each project before adding the constraint.
+    The oldest case keeps its name; the others are renamed
+    "<name> (duplicate <id>)" so no data is lost and they can be merged by hand.
+    """
+    Case = apps.get_model('core', 'Case')
+    max_length = Case._meta.get_field('name').max_length
+    
+    duplicates = Case.objects.values('project_id', 'name').annotate(
+        total=Count('id'), first_id=Min('id')
+    ).filter(total__gt=1).order_by()
+    
+    for duplicate in duplicates:
+        extra_cases = Case.objects.filter(
+            project_id=duplicate['project_id'], name=duplicate['name']
+        ).exclude(id=duplicate['first_id'])
+        for case_id in extra_cases.values_list('id', flat=True):
+            suffix = f' (duplicate {case_id})'
+            new_name = duplicate['name'][:max_length - len(suffix)] + suffix
+            Case.objects.filter(id=case_id).update(name=new_name)
+            print(f"Renamed case {case_id} of project {duplicate['project_id']} to '{new_name}'")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_project_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['project', 'status'], name='case_project_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['project', 'tier'], name='case_project_tier_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['project', 'created_at', 'id'], name='case_project_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['created_at', 'id'], name='case_created_idx'),
+        ),
+        migrations.RunPython(rename_duplicate_cases, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='case',
+            constraint=models.UniqueConstraint(fields=('project', 'name'), name='unique_case_name_per_project'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:05
+
+from django.db import migrations
+
+# name__icontains filters of the project list and case list (home,
+# project_detail and the API). Django runs them as
+# UPPER("name"::text) LIKE UPPER('%...%'), so the index is on that expression.
+TRIGRAM_INDEXES = [
+    ('case_name_trgm_idx', 'core_case', 'name'),
+    ('project_name_trgm_idx', 'core_project', 'name'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """GIN trigram indexes, on PostgreSQL only; SQLite has no equivalent."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_case_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,79 @@
+from django.db import migrations
+
+# Full-text indexes of core.search. On SQLite, one FTS5 table per source,
+# with the row ids of the source table, kept in step by triggers.
+SQLITE_INDEXES = [
+    # (FTS5 table, source table, indexed columns, extra FTS5 columns of the source row)
+    ('core_search_case', 'core_case', ['name', 'other_id'], []),
+    ('core_search_accession', 'core_accession', ['accession_number'], ['case_id']),
+    ('core_search_comment', 'core_comment', ['text'], ['case_id']),
+]
+
+
+def sqlite_create_statements(indexes=SQLITE_INDEXES):
+    """The FTS5 tables, their triggers, and the rows written before them."""
+    statements = []
+    for index, table, indexed, stored in indexes:
+        columns = indexed + [f'{column} UNINDEXED' for column in stored]
+        statements.append(
+            f"CREATE VIRTUAL TABLE {index} USING fts5({', '.join(columns)}, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        names = ', '.join(['rowid'] + indexed + stored)
+        values = ', '.join(f'new.{column}' for column in ['id'] + indexed + stored)
+        insert = f'INSERT INTO {index} ({names}) VALUES ({values});'
+        delete = f'DELETE FROM {index} WHERE rowid = old.id;'
+        statements += [
+            f'CREATE TRIGGER {index}_insert AFTER INSERT ON {table} BEGIN {insert} END',
+            f"CREATE TRIGGER {index}_update AFTER UPDATE OF {', '.join(indexed + stored)} ON {table} "
+            f'BEGIN {delete} {insert} END',
+            f'CREATE TRIGGER {index}_delete AFTER DELETE ON {table} BEGIN {delete} END',
+            f"INSERT INTO {index} ({names}) SELECT {', '.join(['id'] + indexed + stored)} FROM {table}",
+        ]
+    return statements
+
+
+def sqlite_drop_statements(indexes=SQLITE_INDEXES):
+    statements = []
+    for index, table, indexed, stored in indexes:
+        statements += [f'DROP TRIGGER IF EXISTS {index}_{event}' for event in ('insert', 'update', 'delete')]
+        statements.append(f'DROP TABLE IF EXISTS {index}')
+    return statements
+
+
+# On PostgreSQL, GIN indexes on the documents that core.search queries; the
+# expressions must stay the same as there
+POSTGRESQL_INDEXES = [
+    ('case_search_idx', 'core_case', "to_tsvector('simple', name || ' ' || coalesce(other_id, ''))"),
+    ('accession_search_idx', 'core_accession', "to_tsvector('simple', accession_number)"),
+    ('comment_search_idx', 'core_comment', "to_tsvector('simple', text)"),
+]
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for name, table, document in POSTGRESQL_INDEXES:
+            schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin (({document}))')
+    elif schema_editor.connection.vendor == 'sqlite':
+        for statement in sqlite_create_statements():
+            schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for name, table, document in POSTGRESQL_INDEXES:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+    elif schema_editor.connection.vendor == 'sqlite':
+        for statement in sqlite_drop_statements():
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_jobs'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,56 @@
+import importlib
+
+from django.db import migrations, models
+from django.db.models import Count, F, Min
+
+search_index = importlib.import_module('core.migrations.0024_search_index')
+
+
+def remove_duplicate_accessions(apps, schema_editor):
+    """
+    Keep one row of each accession number within a case before adding the
+    constraint. The extra rows hold nothing more than the first one.
+    """
+    Accession = apps.get_model('core', 'Accession')
+    Case = apps.get_model('core', 'Case')
+    
+    duplicates = Accession.objects.values('case_id', 'accession_number').annotate(
+        total=Count('id'), first_id=Min('id')
+    ).filter(total__gt=1).order_by()
+    
+    for duplicate in duplicates:
+        deleted, _ = Accession.objects.filter(
+            case_id=duplicate['case_id'], accession_number=duplicate['accession_number']
+        ).exclude(id=duplicate['first_id']).delete()
+        Case.objects.filter(id=duplicate['case_id']).update(accessions_count=F('accessions_count') - deleted)
+        print(f"Removed {deleted} duplicate accessions '{duplicate['accession_number']}' of case {duplicate['case_id']}")
+
+
+def restore_search_index(apps, schema_editor):
+    """
+    SQLite adds the constraint by rebuilding core_accession, which drops its
+    search triggers: the accession search table is created again.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    indexes = [index for index in search_index.SQLITE_INDEXES if index[1] == 'core_accession']
+    for statement in search_index.sqlite_drop_statements(indexes) + search_index.sqlite_create_statements(indexes):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_search_index'),
+    ]
+
+    operations = [
+        # Removing the constraint rebuilds the table too
+        migrations.RunPython(migrations.RunPython.noop, restore_search_index),
+        migrations.RunPython(remove_duplicate_accessions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='accession',
+            constraint=models.UniqueConstraint(fields=('accession_number', 'case'), name='unique_accession_per_case'),
+        ),
+        migrations.RunPython(restore_search_index, migrations.RunPython.noop),
+    ]
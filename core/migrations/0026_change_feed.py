@@ -0,0 +1,142 @@
+from django.db import migrations, models
+
+# Tables whose writes are recorded in core_change by triggers, in the order
+# their rows are backfilled: (kind, table, parent id column)
+CHANGE_SOURCES = [
+    ('project', 'core_project', None),
+    ('case', 'core_case', 'project_id'),
+    ('accession', 'core_accession', 'case_id'),
+    ('comment', 'core_comment', 'case_id'),
+]
+
+
+def sqlite_create_statements(sources=CHANGE_SOURCES):
+    """
+    The triggers of the change feed. A change replaces the previous change of
+    its row, with a new seq: the row is deleted and inserted again, as an
+    INSERT OR REPLACE would take the conflict policy of the statement that
+    fired the trigger (INSERT OR IGNORE of bulk_create(ignore_conflicts=True)).
+    """
+    statements = []
+    for kind, table, parent in sources:
+        for event, row, deleted in (('insert', 'new', 0), ('update', 'new', 0), ('delete', 'old', 1)):
+            parent_id = f'{row}.{parent}' if parent else 'NULL'
+            statements.append(
+                f'CREATE TRIGGER core_change_{kind}_{event} AFTER {event.upper()} ON {table} BEGIN '
+                f"DELETE FROM core_change WHERE kind = '{kind}' AND object_id = {row}.id; "
+                'INSERT INTO core_change (kind, object_id, parent_id, deleted, changed_at) '
+                f"VALUES ('{kind}', {row}.id, {parent_id}, {deleted}, strftime('%Y-%m-%d %H:%M:%f', 'now')); "
+                'END'
+            )
+    return statements
+
+
+def sqlite_drop_statements(sources=CHANGE_SOURCES):
+    return [
+        f'DROP TRIGGER IF EXISTS core_change_{kind}_{event}'
+        for kind, table, parent in sources
+        for event in ('insert', 'update', 'delete')
+    ]
+
+
+# On PostgreSQL, one trigger function for the four tables. The advisory lock
+# makes writers of changes take their seq one transaction at a time, so a
+# reader that has seen seq n never sees a smaller one commit later.
+POSTGRESQL_FUNCTION = """
+CREATE OR REPLACE FUNCTION core_record_change() RETURNS trigger AS $$
+DECLARE
+    changed record;
+    parent bigint;
+BEGIN
+    PERFORM pg_advisory_xact_lock(7243010);
+    IF TG_OP = 'DELETE' THEN
+        changed := OLD;
+    ELSE
+        changed := NEW;
+    END IF;
+    IF TG_ARGV[1] IS NOT NULL THEN
+        parent := (to_jsonb(changed) ->> TG_ARGV[1])::bigint;
+    END IF;
+    INSERT INTO core_change (kind, object_id, parent_id, deleted, changed_at)
+    VALUES (TG_ARGV[0], changed.id, parent, TG_OP = 'DELETE', now())
+    ON CONFLICT (kind, object_id) DO UPDATE
+    SET seq = EXCLUDED.seq, parent_id = EXCLUDED.parent_id,
+        deleted = EXCLUDED.deleted, changed_at = EXCLUDED.changed_at;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def postgresql_create_statements(sources=CHANGE_SOURCES):
+    statements = [POSTGRESQL_FUNCTION]
+    for kind, table, parent in sources:
+        arguments = f"'{kind}', '{parent}'" if parent else f"'{kind}'"
+        statements.append(
+            f'CREATE TRIGGER core_change_{kind} AFTER INSERT OR UPDATE OR DELETE ON {table} '
+            f'FOR EACH ROW EXECUTE FUNCTION core_record_change({arguments})'
+        )
+    return statements
+
+
+def postgresql_drop_statements(sources=CHANGE_SOURCES):
+    statements = [f'DROP TRIGGER IF EXISTS core_change_{kind} ON {table}' for kind, table, parent in sources]
+    return statements + ['DROP FUNCTION IF EXISTS core_record_change()']
+
+
+def backfill_statements(sources=CHANGE_SOURCES):
+    """A change for each row written before the triggers, by table and id."""
+    return [
+        'INSERT INTO core_change (kind, object_id, parent_id, deleted, changed_at) '
+        f"SELECT '{kind}', id, {parent or 'NULL'}, false, CURRENT_TIMESTAMP FROM {table} ORDER BY id"
+        for kind, table, parent in sources
+    ]
+
+
+def create_change_triggers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        statements = postgresql_create_statements()
+    elif vendor == 'sqlite':
+        statements = sqlite_create_statements()
+    else:
+        return
+    for statement in backfill_statements() + statements:
+        schema_editor.execute(statement)
+
+
+def drop_change_triggers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        statements = postgresql_drop_statements()
+    elif vendor == 'sqlite':
+        statements = sqlite_drop_statements()
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_accession_number_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('parent_id', models.BigIntegerField(null=True)),
+                ('deleted', models.BooleanField(default=False)),
+                ('changed_at', models.DateTimeField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_change_per_object')],
+            },
+        ),
+        migrations.RunPython(create_change_triggers, drop_change_triggers),
+    ]
@@ -0,0 +1,115 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The log is appended to by triggers on core_case, so that every path that
+# writes a status (forms, API, imports, bulk updates of querysets) records it.
+# SQLite stores a DurationField as microseconds.
+SQLITE_STATEMENTS = [
+    """
+    CREATE TRIGGER core_casetransition_insert AFTER INSERT ON core_case BEGIN
+        INSERT INTO core_casetransition (case_id, project_id, from_status, to_status, changed_at, time_in_previous)
+        VALUES (new.id, new.project_id, '', new.status, strftime('%Y-%m-%d %H:%M:%f', 'now'), NULL);
+    END
+    """,
+    """
+    CREATE TRIGGER core_casetransition_update AFTER UPDATE OF status ON core_case
+    WHEN old.status <> new.status BEGIN
+        INSERT INTO core_casetransition (case_id, project_id, from_status, to_status, changed_at, time_in_previous)
+        VALUES (
+            new.id, new.project_id, old.status, new.status, strftime('%Y-%m-%d %H:%M:%f', 'now'),
+            (SELECT CAST(round((julianday('now') - julianday(changed_at)) * 86400000000) AS INTEGER)
+             FROM core_casetransition WHERE case_id = new.id ORDER BY changed_at DESC, id DESC LIMIT 1)
+        );
+    END
+    """,
+]
+
+SQLITE_DROP_STATEMENTS = [
+    'DROP TRIGGER IF EXISTS core_casetransition_insert',
+    'DROP TRIGGER IF EXISTS core_casetransition_update',
+]
+
+POSTGRESQL_STATEMENTS = [
+    """
+    CREATE OR REPLACE FUNCTION core_record_case_transition() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO core_casetransition (case_id, project_id, from_status, to_status, changed_at, time_in_previous)
+            VALUES (NEW.id, NEW.project_id, '', NEW.status, clock_timestamp(), NULL);
+        ELSIF NEW.status IS DISTINCT FROM OLD.status THEN
+            INSERT INTO core_casetransition (case_id, project_id, from_status, to_status, changed_at, time_in_previous)
+            VALUES (
+                NEW.id, NEW.project_id, OLD.status, NEW.status, clock_timestamp(),
+                clock_timestamp() - (SELECT changed_at FROM core_casetransition WHERE case_id = NEW.id
+                                     ORDER BY changed_at DESC, id DESC LIMIT 1)
+            );
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    'CREATE TRIGGER core_case_transition AFTER INSERT OR UPDATE OF status ON core_case '
+    'FOR EACH ROW EXECUTE FUNCTION core_record_case_transition()',
+]
+
+POSTGRESQL_DROP_STATEMENTS = [
+    'DROP TRIGGER IF EXISTS core_case_transition ON core_case',
+    'DROP FUNCTION IF EXISTS core_record_case_transition()',
+]
+
+# Cases written before the log entered their status at the latest when they
+# were last written
+BACKFILL_STATEMENT = """
+    INSERT INTO core_casetransition (case_id, project_id, from_status, to_status, changed_at, time_in_previous)
+    SELECT id, project_id, '', status, updated_at, NULL FROM core_case ORDER BY id
+"""
+
+
+def create_transition_triggers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        statements = POSTGRESQL_STATEMENTS
+    elif vendor == 'sqlite':
+        statements = SQLITE_STATEMENTS
+    else:
+        return
+    for statement in [BACKFILL_STATEMENT] + statements:
+        schema_editor.execute(statement)
+
+
+def drop_transition_triggers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        statements = POSTGRESQL_DROP_STATEMENTS
+    elif vendor == 'sqlite':
+        statements = SQLITE_DROP_STATEMENTS
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CaseTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(blank=True, choices=[('created', 'Created'), ('received', 'Received'), ('incomplete', 'Incomplete'), ('unknown', 'Unknown'), ('library_prepped', 'Library Prepped'), ('sequenced', 'Sequenced'), ('transferred_to_nfl', 'Transferred to NFL'), ('bioinfo_analysis', 'Bioinfo Analysis'), ('completed', 'Completed')], max_length=50)),
+                ('to_status', models.CharField(choices=[('created', 'Created'), ('received', 'Received'), ('incomplete', 'Incomplete'), ('unknown', 'Unknown'), ('library_prepped', 'Library Prepped'), ('sequenced', 'Sequenced'), ('transferred_to_nfl', 'Transferred to NFL'), ('bioinfo_analysis', 'Bioinfo Analysis'), ('completed', 'Completed')], max_length=50)),
+                ('changed_at', models.DateTimeField()),
+                ('time_in_previous', models.DurationField(null=True)),
+                ('case', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='transitions', to='core.case')),
+                ('project', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.project')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['case', 'changed_at'], name='transition_case_idx'), models.Index(fields=['changed_at', 'project', 'from_status', 'to_status', 'time_in_previous'], name='transition_report_idx'), models.Index(fields=['project', 'changed_at', 'from_status', 'to_status', 'time_in_previous'], name='transition_project_idx')],
+            },
+        ),
+        migrations.RunPython(create_transition_triggers, drop_transition_triggers),
+    ]
@@ -0,0 +1,196 @@
+import importlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+transitions_migration = importlib.import_module('core.migrations.0027_case_transitions')
+
+# The case triggers of 0027, now recording the tier of the case
+SQLITE_TRANSITION_STATEMENTS = [
+    """
+    CREATE TRIGGER core_casetransition_insert AFTER INSERT ON core_case BEGIN
+        INSERT INTO core_casetransition (case_id, project_id, from_status, to_status, tier, changed_at, time_in_previous)
+        VALUES (new.id, new.project_id, '', new.status, new.tier, strftime('%Y-%m-%d %H:%M:%f', 'now'), NULL);
+    END
+    """,
+    """
+    CREATE TRIGGER core_casetransition_update AFTER UPDATE OF status ON core_case
+    WHEN old.status <> new.status BEGIN
+        INSERT INTO core_casetransition (case_id, project_id, from_status, to_status, tier, changed_at, time_in_previous)
+        VALUES (
+            new.id, new.project_id, old.status, new.status, new.tier, strftime('%Y-%m-%d %H:%M:%f', 'now'),
+            (SELECT CAST(round((julianday('now') - julianday(changed_at)) * 86400000000) AS INTEGER)
+             FROM core_casetransition WHERE case_id = new.id ORDER BY changed_at DESC, id DESC LIMIT 1)
+        );
+    END
+    """,
+]
+
+POSTGRESQL_TRANSITION_FUNCTION = """
+    CREATE OR REPLACE FUNCTION core_record_case_transition() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO core_casetransition (case_id, project_id, from_status, to_status, tier, changed_at, time_in_previous)
+            VALUES (NEW.id, NEW.project_id, '', NEW.status, NEW.tier, clock_timestamp(), NULL);
+        ELSIF NEW.status IS DISTINCT FROM OLD.status THEN
+            INSERT INTO core_casetransition (case_id, project_id, from_status, to_status, tier, changed_at, time_in_previous)
+            VALUES (
+                NEW.id, NEW.project_id, OLD.status, NEW.status, NEW.tier, clock_timestamp(),
+                clock_timestamp() - (SELECT changed_at FROM core_casetransition WHERE case_id = NEW.id
+                                     ORDER BY changed_at DESC, id DESC LIMIT 1)
+            );
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+# First day of the day and week of a transition, in UTC; weeks start on Monday
+BUCKETS = {
+    'sqlite': {
+        'day': 'date({changed_at})',
+        'week': "date({changed_at}, 'weekday 0', '-6 days')",
+    },
+    'postgresql': {
+        'day': "({changed_at} AT TIME ZONE 'UTC')::date",
+        'week': "date_trunc('week', {changed_at} AT TIME ZONE 'UTC')::date",
+    },
+}
+
+ROLLUP_KEY = 'period, bucket, project_id, status, tier'
+
+
+def rollup_statements(vendor, where='true'):
+    """Add the transitions matching ``where`` to the rollup, one statement per period."""
+    return [
+        f'INSERT INTO core_transitionrollup ({ROLLUP_KEY}, count) '
+        f"SELECT '{period}', {bucket.format(changed_at='changed_at')}, project_id, to_status, tier, count(*) "
+        f'FROM core_casetransition WHERE {where} GROUP BY 2, project_id, to_status, tier '
+        f'ON CONFLICT ({ROLLUP_KEY}) DO UPDATE SET count = core_transitionrollup.count + excluded.count'
+        for period, bucket in BUCKETS[vendor].items()
+    ]
+
+
+def _count_statements(vendor, row):
+    """Add a transition to its rollup rows, or take it away."""
+    buckets = BUCKETS[vendor]
+    if row == 'new':
+        return [
+            f'INSERT INTO core_transitionrollup ({ROLLUP_KEY}, count) '
+            f"VALUES ('{period}', {bucket.format(changed_at='new.changed_at')}, new.project_id, new.to_status, new.tier, 1) "
+            f'ON CONFLICT ({ROLLUP_KEY}) DO UPDATE SET count = core_transitionrollup.count + 1;'
+            for period, bucket in buckets.items()
+        ]
+    return [
+        'UPDATE core_transitionrollup SET count = count - 1 '
+        f"WHERE period = '{period}' AND bucket = {bucket.format(changed_at='old.changed_at')} "
+        'AND project_id = old.project_id AND status = old.to_status AND tier = old.tier;'
+        for period, bucket in buckets.items()
+    ]
+
+
+def sqlite_statements():
+    return SQLITE_TRANSITION_STATEMENTS + [
+        f"CREATE TRIGGER core_transitionrollup_{event} AFTER {event.upper()} ON core_casetransition "
+        f"BEGIN {' '.join(_count_statements('sqlite', row))} END"
+        for event, row in (('insert', 'new'), ('delete', 'old'))
+    ]
+
+
+def postgresql_statements():
+    return [
+        POSTGRESQL_TRANSITION_FUNCTION,
+        f"""
+        CREATE OR REPLACE FUNCTION core_record_transition_rollup() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                {' '.join(_count_statements('postgresql', 'new'))}
+            ELSE
+                {' '.join(_count_statements('postgresql', 'old'))}
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        'CREATE TRIGGER core_transition_rollup AFTER INSERT OR DELETE ON core_casetransition '
+        'FOR EACH ROW EXECUTE FUNCTION core_record_transition_rollup()',
+    ]
+
+
+def drop_case_triggers(apps, schema_editor):
+    # Adding the tier rebuilds core_casetransition on SQLite, which fails
+    # while triggers on core_case write to it
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in transitions_migration.SQLITE_DROP_STATEMENTS:
+            schema_editor.execute(statement)
+
+
+def restore_case_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in transitions_migration.SQLITE_STATEMENTS:
+            schema_editor.execute(statement)
+
+
+def create_rollup_triggers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in BUCKETS:
+        return
+    # Transitions logged before take the current tier of their case
+    schema_editor.execute(
+        'UPDATE core_casetransition SET tier = (SELECT tier FROM core_case WHERE core_case.id = case_id)'
+    )
+    statements = sqlite_statements() if vendor == 'sqlite' else postgresql_statements()
+    for statement in statements + rollup_statements(vendor):
+        schema_editor.execute(statement)
+
+
+def drop_rollup_triggers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        statements = [
+            'DROP TRIGGER IF EXISTS core_transitionrollup_insert',
+            'DROP TRIGGER IF EXISTS core_transitionrollup_delete',
+        ] + transitions_migration.SQLITE_DROP_STATEMENTS
+    elif vendor == 'postgresql':
+        statements = [
+            'DROP TRIGGER IF EXISTS core_transition_rollup ON core_casetransition',
+            'DROP FUNCTION IF EXISTS core_record_transition_rollup()',
+            transitions_migration.POSTGRESQL_STATEMENTS[0],
+        ]
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_case_transitions'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_case_triggers, restore_case_triggers),
+        migrations.AddField(
+            model_name='casetransition',
+            name='tier',
+            field=models.CharField(blank=True, choices=[('A', 'A'), ('B', 'B'), ('FAIL', 'FAIL')], default='', max_length=4),
+        ),
+        migrations.CreateModel(
+            name='TransitionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('week', 'Week')], max_length=4)),
+                ('bucket', models.DateField()),
+                ('status', models.CharField(choices=[('created', 'Created'), ('received', 'Received'), ('incomplete', 'Incomplete'), ('unknown', 'Unknown'), ('library_prepped', 'Library Prepped'), ('sequenced', 'Sequenced'), ('transferred_to_nfl', 'Transferred to NFL'), ('bioinfo_analysis', 'Bioinfo Analysis'), ('completed', 'Completed')], max_length=50)),
+                ('tier', models.CharField(blank=True, choices=[('A', 'A'), ('B', 'B'), ('FAIL', 'FAIL')], max_length=4)),
+                ('count', models.IntegerField(default=0)),
+                ('project', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.project')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['project', 'period', 'bucket'], name='rollup_project_idx')],
+                'constraints': [models.UniqueConstraint(fields=('period', 'bucket', 'project', 'status', 'tier'), name='unique_transition_rollup')],
+            },
+        ),
+        migrations.RunPython(create_rollup_triggers, drop_rollup_triggers),
+    ]
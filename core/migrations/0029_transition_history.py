@@ -0,0 +1,37 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+from core.triggers import create_sqlite_triggers, drop_sqlite_triggers
+
+
+class Migration(migrations.Migration):
+    """
+    Keep the status log and its rollups when a case or a project is deleted.
+    Without their foreign key constraints, SQLite rebuilds both tables, which
+    drops the rollup triggers of the log: every set is dropped before and
+    created again after.
+    """
+
+    dependencies = [
+        ('core', '0028_transition_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_sqlite_triggers, create_sqlite_triggers),
+        migrations.AlterField(
+            model_name='casetransition',
+            name='case',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='transitions', to='core.case'),
+        ),
+        migrations.AlterField(
+            model_name='casetransition',
+            name='project',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.project'),
+        ),
+        migrations.AlterField(
+            model_name='transitionrollup',
+            name='project',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.project'),
+        ),
+        migrations.RunPython(create_sqlite_triggers, drop_sqlite_triggers),
+    ]
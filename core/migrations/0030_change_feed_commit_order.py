@@ -0,0 +1,95 @@
+import importlib
+
+from django.db import migrations
+
+change_migration = importlib.import_module('core.migrations.0026_change_feed')
+
+# On PostgreSQL, 0026 took a global advisory lock in the row trigger, held
+# until commit: every transaction writing projects, cases, accessions or
+# comments waited for the whole of the one before it. The row trigger now
+# records a change with a provisional negative seq and no lock. A deferred
+# constraint trigger gives the transaction's changes their seq at commit,
+# under the lock, which is then held only from that renumbering to the end of
+# the commit. A reader still never sees a seq commit below one it has read.
+POSTGRESQL_FUNCTION = """
+CREATE OR REPLACE FUNCTION core_record_change() RETURNS trigger AS $$
+DECLARE
+    changed record;
+    parent bigint;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed := OLD;
+    ELSE
+        changed := NEW;
+    END IF;
+    IF TG_ARGV[1] IS NOT NULL THEN
+        parent := (to_jsonb(changed) ->> TG_ARGV[1])::bigint;
+    END IF;
+    INSERT INTO core_change (seq, kind, object_id, parent_id, deleted, changed_at)
+    VALUES (-nextval(pg_get_serial_sequence('core_change', 'seq')), TG_ARGV[0], changed.id, parent,
+            TG_OP = 'DELETE', now())
+    ON CONFLICT (kind, object_id) DO UPDATE
+    SET seq = EXCLUDED.seq, parent_id = EXCLUDED.parent_id,
+        deleted = EXCLUDED.deleted, changed_at = EXCLUDED.changed_at;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+# The only negative seqs a transaction sees are its own: the others renumber
+# theirs before they commit. The first deferred event renumbers them all, in
+# the order they were written; the next ones find nothing to do.
+POSTGRESQL_SEQUENCE_FUNCTION = """
+CREATE OR REPLACE FUNCTION core_sequence_changes() RETURNS trigger AS $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM core_change WHERE seq < 0) THEN
+        PERFORM pg_advisory_xact_lock(7243010);
+        UPDATE core_change SET seq = numbered.seq
+        FROM (
+            SELECT pending.seq AS provisional, nextval(pg_get_serial_sequence('core_change', 'seq')) AS seq
+            FROM (SELECT seq FROM core_change WHERE seq < 0 ORDER BY seq DESC) pending
+        ) numbered
+        WHERE core_change.seq = numbered.provisional;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def postgresql_create_statements(sources=change_migration.CHANGE_SOURCES):
+    statements = [POSTGRESQL_FUNCTION, POSTGRESQL_SEQUENCE_FUNCTION]
+    for kind, table, parent in sources:
+        statements.append(
+            f'CREATE CONSTRAINT TRIGGER core_change_{kind}_seq AFTER INSERT OR UPDATE OR DELETE ON {table} '
+            'DEFERRABLE INITIALLY DEFERRED FOR EACH ROW EXECUTE FUNCTION core_sequence_changes()'
+        )
+    return statements
+
+
+def postgresql_drop_statements(sources=change_migration.CHANGE_SOURCES):
+    statements = [f'DROP TRIGGER IF EXISTS core_change_{kind}_seq ON {table}' for kind, table, parent in sources]
+    return statements + ['DROP FUNCTION IF EXISTS core_sequence_changes()']
+
+
+def order_changes_at_commit(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for statement in postgresql_create_statements():
+            schema_editor.execute(statement)
+
+
+def lock_changes_per_transaction(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for statement in postgresql_drop_statements() + [change_migration.POSTGRESQL_FUNCTION]:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_transition_history'),
+    ]
+
+    operations = [
+        migrations.RunPython(order_changes_at_commit, lock_changes_per_transaction),
+    ]
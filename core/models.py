@@ -1,7 +1,13 @@
-from django.db import models
+from collections import Counter
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User, Group
 from django.utils.translation import gettext_lazy as _
 
+from .fragments import invalidate_case_lists, invalidate_names
+
 class ProjectLead(models.Model):
     """Model representing a project lead in the LIMS."""
     name = models.CharField(max_length=255, unique=True)
@@ -93,10 +99,74 @@ class Case(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Denormalized counters, maintained by Accession/Comment writes
+    accessions_count = models.IntegerField(default=0, editable=False)
+    comments_count = models.IntegerField(default=0, editable=False)
+    
+    COUNTER_FIELDS = ['accessions_count', 'comments_count']
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'name'], name='unique_case_name_per_project'),
+        ]
+        indexes = [
+            # Filters and statistics of the project detail page
+            models.Index(fields=['project', 'status'], name='case_project_status_idx'),
+            models.Index(fields=['project', 'tier'], name='case_project_tier_idx'),
+            # Keyset pagination on (-created_at, -id), per project and overall
+            models.Index(fields=['project', 'created_at', 'id'], name='case_project_created_idx'),
+            models.Index(fields=['created_at', 'id'], name='case_created_idx'),
+        ]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the stored values, so saves and deletes know what changed."""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+    
+    def get_stats_key(self):
+        """The ProjectStats row this case is counted in."""
+        return (self.project_id, self.status, self.tier)
+    
+    def get_loaded_stats_key(self):
+        """The ProjectStats row this case was counted in when loaded, or None if unknown."""
+        loaded = getattr(self, '_loaded_values', {})
+        if not all(name in loaded for name in ('project_id', 'status', 'tier')):
+            return None
+        return (loaded['project_id'], loaded['status'], loaded['tier'])
+    
     def save(self, *args, **kwargs):
         """Override save method to calculate tier based on coverage values."""
         self.tier = self.calculate_tier()
-        super().save(*args, **kwargs)
+        
+        # Never write back counters that may have changed since this case was loaded
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        
+        with transaction.atomic():
+            stats_deltas = Counter()
+            if not self._state.adding:
+                # The stored row rather than the values this instance loaded, which
+                # a concurrent save may have changed since. The row stays locked
+                # until the UPDATE (on SQLite, the write transaction holds the lock).
+                previous_key = Case.objects.select_for_update().filter(pk=self.pk).values_list(
+                    'project_id', 'status', 'tier'
+                ).first()
+                if previous_key is not None:
+                    stats_deltas[previous_key] -= 1
+            
+            super().save(*args, **kwargs)
+            
+            stats_deltas[self.get_stats_key()] += 1
+            record_case_stats(stats_deltas)
+            # Both projects when the case moved
+            invalidate_case_lists({project_id for project_id, status, tier in stats_deltas})
+        
+        self._loaded_values = {field.attname: getattr(self, field.attname) for field in self._meta.concrete_fields}
     
     def calculate_tier(self):
         """Calculate tier based on coverage values."""
@@ -127,24 +197,315 @@ class Case(models.Model):
     def __str__(self):
         return f"{self.project.name} - {self.name}"
 
-class Accession(models.Model):
+class CaseCountedModel(models.Model):
+    """
+    Base class for rows counted on their case (``Case.accessions_count``,
+    ``Case.comments_count``). The counter is adjusted in the same
+    transaction as the row is saved; deletions are handled by the
+    post_delete receiver below.
+    """
+    case_counter_field = None
+    
+    class Meta:
+        abstract = True
+    
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            adding = self._state.adding
+            previous_case_id = None
+            if not adding:
+                previous_case_id = type(self)._default_manager.filter(pk=self.pk).values_list('case_id', flat=True).first()
+            
+            super().save(*args, **kwargs)
+            
+            if adding:
+                increment_case_counters(self.case_counter_field, {self.case_id: 1})
+            elif previous_case_id is not None and previous_case_id != self.case_id:
+                # Row moved to another case
+                increment_case_counters(self.case_counter_field, {previous_case_id: -1, self.case_id: 1})
+            
+            # The counter on the case card, or the row nested in the API
+            # case, changed
+            invalidate_case_lists(Case.objects.filter(pk__in=[self.case_id, previous_case_id]).values_list('project_id', flat=True))
+
+class Accession(CaseCountedModel):
     """Model to store accession numbers for a case."""
     case = models.ForeignKey(Case, on_delete=models.CASCADE, related_name='accessions')
     accession_number = models.CharField(max_length=255)
     
+    case_counter_field = 'accessions_count'
+    
+    class Meta:
+        constraints = [
+            # Also the index of the lookups by number (POST /api/accessions/resolve/)
+            models.UniqueConstraint(fields=['accession_number', 'case'], name='unique_accession_per_case'),
+        ]
+    
     def __str__(self):
         return self.accession_number
 
-class Comment(models.Model):
+class Comment(CaseCountedModel):
     """Model to store comments for a case."""
     case = models.ForeignKey(Case, on_delete=models.CASCADE, related_name='comments')
     text = models.TextField()
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    case_counter_field = 'comments_count'
+    
     def __str__(self):
         return f"Comment by {self.user.username} on {self.case}"
 
+class ProjectStats(models.Model):
+    """
+    Number of cases of a project with a given status and tier.
+    Maintained incrementally by case writes so dashboards never scan the
+    Case table; rebuilt by the reconcile_stats command.
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='stats')
+    status = models.CharField(max_length=50, choices=Case.STATUS_CHOICES)
+    tier = models.CharField(max_length=4, choices=Case.TIER_CHOICES)
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        verbose_name = _('Project Statistics')
+        verbose_name_plural = _('Project Statistics')
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'status', 'tier'], name='unique_project_stats'),
+        ]
+    
+    def __str__(self):
+        return f"{self.project_id} - {self.status} - {self.tier}: {self.count}"
+
+class Job(models.Model):
+    """
+    A long operation (import, batch creation) run in the background by
+    ``manage.py run_jobs``; see ``core.jobs``.
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, _('Queued')),
+        (STATUS_RUNNING, _('Running')),
+        (STATUS_SUCCEEDED, _('Succeeded')),
+        (STATUS_FAILED, _('Failed')),
+    ]
+    
+    kind = models.CharField(max_length=50)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    # Arguments of the job's handler, and an uploaded file it reads
+    params = models.JSONField(default=dict)
+    input_text = models.TextField(blank=True)
+    progress_done = models.IntegerField(default=0)
+    progress_total = models.IntegerField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, null=True, blank=True, related_name='jobs')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            # The runner's queue and the keyset pagination of job lists
+            models.Index(fields=['status', 'created_at', 'id'], name='job_status_created_idx'),
+            models.Index(fields=['created_at', 'id'], name='job_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+    
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_SUCCEEDED, self.STATUS_FAILED)
+    
+    @property
+    def progress_percent(self):
+        """Share of the work done, or None while the total is unknown."""
+        if not self.progress_total:
+            return 100 if self.status == self.STATUS_SUCCEEDED else None
+        return min(100, round(100 * self.progress_done / self.progress_total))
+
+class Change(models.Model):
+    """
+    Last change of a project, case, accession or comment, for the change
+    feed (``core.changes``). Database triggers write it on every insert,
+    update and delete of these tables, with a new ``seq`` each time; a
+    deleted row keeps its change as a tombstone.
+    """
+    KIND_PROJECT = 'project'
+    KIND_CASE = 'case'
+    KIND_ACCESSION = 'accession'
+    KIND_COMMENT = 'comment'
+    
+    seq = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    # Project of a case, case of an accession or comment
+    parent_id = models.BigIntegerField(null=True)
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_change_per_object'),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} {self.object_id} {'deleted' if self.deleted else 'changed'} (#{self.seq})"
+
+class CaseTransition(models.Model):
+    """
+    One status change of a case, appended by database triggers on every
+    insert of a case and every update of its status, with the time the case
+    spent in the status it left; see ``core.transitions``.
+    """
+    # History outlives its case and project: deleting them leaves the
+    # transitions, and the rollups counted from them, in place
+    case = models.ForeignKey(
+        Case, on_delete=models.DO_NOTHING, db_constraint=False, related_name='transitions', db_index=False
+    )
+    # The case's project when its status changed
+    project = models.ForeignKey(
+        Project, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+', db_index=False
+    )
+    # Empty for a new case
+    from_status = models.CharField(max_length=50, choices=Case.STATUS_CHOICES, blank=True)
+    to_status = models.CharField(max_length=50, choices=Case.STATUS_CHOICES)
+    # The case's tier when it entered the status
+    tier = models.CharField(max_length=4, choices=Case.TIER_CHOICES, default='', blank=True)
+    changed_at = models.DateTimeField()
+    # Time since the previous transition of the case; None for a new case
+    time_in_previous = models.DurationField(null=True)
+    
+    class Meta:
+        indexes = [
+            # The previous transition of a case
+            models.Index(fields=['case', 'changed_at'], name='transition_case_idx'),
+            # Reports over a period, for all projects or some: the columns
+            # they aggregate are in the index, so the table is not read
+            models.Index(
+                fields=['changed_at', 'project', 'from_status', 'to_status', 'time_in_previous'],
+                name='transition_report_idx'
+            ),
+            models.Index(
+                fields=['project', 'changed_at', 'from_status', 'to_status', 'time_in_previous'],
+                name='transition_project_idx'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"Case {self.case_id}: {self.from_status or '-'} -> {self.to_status} at {self.changed_at}"
+
+class TransitionRollup(models.Model):
+    """
+    Number of cases of a project that entered a status with a given tier
+    during a day or a week (UTC, weeks from Monday). Kept in step with the
+    CaseTransition log by database triggers, so trend charts read a few
+    rows per period; rebuilt by the rebuild_transition_rollups command.
+    """
+    PERIOD_DAY = 'day'
+    PERIOD_WEEK = 'week'
+    
+    PERIOD_CHOICES = [
+        (PERIOD_DAY, _('Day')),
+        (PERIOD_WEEK, _('Week')),
+    ]
+    
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    # First day of the period
+    bucket = models.DateField()
+    # Kept when the project is deleted, as its transitions are
+    project = models.ForeignKey(
+        Project, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+', db_index=False
+    )
+    status = models.CharField(max_length=50, choices=Case.STATUS_CHOICES)
+    tier = models.CharField(max_length=4, choices=Case.TIER_CHOICES, blank=True)
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            # Also the index of the time series, read by period and bucket
+            models.UniqueConstraint(
+                fields=['period', 'bucket', 'project', 'status', 'tier'], name='unique_transition_rollup'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['project', 'period', 'bucket'], name='rollup_project_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.period} {self.bucket} - {self.project_id} - {self.status} - {self.tier}: {self.count}"
+
+def record_case_stats(deltas):
+    """
+    Apply case count changes to ProjectStats.
+    ``deltas`` maps (project_id, status, tier) to the number of cases added
+    (or removed, when negative). Call it in the transaction that writes the cases.
+    """
+    for (project_id, status, tier), delta in deltas.items():
+        if not delta:
+            continue
+        
+        rows = ProjectStats.objects.filter(project_id=project_id, status=status, tier=tier)
+        if rows.update(count=F('count') + delta):
+            continue
+        
+        try:
+            with transaction.atomic():
+                ProjectStats.objects.create(project_id=project_id, status=status, tier=tier, count=delta)
+        except IntegrityError:
+            # Created by a concurrent write in the meantime
+            rows.update(count=F('count') + delta)
+
+# Case counters
+COUNTER_BATCH_SIZE = 500
+
+def increment_case_counters(field, counts):
+    """
+    Add ``counts[case_id]`` to the ``field`` counter of each case.
+    Used by code that bulk-creates accessions or comments, which bypasses save().
+    Cases receiving the same increment are updated with one statement.
+    """
+    case_ids_by_delta = {}
+    for case_id, delta in counts.items():
+        if delta:
+            case_ids_by_delta.setdefault(delta, []).append(case_id)
+    
+    for delta, case_ids in case_ids_by_delta.items():
+        for start in range(0, len(case_ids), COUNTER_BATCH_SIZE):
+            Case.objects.filter(pk__in=case_ids[start:start + COUNTER_BATCH_SIZE]).update(
+                **{field: F(field) + delta}
+            )
+
+def case_counter_expressions(accession_model=None, comment_model=None):
+    """
+    Correlated subqueries giving the real accession and comment counts of a case.
+    Models can be passed in to use historical models from a migration.
+    """
+    accession_model = accession_model or Accession
+    comment_model = comment_model or Comment
+    
+    def count_of(model):
+        counts = model.objects.filter(case=OuterRef('pk')).order_by().values('case').annotate(count=Count('pk')).values('count')
+        return Coalesce(Subquery(counts), 0)
+    
+    return {
+        'accessions_count': count_of(accession_model),
+        'comments_count': count_of(comment_model),
+    }
+
+def refresh_case_counters(queryset=None):
+    """Recompute the stored counters of the given cases (all by default) with one UPDATE."""
+    if queryset is None:
+        queryset = Case.objects.all()
+    invalidate_case_lists(queryset.values_list('project_id', flat=True).distinct())
+    return queryset.update(**case_counter_expressions())
+
 # Create groups for different user roles
 def create_groups():
     """Create viewer and editor groups if they don't exist."""
@@ -152,7 +513,8 @@ def create_groups():
     Group.objects.get_or_create(name='editor')
 
 # Create a signal to automatically create groups when Django starts
-from django.db.models.signals import post_migrate
+from django.db.models.query import QuerySet
+from django.db.models.signals import post_migrate, post_delete, post_save
 from django.dispatch import receiver
 
 @receiver(post_migrate)
@@ -160,3 +522,58 @@ def init_groups(sender, **kwargs):
     """Initialize groups after migration."""
     if sender.name == 'core':
         create_groups()
+
+def _get_origin_model(origin):
+    """Model of the instance or queryset a deletion started from."""
+    return origin.model if isinstance(origin, QuerySet) else type(origin)
+
+@receiver(post_delete, sender=Case)
+def remove_case_from_stats(sender, instance, origin=None, **kwargs):
+    """Take a deleted case out of the statistics rollup."""
+    if _get_origin_model(origin) is Project:
+        # The project's ProjectStats rows are deleted with it
+        return
+    record_case_stats({instance.get_loaded_stats_key() or instance.get_stats_key(): -1})
+
+@receiver(post_delete, sender=Accession)
+@receiver(post_delete, sender=Comment)
+def decrement_case_counter(sender, instance, origin=None, **kwargs):
+    """Keep the case counter in step when an accession or comment is deleted."""
+    if _get_origin_model(origin) in (Case, Project):
+        # The counter is deleted with the case
+        return
+    increment_case_counters(sender.case_counter_field, {instance.case_id: -1})
+
+@receiver(post_delete, sender=Case)
+@receiver(post_delete, sender=Accession)
+@receiver(post_delete, sender=Comment)
+def invalidate_case_list_on_delete(sender, instance, origin=None, **kwargs):
+    """A case left its project's list, or a counter on its card changed."""
+    if _get_origin_model(origin) is Project or (sender is not Case and _get_origin_model(origin) is Case):
+        # The list is deleted with the project, or updated by the case deletion
+        return
+    if sender is Case:
+        invalidate_case_lists([instance.project_id])
+    else:
+        invalidate_case_lists(Case.objects.filter(pk=instance.case_id).values_list('project_id', flat=True))
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def invalidate_project_case_list(sender, instance, **kwargs):
+    """
+    The project list of the API changed. A new project must also never show
+    fragments cached for an earlier project with the same id (restored
+    backups, tests).
+    """
+    invalidate_case_lists([instance.pk])
+
+@receiver(post_save, sender=ProjectLead)
+@receiver(post_delete, sender=ProjectLead)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_names_in_api(sender, instance, update_fields=None, **kwargs):
+    """Lead and user names are nested in the API projects and cases."""
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        # Every login saves the user
+        return
+    invalidate_names()
@@ -0,0 +1,215 @@
+"""
+Keyset (cursor) pagination for case, comment, accession and project lists.
+
+A page is fetched with ``WHERE created_at <= x AND (created_at < x OR
+(created_at = x AND id < y)) ORDER BY created_at DESC, id DESC LIMIT n``,
+where ``(x, y)`` is the last row seen, instead of an OFFSET. The row value
+comparison ``(created_at, id) < (x, y)`` is spelled out as ORs for the ORM,
+and the leading bound lets the index scan start at the cursor. A deep page
+costs the same as the first one and rows inserted while a client pages
+through a list never shift or repeat the rows it has not seen yet.
+
+Cursors are opaque URL-safe strings holding the ordering values of the row
+the page starts after (or before, when paging backwards).
+"""
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.encoding import force_str
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+# Newest first; ``id`` breaks ties between rows created in the same instant
+KEYSET_ORDERING = ('-created_at', '-id')
+
+# Rows per page, overridable with ?page_size= up to MAX_LIST_PAGE_SIZE
+LIST_PAGE_SIZE = getattr(settings, 'LIST_PAGE_SIZE', 50)
+MAX_LIST_PAGE_SIZE = getattr(settings, 'MAX_LIST_PAGE_SIZE', 500)
+
+
+class InvalidCursor(ValueError):
+    """Raised for a cursor that cannot be decoded for this ordering."""
+
+
+def get_page_size(value, default=LIST_PAGE_SIZE, maximum=MAX_LIST_PAGE_SIZE):
+    """Parse a requested page size, falling back to ``default`` when invalid."""
+    try:
+        page_size = int(value)
+    except (TypeError, ValueError):
+        return default
+    if page_size < 1:
+        return default
+    return min(page_size, maximum)
+
+
+class KeysetPage:
+    """One page of rows with the cursors of its neighbours (None at either end)."""
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset on a unique ordering, such as ``('-created_at', '-id')``.
+    The last ordering field must be unique so every row has a distinct position.
+    """
+
+    def __init__(self, queryset, page_size=LIST_PAGE_SIZE, ordering=KEYSET_ORDERING):
+        self.queryset = queryset
+        self.page_size = page_size
+        self.ordering = tuple(ordering)
+        self.field_names = [name.lstrip('-') for name in self.ordering]
+
+    def get_page(self, cursor=None):
+        """Return the page after (or before) ``cursor``, or the first page."""
+        reverse, position = self.decode_cursor(cursor) if cursor else (False, None)
+
+        rows = list(self.page_queryset(cursor))
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if reverse:
+            rows.reverse()
+            has_next = True
+            has_previous = has_more
+        else:
+            has_next = has_more
+            has_previous = position is not None
+
+        next_cursor = self.encode_cursor(rows[-1], reverse=False) if rows and has_next else None
+        previous_cursor = self.encode_cursor(rows[0], reverse=True) if rows and has_previous else None
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+    def page_queryset(self, cursor=None):
+        """
+        The query of a page: rows after (or before) ``cursor`` in page order,
+        plus one row telling whether another page follows.
+        """
+        reverse, position = self.decode_cursor(cursor) if cursor else (False, None)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(name[1:] if name.startswith('-') else f'-{name}' for name in ordering)
+
+        queryset = self.queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(position, ordering))
+        return queryset[:self.page_size + 1]
+
+    def _after(self, position, ordering):
+        """
+        Filter for rows that come after ``position`` in ``ordering``:
+        (a > x) OR (a = x AND b > y) OR ..., with < for descending fields.
+
+        The redundant ``a >= x`` bound in front lets the database start the
+        index scan at the cursor instead of filtering from the first row.
+        """
+        condition = Q()
+        equal = {}
+        for name, value in zip(ordering, position):
+            field_name = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{field_name}__{lookup}': value})
+            equal[field_name] = value
+
+        if len(ordering) > 1:
+            first = ordering[0]
+            lookup = 'lte' if first.startswith('-') else 'gte'
+            condition = Q(**{f'{first.lstrip("-")}__{lookup}': position[0]}) & condition
+        return condition
+
+    def encode_cursor(self, row, reverse=False):
+        meta = self.queryset.model._meta
+        position = [
+            meta.get_field(name).value_to_string(row) if name != 'pk' else force_str(row.pk)
+            for name in self.field_names
+        ]
+        data = json.dumps({'p': position, 'r': int(reverse)}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Return ``(reverse, position)`` for a cursor made by ``encode_cursor``."""
+        meta = self.queryset.model._meta
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            raw_position = data['p']
+            if len(raw_position) != len(self.field_names):
+                raise InvalidCursor(cursor)
+            position = [
+                (meta.pk if name == 'pk' else meta.get_field(name)).to_python(value)
+                for name, value in zip(self.field_names, raw_position)
+            ]
+            return bool(data.get('r')), position
+        except InvalidCursor:
+            raise
+        except Exception:
+            raise InvalidCursor(cursor)
+
+
+class KeysetPagination(BasePagination):
+    """
+    DRF pagination on ``view.keyset_ordering`` (``KEYSET_ORDERING`` by default).
+    Responses are ``{"next": url, "previous": url, "results": [...]}``;
+    ``?page_size=`` sets the page size.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        ordering = getattr(view, 'keyset_ordering', KEYSET_ORDERING)
+        page_size = get_page_size(request.query_params.get(self.page_size_query_param))
+        paginator = KeysetPaginator(queryset, page_size, ordering)
+
+        try:
+            self.page = paginator.get_page(request.query_params.get(self.cursor_query_param))
+        except InvalidCursor:
+            raise NotFound(self.invalid_cursor_message)
+        return self.page.object_list
+
+    def get_cursor_link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_cursor_link(self.page.next_cursor),
+            'previous': self.get_cursor_link(self.page.previous_cursor),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
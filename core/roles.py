@@ -0,0 +1,160 @@
+"""
+User roles (admin, editor, viewer) resolved once per request.
+
+``get_user_roles(user)`` reads the user's groups from the shared cache and
+only queries the database on a miss. The result is also kept on the user
+object, so every later check in the same request is free. Cache entries are
+keyed by user and role version; ``invalidate_user_roles()`` bumps the
+version once a role change is committed, so a request that read the old
+groups can never publish them under the new version.
+"""
+import time
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+
+ROLE_ADMIN = 'admin'
+ROLE_EDITOR = 'editor'
+ROLE_VIEWER = 'viewer'
+
+# Seconds a resolved role set stays in the cache
+ROLE_CACHE_TIMEOUT = 60 * 60
+
+# Label and badge colour of each role in the user management pages
+ROLE_BADGES = {
+    ROLE_ADMIN: ('Admin', 'danger'),
+    ROLE_EDITOR: ('Editor', 'success'),
+    ROLE_VIEWER: ('Viewer', 'primary'),
+    None: ('No Role', 'secondary'),
+}
+
+
+class UserRoles:
+    """Role checks for one user, built from its group names."""
+
+    def __init__(self, is_superuser=False, groups=()):
+        self.is_superuser = is_superuser
+        self.groups = sorted(groups)
+
+    @property
+    def is_admin(self):
+        return self.is_superuser
+
+    @property
+    def is_editor(self):
+        return ROLE_EDITOR in self.groups
+
+    @property
+    def is_viewer(self):
+        return ROLE_VIEWER in self.groups
+
+    @property
+    def can_edit(self):
+        return self.is_superuser or self.is_editor
+
+    @property
+    def role(self):
+        """The role shown in the interface: 'admin', 'editor', 'viewer' or None."""
+        if self.is_superuser:
+            return ROLE_ADMIN
+        if self.is_editor:
+            return ROLE_EDITOR
+        if self.is_viewer:
+            return ROLE_VIEWER
+        return None
+
+
+def annotate_user_roles(users):
+    """Flag the role groups of every user of a queryset (``in_editor_group``, ``in_viewer_group``)."""
+    memberships = User.groups.through.objects.filter(user=OuterRef('pk'))
+    return users.annotate(
+        in_editor_group=Exists(memberships.filter(group__name=ROLE_EDITOR)),
+        in_viewer_group=Exists(memberships.filter(group__name=ROLE_VIEWER)),
+    )
+
+
+def get_annotated_roles(user):
+    """UserRoles of a user loaded through ``annotate_user_roles``, without queries."""
+    groups = [
+        name for name, member in ((ROLE_EDITOR, user.in_editor_group), (ROLE_VIEWER, user.in_viewer_group))
+        if member
+    ]
+    return UserRoles(user.is_superuser, groups)
+
+
+def _version_key(user_id):
+    return f'user-roles-version:{user_id}'
+
+
+def _roles_key(user_id, version):
+    return f'user-roles:{user_id}:{version}'
+
+
+def get_user_roles(user):
+    """Return the UserRoles of ``user``, from the request, the cache or the database."""
+    roles = getattr(user, '_lims_roles', None)
+    if roles is not None:
+        return roles
+
+    if not user.is_authenticated:
+        roles = UserRoles()
+    else:
+        version = cache.get_or_set(_version_key(user.pk), time.time_ns, timeout=None)
+        key = _roles_key(user.pk, version)
+        groups = cache.get(key)
+        if groups is None:
+            groups = list(user.groups.values_list('name', flat=True))
+            cache.set(key, groups, ROLE_CACHE_TIMEOUT)
+        # is_superuser is read from the user row loaded with the request
+        roles = UserRoles(user.is_superuser, groups)
+
+    user._lims_roles = roles
+    return roles
+
+
+def invalidate_user_roles(user_id):
+    """Drop the cached roles of a user once the current transaction commits."""
+    # A new, never used version, so entries of any earlier version are ignored
+    transaction.on_commit(lambda: cache.set(_version_key(user_id), time.time_ns(), timeout=None))
+
+
+def assign_user_role(user, role):
+    """Assign role to user by adding to appropriate group."""
+    # Clear existing groups
+    user.groups.clear()
+    
+    if role == ROLE_ADMIN:
+        user.is_superuser = True
+        user.is_staff = True
+        user.save()
+    else:
+        user.is_superuser = False
+        user.is_staff = False
+        user.save()
+        
+        # Add to appropriate group
+        group, created = Group.objects.get_or_create(name=role)
+        user.groups.add(group)
+    
+    # Cached roles of this user are stale from now on
+    invalidate_user_roles(user.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_roles_on_group_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Group membership changed, from the user side or from the group side."""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_user_roles(instance.pk)
+            instance.__dict__.pop('_lims_roles', None)
+    elif action in ('post_add', 'post_remove'):
+        for user_id in pk_set:
+            invalidate_user_roles(user_id)
+    elif action == 'pre_clear':
+        # group.user_set.clear(): the members are only known before the clear
+        for user_id in instance.user_set.values_list('pk', flat=True):
+            invalidate_user_roles(user_id)
@@ -0,0 +1,180 @@
+"""
+Full-text search over cases, their accessions and their comments.
+
+On SQLite the text is indexed in three FTS5 tables, ``core_search_case``
+(name and other ID), ``core_search_accession`` and ``core_search_comment``,
+whose rows have the ids of the rows they index. Triggers on ``core_case``,
+``core_accession`` and ``core_comment`` keep them in step with every write,
+bulk statements and deletions included. On PostgreSQL the same documents
+are ``to_tsvector`` expressions with GIN indexes on the three tables, which
+need no triggers.
+
+Both are created by migration ``0024_search_index``. Every word of a query
+must match, the last token of each word as a prefix, so ``lung-5`` finds
+``Lung-5`` and ``Lung-51``. Case names and other IDs are searched first,
+then accessions, then comments, until enough cases are found; on SQLite,
+whole words are searched in all three before prefixes. PostgreSQL ranks the
+newest ``RANK_WINDOW`` matches of a source with ``ts_rank``. SQLite ranks
+the matches with bm25, which reads all of them, unless there are more than
+``RANK_WINDOW``: the rank of so common a word means little, and its newest
+matches come first.
+"""
+import re
+
+from django.db import connection
+
+from .models import Case
+
+# Hits returned by default and at most
+SEARCH_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+
+# Index rows read per hit returned, as one case may match in several rows
+ROWS_PER_HIT = 5
+
+# Characters of a long comment shown around the first match
+EXCERPT_LENGTH = 120
+
+KIND_CASE = 'case'
+KIND_ACCESSION = 'accession'
+KIND_COMMENT = 'comment'
+
+# Matches of one source ranked at most
+RANK_WINDOW = 2000
+
+_WORD = re.compile(r'\w+')
+
+# (kind, FTS5 table, case id, document) of each source, in the order they are searched
+_SQLITE_SOURCES = [
+    (KIND_CASE, 'core_search_case', 'rowid', "name || ' ' || coalesce(other_id, '')"),
+    (KIND_ACCESSION, 'core_search_accession', 'case_id', 'accession_number'),
+    (KIND_COMMENT, 'core_search_comment', 'case_id', 'text'),
+]
+
+# Matches of a query, up to RANK_WINDOW
+_SQLITE_COUNT = """
+    SELECT count(*) FROM (SELECT 1 FROM {table} WHERE {table} MATCH %s LIMIT %s)
+"""
+
+_SQLITE_SEARCH = """
+    SELECT {case_id}, {document}
+    FROM {table}
+    WHERE {table} MATCH %s
+    ORDER BY {order}
+    LIMIT %s
+"""
+
+# (kind, table, case id, document); the documents must be written exactly
+# as in the indexes of the migration
+_POSTGRESQL_SOURCES = [
+    (KIND_CASE, 'core_case', 'id', "name || ' ' || coalesce(other_id, '')"),
+    (KIND_ACCESSION, 'core_accession', 'case_id', 'accession_number'),
+    (KIND_COMMENT, 'core_comment', 'case_id', 'text'),
+]
+
+_POSTGRESQL_SEARCH = """
+    SELECT case_id, body FROM (
+        SELECT {case_id} AS case_id, {document} AS body, to_tsvector('simple', {document}) AS vector
+        FROM {table}
+        WHERE to_tsvector('simple', {document}) @@ to_tsquery('simple', %s)
+        ORDER BY id DESC
+        LIMIT %s
+    ) recent
+    ORDER BY ts_rank(vector, to_tsquery('simple', %s)) DESC
+    LIMIT %s
+"""
+
+
+class SearchHit:
+    """A case found by a search, with where it matched and the matching text."""
+
+    def __init__(self, case, kind, text):
+        self.case = case
+        self.kind = kind
+        self.text = text
+
+
+def parse_query(query):
+    """The words of a search query, each as the list of its tokens."""
+    words = (_WORD.findall(word) for word in (query or '').split())
+    return [tokens for tokens in words if tokens]
+
+
+def search_cases(query, limit=SEARCH_LIMIT):
+    """Best hits of a query, at most one per case, best first."""
+    words = parse_query(query)
+    if not words:
+        return []
+
+    if connection.vendor == 'postgresql':
+        sources = _postgresql_sources(words, limit * ROWS_PER_HIT)
+    else:
+        sources = _sqlite_sources(words, limit * ROWS_PER_HIT)
+
+    best = {}
+    for kind, rows in sources:
+        for case_id, body in rows:
+            if case_id not in best:
+                best[case_id] = (kind, body)
+        if len(best) >= limit:
+            break
+    best = dict(list(best.items())[:limit])
+
+    cases = Case.objects.select_related('project').only(
+        'name', 'other_id', 'status', 'tier', 'project__name'
+    ).in_bulk(best)
+    tokens = [token for word in words for token in word]
+    return [
+        SearchHit(cases[case_id], kind, _excerpt(body, tokens))
+        for case_id, (kind, body) in best.items()
+        if case_id in cases
+    ]
+
+
+def _sqlite_sources(words, limit):
+    """(kind, rows) of each source, read as they are needed."""
+    phrases = ['"{}"'.format(' '.join(tokens)) for tokens in words]
+    # FTS5 reads all the matches of a prefix longer than its prefix index, a
+    # slow read for a common word: whole words are searched first, in every
+    # source, and '*' makes the last token of each word a prefix after that
+    expressions = [' '.join(phrases), ' '.join(phrase + ' *' for phrase in phrases)]
+    with connection.cursor() as cursor:
+        for expression in expressions:
+            for kind, table, case_id, document in _SQLITE_SOURCES:
+                cursor.execute(_SQLITE_COUNT.format(table=table), [expression, RANK_WINDOW])
+                matches = cursor.fetchone()[0]
+                if not matches:
+                    continue
+                # bm25 reads every match of the words for their frequency
+                order = 'rank' if matches < RANK_WINDOW else 'rowid DESC'
+                cursor.execute(
+                    _SQLITE_SEARCH.format(table=table, case_id=case_id, document=document, order=order),
+                    [expression, limit]
+                )
+                yield kind, cursor.fetchall()
+
+
+def _postgresql_sources(words, limit):
+    """(kind, rows) of each source, read as they are needed."""
+    tsquery = ' & '.join(
+        '(' + ' <-> '.join(f"'{token}'" for token in tokens) + ':*)' for tokens in words
+    )
+    with connection.cursor() as cursor:
+        for kind, table, case_id, document in _POSTGRESQL_SOURCES:
+            cursor.execute(
+                _POSTGRESQL_SEARCH.format(table=table, case_id=case_id, document=document),
+                [tsquery, RANK_WINDOW, tsquery, limit]
+            )
+            yield kind, cursor.fetchall()
+
+
+def _excerpt(text, tokens):
+    """The text, or the part of it around the first token it contains if it is long."""
+    text = ' '.join(text.split())
+    if len(text) <= EXCERPT_LENGTH:
+        return text
+    lowered = text.lower()
+    positions = [position for position in (lowered.find(token.lower()) for token in tokens) if position >= 0]
+    start = max(0, min(positions, default=0) - EXCERPT_LENGTH // 3)
+    end = start + EXCERPT_LENGTH
+    return ('…' if start else '') + text[start:end].strip() + ('…' if end < len(text) else '')
@@ -1,6 +1,8 @@
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 from django.contrib.auth.models import User
-from .models import Project, Case, Accession, Comment, ProjectLead
+from .models import Project, Case, Accession, Comment, Job, ProjectLead
+from .stats import get_case_statistics
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -40,24 +42,85 @@ class CaseSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'other_id', 'status', 'status_display', 'tier', 'tier_display',
             'rna_coverage', 'dna_t_coverage', 'dna_n_coverage',
-            'created_at', 'updated_at', 'comments', 'accessions'
+            'created_at', 'updated_at', 'comments', 'accessions',
+            'accessions_count', 'comments_count'
         ]
+        read_only_fields = ['accessions_count', 'comments_count']
+
+
+class CaseListSerializer(serializers.ModelSerializer):
+    """
+    Flat serializer for case lists. ``fields`` keeps only the named fields;
+    ``include`` adds the nested relations of ``expandable_fields``.
+    """
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    tier_display = serializers.CharField(source='get_tier_display', read_only=True)
+    
+    # Nested relations added on request, with the prefetch they need
+    expandable_fields = {
+        'comments': (lambda: CommentSerializer(many=True, read_only=True), 'comments__user'),
+        'accessions': (lambda: AccessionSerializer(many=True, read_only=True), 'accessions'),
+    }
+    
+    class Meta:
+        model = Case
+        fields = [
+            'id', 'project', 'name', 'other_id', 'status', 'status_display', 'tier', 'tier_display',
+            'rna_coverage', 'dna_t_coverage', 'dna_n_coverage',
+            'created_at', 'updated_at', 'accessions_count', 'comments_count'
+        ]
+        read_only_fields = fields
+    
+    def __init__(self, *args, fields=None, include=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        for name in include:
+            self.fields[name] = self.expandable_fields[name][0]()
 
 
 class ProjectSerializer(serializers.ModelSerializer):
+    """
+    One project with its case counts from the statistics rollup; the cases
+    themselves are paged at ``cases_url``.
+    """
     project_lead = ProjectLeadSerializer(read_only=True)
     project_lead_id = serializers.IntegerField(write_only=True, required=False, allow_null=True)
-    cases = CaseSerializer(many=True, read_only=True)
-    cases_count = serializers.IntegerField(read_only=True)
     created_by = UserSerializer(read_only=True)
+    cases_count = serializers.SerializerMethodField()
+    cases_by_status = serializers.SerializerMethodField()
+    cases_by_tier = serializers.SerializerMethodField()
+    cases_url = serializers.SerializerMethodField()
     
     class Meta:
         model = Project
         fields = [
             'id', 'name', 'description', 'project_lead', 'project_lead_id',
-            'created_at', 'updated_at', 'created_by', 'cases', 'cases_count'
+            'created_at', 'updated_at', 'created_by',
+            'cases_count', 'cases_by_status', 'cases_by_tier', 'cases_url'
         ]
     
+    def get_statistics(self, project):
+        """Rollup counts of the project, read once per serialization."""
+        if not hasattr(self, '_statistics'):
+            self._statistics = {}
+        if project.pk not in self._statistics:
+            self._statistics[project.pk] = get_case_statistics(project)
+        return self._statistics[project.pk]
+    
+    def get_cases_count(self, project):
+        return self.get_statistics(project)['total_cases']
+    
+    def get_cases_by_status(self, project):
+        return self.get_statistics(project)['cases_by_status']
+    
+    def get_cases_by_tier(self, project):
+        return self.get_statistics(project)['cases_by_tier']
+    
+    def get_cases_url(self, project):
+        return reverse('project-cases', args=[project.pk], request=self.context.get('request'))
+    
     def create(self, validated_data):
         project_lead_id = validated_data.pop('project_lead_id', None)
         project = Project.objects.create(**validated_data)
@@ -114,7 +177,112 @@ class CaseCreateSerializer(serializers.ModelSerializer):
         ]
 
 
+class CaseBulkRecordSerializer(serializers.Serializer):
+    """One record of POST /api/cases/bulk/; fields left out keep their stored value."""
+    project = serializers.IntegerField(source='project_id')
+    name = serializers.CharField(max_length=255)
+    other_id = serializers.CharField(max_length=255, required=False, allow_null=True, allow_blank=True)
+    status = serializers.ChoiceField(choices=Case.STATUS_CHOICES, required=False)
+    rna_coverage = serializers.FloatField(required=False, allow_null=True)
+    dna_t_coverage = serializers.FloatField(required=False, allow_null=True)
+    dna_n_coverage = serializers.FloatField(required=False, allow_null=True)
+
+
 class CommentCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Comment
-        fields = ['text'] 
\ No newline at end of file
+        fields = ['text'] 
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Status of a background job; its parameters and input are not exposed."""
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    progress_percent = serializers.IntegerField(read_only=True)
+    
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'kind', 'status', 'status_display', 'project',
+            'progress_done', 'progress_total', 'progress_percent', 'result', 'error',
+            'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+
+class SearchHitSerializer(serializers.Serializer):
+    """A case found by GET /api/search/, with where it matched and the matching text."""
+    case = serializers.IntegerField(source='case.id')
+    name = serializers.CharField(source='case.name')
+    other_id = serializers.CharField(source='case.other_id')
+    status = serializers.CharField(source='case.status')
+    tier = serializers.CharField(source='case.tier')
+    project = serializers.IntegerField(source='case.project_id')
+    project_name = serializers.CharField(source='case.project.name')
+    matched = serializers.CharField(source='kind')
+    text = serializers.CharField()
+
+
+class ProjectChangeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Project
+        fields = ['id', 'name', 'description', 'project_lead', 'created_by', 'created_at', 'updated_at']
+
+
+class AccessionChangeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Accession
+        fields = ['id', 'case', 'accession_number']
+
+
+class CommentChangeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Comment
+        fields = ['id', 'case', 'text', 'user', 'created_at']
+
+
+class ChangeListSerializer(serializers.ListSerializer):
+    """Serializes the changed rows of each kind together, much faster than one by one."""
+    
+    def to_representation(self, changes):
+        by_kind = {}
+        for change in changes:
+            if change.instance is not None:
+                by_kind.setdefault(change.kind, []).append(change)
+        for kind, kind_changes in by_kind.items():
+            row_serializer = self.child.row_serializers[kind]
+            rows = row_serializer([change.instance for change in kind_changes], many=True).data
+            for change, row in zip(kind_changes, rows):
+                change.row = row
+        return super().to_representation(changes)
+
+
+class ChangeSerializer(serializers.Serializer):
+    """
+    A change of GET /api/changes/: the row as it is now, flat, or None when
+    it was deleted.
+    """
+    seq = serializers.IntegerField()
+    kind = serializers.CharField()
+    id = serializers.IntegerField(source='object_id')
+    parent = serializers.IntegerField(source='parent_id', allow_null=True)
+    deleted = serializers.BooleanField()
+    changed_at = serializers.DateTimeField()
+    data = serializers.SerializerMethodField()
+    
+    # Fields of the changed rows, by kind
+    row_serializers = {
+        'project': ProjectChangeSerializer,
+        'case': CaseListSerializer,
+        'accession': AccessionChangeSerializer,
+        'comment': CommentChangeSerializer,
+    }
+    
+    class Meta:
+        list_serializer_class = ChangeListSerializer
+    
+    def get_data(self, change):
+        if change.instance is None:
+            return None
+        if not hasattr(change, 'row'):
+            change.row = self.row_serializers[change.kind](change.instance).data
+        return change.row
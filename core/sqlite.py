@@ -0,0 +1,86 @@
+"""
+SQLite settings for several gunicorn workers sharing one database file.
+
+Every new SQLite connection is set up with ``SQLITE_PRAGMAS``: WAL journal
+mode lets page views read while an import writes, ``synchronous=NORMAL`` is
+safe under WAL and avoids a sync per commit, the page cache and memory map
+are sized for the case tables, and ``busy_timeout`` makes a writer wait for
+the lock instead of failing at once. The ``SQLITE_PRAGMAS`` setting
+replaces the defaults below.
+
+Write transactions start with ``BEGIN IMMEDIATE`` (``transaction_mode`` in
+``DATABASES``), so they take the write lock up front and wait on it; a
+deferred transaction that reads first and writes later cannot wait and fails
+with "database is locked". Functions decorated with ``@retry_on_lock``
+are run again, with growing delays, if the lock is still busy after
+``busy_timeout``.
+"""
+import functools
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connection
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -65536,  # KiB, 64 MiB per connection
+    'mmap_size': 268435456,  # 256 MiB
+    'busy_timeout': 10000,  # ms
+}
+
+# Tries of a @retry_on_lock function, and delay before the first retry (s)
+LOCK_RETRY_ATTEMPTS = 4
+LOCK_RETRY_DELAY = 0.25
+
+
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """Apply the pragmas to a new SQLite connection."""
+    if connection.vendor != 'sqlite':
+        return
+
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', SQLITE_PRAGMAS)
+    # On the raw connection: setup statements are not request queries
+    for name, value in pragmas.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+def is_lock_error(error):
+    """Whether a database error means another connection holds the lock."""
+    message = str(error).lower()
+    return 'database is locked' in message or 'database table is locked' in message
+
+
+def retry_on_lock(func):
+    """
+    Run ``func`` again when it fails on a busy database lock, up to
+    ``LOCK_RETRY_ATTEMPTS`` tries with exponential backoff and jitter.
+
+    ``func`` must be safe to repeat, which holds for a function that does
+    all its writes in one atomic block: the lock is taken by BEGIN
+    IMMEDIATE, before anything is written. Inside an outer transaction
+    nothing can be retried, so the error is raised at once.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        attempts = getattr(settings, 'SQLITE_LOCK_RETRY_ATTEMPTS', LOCK_RETRY_ATTEMPTS)
+        if connection.in_atomic_block:
+            attempts = 1
+
+        for attempt in range(1, attempts + 1):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as error:
+                if attempt == attempts or not is_lock_error(error):
+                    raise
+                delay = LOCK_RETRY_DELAY * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+                logger.warning('%s: database locked, retry %d/%d in %.2fs', func.__name__, attempt, attempts - 1, delay)
+                time.sleep(delay)
+    return wrapper
@@ -0,0 +1,88 @@
+"""
+Dashboard statistics read from the ProjectStats rollup.
+
+ProjectStats holds one row per (project, status, tier) with the number of
+matching cases, kept up to date by every case write. Reading it costs a
+handful of small rows instead of GROUP BY queries over the whole Case table.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Case, ProjectStats
+
+
+def get_case_statistics(project=None):
+    """
+    Return total cases and case counts by status, tier and project lead,
+    for one project or for all projects, sorted by decreasing count.
+    """
+    rows = ProjectStats.objects.exclude(count=0)
+    if project is not None:
+        rows = rows.filter(project=project)
+
+    by_status = Counter()
+    by_tier = Counter()
+    by_lead = Counter()
+    for status, tier, lead_name, count in rows.values_list('status', 'tier', 'project__project_lead__name', 'count'):
+        by_status[status] += count
+        by_tier[tier] += count
+        by_lead[lead_name] += count
+
+    status_choices_dict = dict(Case.STATUS_CHOICES)
+
+    return {
+        'total_cases': sum(by_status.values()),
+        'cases_by_status': [
+            {
+                'status': status,
+                'status_display': status_choices_dict.get(status, status),
+                'count': count,
+            }
+            for status, count in by_status.most_common()
+        ],
+        'cases_by_tier': [{'tier': tier, 'count': count} for tier, count in by_tier.most_common()],
+        'cases_by_lead': [{'project_lead__name': lead, 'count': count} for lead, count in by_lead.most_common()],
+    }
+
+
+def annotate_cases_count(projects):
+    """Annotate a Project queryset with ``cases_count`` read from the rollup."""
+    totals = ProjectStats.objects.filter(project=OuterRef('pk')).order_by().values('project').annotate(
+        total=Sum('count')
+    ).values('total')
+    return projects.annotate(cases_count=Coalesce(Subquery(totals), 0))
+
+
+def count_cases(case_model=None):
+    """Count cases by (project_id, status, tier) straight from the Case table."""
+    case_model = case_model or Case
+    rows = case_model.objects.order_by().values('project_id', 'status', 'tier').annotate(count=Count('pk'))
+    return Counter({(row['project_id'], row['status'], row['tier']): row['count'] for row in rows})
+
+
+def get_stored_counts(stats_model=None):
+    """Case counts by (project_id, status, tier) as stored in the rollup."""
+    stats_model = stats_model or ProjectStats
+    rows = stats_model.objects.exclude(count=0).values_list('project_id', 'status', 'tier', 'count')
+    return Counter({(project_id, status, tier): count for project_id, status, tier, count in rows})
+
+
+def rebuild_project_stats(case_model=None, stats_model=None):
+    """
+    Replace the rollup with counts taken from the Case table.
+    Models can be passed in to use historical models from a migration.
+    """
+    stats_model = stats_model or ProjectStats
+
+    with transaction.atomic():
+        counts = count_cases(case_model)
+        stats_model.objects.all().delete()
+        stats_model.objects.bulk_create([
+            stats_model(project_id=project_id, status=status, tier=tier, count=count)
+            for (project_id, status, tier), count in counts.items()
+        ], batch_size=500)
+
+    return counts
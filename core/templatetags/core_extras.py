@@ -31,4 +31,15 @@ def to_json(value):
     Convert a Python object to JSON for use in JavaScript.
     Usage: {{ mydict|to_json }}
     """
-    return json.dumps(value) 
\ No newline at end of file
+    return json.dumps(value)
+
+
+@register.simple_tag(takes_context=True)
+def cursor_url(context, cursor):
+    """
+    Query string of the current page with ``cursor`` replaced, keeping filters.
+    Usage: <a href="{% cursor_url page.next_cursor %}">
+    """
+    params = context['request'].GET.copy()
+    params['cursor'] = cursor
+    return '?' + params.urlencode()
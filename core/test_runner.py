@@ -0,0 +1,16 @@
+"""Test runner of the project (``TEST_RUNNER``)."""
+import copy
+import logging.config
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """Django's runner, with the SQL log of core.instrumentation sent nowhere."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        test_logging = copy.deepcopy(settings.LOGGING)
+        test_logging['handlers']['sql_file'] = {'class': 'logging.NullHandler'}
+        logging.config.dictConfig(test_logging)
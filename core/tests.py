@@ -1,3 +1,1357 @@
-from django.test import TestCase
+import itertools
+import os
+import random
+import re
+import time
+from datetime import date, timedelta
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, OperationalError, connection
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, reverse
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from .api_views import AccessionViewSet, CaseViewSet, ChangeViewSet, ProjectViewSet, SearchViewSet
+from .fragments import get_case_list_version
+from .forms import AccessionFormSet, BatchCaseForm, BATCH_CASE_MAX_SIZE, CaseForm
+from .importers import import_cases
+from .instrumentation import QueryBudgetExceeded, fingerprint
+from .jobs import BATCH_USER_CREDENTIALS_EXPIRY, claim_next_job, enqueue, forget_expired_credentials, run_job
+from .models import (
+    Project, ProjectLead, Case, CaseTransition, TransitionRollup, Accession, Change, Comment, Job, ProjectStats
+)
+from .pagination import InvalidCursor, KeysetPaginator
+from .search import parse_query, search_cases
+from .sqlite import retry_on_lock
+from .stats import count_cases, get_case_statistics, get_stored_counts
+from .tiers import classify_tiers, retier_cases
+from .transitions import get_stage_durations, get_throughput, get_transitions
+from .triggers import check_sqlite_triggers, get_missing_triggers
+
+# The site with the REST API under /api/, which the default URLconf does not mount
+urlpatterns = [
+    path('', include('terryfox_lims.urls')),
+    path('api/', include('core.api_urls')),
+]
+
+
+class ClassifyTiersTest(TestCase):
+    """classify_tiers must agree with Case.calculate_tier on every input."""
+
+    # Values on and around every threshold of the tier rules
+    BOUNDARY_VALUES = [None, 0.0, 29.99, 30.0, 30.01, 79.99, 80.0, 80.01, 150.0]
+
+    def assert_matches_calculate_tier(self, triples):
+        dna_t, dna_n, rna = zip(*triples)
+        tiers = classify_tiers(dna_t, dna_n, rna).tolist()
+
+        for (t, n, r), tier in zip(triples, tiers):
+            expected = Case(dna_t_coverage=t, dna_n_coverage=n, rna_coverage=r).calculate_tier()
+            self.assertEqual(tier, expected, f'DNA(T)={t}, DNA(N)={n}, RNA={r}')
+
+    def test_boundary_grid(self):
+        self.assert_matches_calculate_tier(list(itertools.product(self.BOUNDARY_VALUES, repeat=3)))
+
+    def test_random_values(self):
+        rng = random.Random(20250721)
+
+        def coverage():
+            choice = rng.random()
+            if choice < 0.15:
+                return None
+            if choice < 0.4:
+                return rng.choice(self.BOUNDARY_VALUES[1:])
+            return rng.uniform(0, 200)
+
+        self.assert_matches_calculate_tier([(coverage(), coverage(), coverage()) for _ in range(20000)])
+
+    def test_empty_input(self):
+        self.assertEqual(classify_tiers([], [], []).tolist(), [])
+
+
+class RetierTest(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user(username='retier')
+        self.project = Project.objects.create(name='Retier', created_by=user)
+        Case.objects.bulk_create([
+            Case(project=self.project, name='A', dna_t_coverage=90, dna_n_coverage=40, rna_coverage=90, tier=Case.TIER_FA),
+            Case(project=self.project, name='B', dna_t_coverage=50, dna_n_coverage=40, tier=Case.TIER_A),
+            Case(project=self.project, name='FAIL', dna_t_coverage=10, dna_n_coverage=40, tier=Case.TIER_FA),
+        ])
+
+    def stored_tiers(self):
+        return dict(Case.objects.values_list('name', 'tier'))
+
+    def test_dry_run_writes_nothing(self):
+        result = retier_cases(Case.objects.all(), chunk_size=2, dry_run=True)
+
+        self.assertEqual(result.scanned, 3)
+        self.assertEqual(result.transitions, {('FAIL', 'A'): 1, ('A', 'B'): 1})
+        self.assertEqual(self.stored_tiers(), {'A': 'FAIL', 'B': 'A', 'FAIL': 'FAIL'})
+
+    def test_command_updates_changed_tiers(self):
+        out = StringIO()
+        call_command('retier', chunk_size=2, stdout=out)
+
+        self.assertIn('3 cases scanned, 2 changed', out.getvalue())
+        self.assertEqual(self.stored_tiers(), {'A': 'A', 'B': 'B', 'FAIL': 'FAIL'})
+
+
+class CaseCountersTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='counter')
+        self.project = Project.objects.create(name='Counters', created_by=self.user)
+        self.case = Case.objects.create(project=self.project, name='C1')
+
+    def assert_counts(self, accessions, comments):
+        self.case.refresh_from_db()
+        self.assertEqual((self.case.accessions_count, self.case.comments_count), (accessions, comments))
+
+    def test_create_and_delete(self):
+        comment = Comment.objects.create(case=self.case, text='first', user=self.user)
+        Comment.objects.create(case=self.case, text='second', user=self.user)
+        Accession.objects.create(case=self.case, accession_number='ACC-1')
+        self.assert_counts(1, 2)
+
+        comment.delete()
+        Accession.objects.filter(case=self.case).delete()
+        self.assert_counts(0, 1)
+
+    def test_formset(self):
+        formset = AccessionFormSet({
+            'accessions-TOTAL_FORMS': '2', 'accessions-INITIAL_FORMS': '0',
+            'accessions-0-accession_number': 'ACC-1', 'accessions-1-accession_number': 'ACC-2',
+        }, instance=self.case)
+        self.assertTrue(formset.is_valid())
+        formset.save()
+        self.assert_counts(2, 0)
+
+    def test_case_save_keeps_counts(self):
+        stale_case = Case.objects.get(pk=self.case.pk)
+        Comment.objects.create(case=self.case, text='concurrent', user=self.user)
+
+        stale_case.status = Case.STATUS_SEQUENCED
+        stale_case.save()
+        self.assert_counts(0, 1)
+
+    def test_deleting_user_updates_counts(self):
+        other = User.objects.create_user(username='other')
+        Comment.objects.create(case=self.case, text='bye', user=other)
+        other.delete()
+        self.assert_counts(0, 0)
+
+    def test_repair_command(self):
+        Comment.objects.create(case=self.case, text='kept', user=self.user)
+        Case.objects.update(comments_count=5, accessions_count=3)
+
+        out = StringIO()
+        call_command('repair_case_counters', stdout=out)
+
+        self.assertIn('1 cases have out-of-date counters', out.getvalue())
+        self.assert_counts(0, 1)
+
+
+class ProjectStatsTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='stats')
+        self.project = Project.objects.create(name='Stats', created_by=self.user)
+
+    def assert_stats_match_cases(self):
+        self.assertEqual(get_stored_counts(), count_cases())
+
+    def test_case_writes(self):
+        case = Case.objects.create(project=self.project, name='S1', dna_t_coverage=90, dna_n_coverage=40)
+        Case.objects.create(project=self.project, name='S2')
+        self.assert_stats_match_cases()
+
+        case.status = Case.STATUS_SEQUENCED
+        case.dna_t_coverage = 10
+        case.save()
+        self.assert_stats_match_cases()
+
+        Case.objects.get(name='S2').delete()
+        self.assert_stats_match_cases()
+        self.assertEqual(get_case_statistics()['cases_by_status'], [
+            {'status': Case.STATUS_SEQUENCED, 'status_display': 'Sequenced', 'count': 1},
+        ])
+
+    def test_saves_of_stale_instances(self):
+        Case.objects.create(project=self.project, name='S1')
+        # Two requests load the case, then save it one after the other
+        first, second = Case.objects.get(name='S1'), Case.objects.get(name='S1')
+        first.status = Case.STATUS_SEQUENCED
+        first.save()
+        second.status = Case.STATUS_COMPLETED
+        second.save()
+        self.assert_stats_match_cases()
+
+    def test_project_delete(self):
+        Case.objects.create(project=self.project, name='S1')
+        self.project.delete()
+        self.assertFalse(ProjectStats.objects.exists())
+
+    def test_import_and_retier(self):
+        Case.objects.create(project=self.project, name='S1')
+        rows = [
+            {'CaseID': 'S1', 'Other_ID': '', 'Status': 'completed', 'DNAT': '90', 'DNAN': '40', 'RNA': '90'},
+            {'CaseID': 'S2', 'Other_ID': '', 'Status': 'received', 'DNAT': '50', 'DNAN': '40', 'RNA': ''},
+        ]
+        import_cases(self.project, rows, self.user)
+        self.assert_stats_match_cases()
+
+        Case.objects.update(tier=Case.TIER_FA)
+        retier_cases(Case.objects.all())
+        self.assertNotEqual(get_stored_counts(), count_cases())
+
+        call_command('reconcile_stats', stdout=StringIO())
+        self.assert_stats_match_cases()
+        self.assertEqual(get_case_statistics(self.project)['total_cases'], 2)
+
+    def test_import_retries_a_case_created_meanwhile(self):
+        Case.objects.create(project=self.project, name='S1')
+        rows = [
+            {'CaseID': 'S1', 'Other_ID': '', 'Status': 'completed', 'DNAT': '90', 'DNAN': '40', 'RNA': '90'},
+            {'CaseID': 'S2', 'Other_ID': '', 'Status': 'received', 'DNAT': '50', 'DNAN': '40', 'RNA': ''},
+        ]
+        bulk_create = Case.objects.bulk_create
+        calls = []
+
+        def racing_bulk_create(cases, **kwargs):
+            # Another request creates S2 after the import read the cases
+            if not calls:
+                Case.objects.create(project=self.project, name='S2')
+            calls.append(len(cases))
+            return bulk_create(cases, **kwargs)
+
+        with patch.object(Case.objects, 'bulk_create', racing_bulk_create):
+            result = import_cases(self.project, rows, self.user)
+        self.assertEqual(calls, [1, 1])
+        self.assertEqual((result.created_count, result.updated_count), (1, 1))
+        self.assertEqual(self.project.cases.count(), 2)
+        self.assert_stats_match_cases()
+
+    def test_reconcile_dry_run(self):
+        Case.objects.create(project=self.project, name='S1')
+        ProjectStats.objects.update(count=3)
+
+        out = StringIO()
+        call_command('reconcile_stats', dry_run=True, stdout=out)
+
+        self.assertIn('stored 3, actual 1', out.getvalue())
+        self.assertIn('1 statistics rows out of date', out.getvalue())
+        self.assertEqual(ProjectStats.objects.get().count, 3)
+
+
+class KeysetPaginationTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='pager', password='pager')
+        self.project = Project.objects.create(name='Pages', created_by=self.user)
+        Case.objects.bulk_create([Case(project=self.project, name=f'P{i:02d}') for i in range(25)])
+        # Ties on created_at must be broken by id
+        Case.objects.filter(name__lt='P10').update(created_at=self.project.created_at)
+
+    def expected_names(self):
+        return list(Case.objects.order_by('-created_at', '-id').values_list('name', flat=True))
+
+    def test_forward_and_backward(self):
+        paginator = KeysetPaginator(Case.objects.all(), page_size=10)
+        pages = [paginator.get_page()]
+        while pages[-1].has_next:
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertFalse(pages[0].has_previous)
+        self.assertEqual([case.name for page in pages for case in page], self.expected_names())
+
+        previous = paginator.get_page(pages[2].previous_cursor)
+        self.assertEqual(list(previous), list(pages[1]))
+        self.assertFalse(paginator.get_page(pages[1].previous_cursor).has_previous)
+
+    def test_stable_under_inserts(self):
+        paginator = KeysetPaginator(Case.objects.all(), page_size=10)
+        first = paginator.get_page()
+        Case.objects.create(project=self.project, name='NEW')
+
+        second = paginator.get_page(first.next_cursor)
+        self.assertEqual([case.name for case in second], self.expected_names()[11:21])
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(InvalidCursor):
+            KeysetPaginator(Case.objects.all()).get_page('not-a-cursor')
+
+    def test_api(self):
+        view = CaseViewSet.as_view({'get': 'list'})
+        request = APIRequestFactory().get('/api/cases/', {'page_size': 20})
+        force_authenticate(request, user=self.user)
+        response = view(request)
+
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertIsNone(response.data['previous'])
+        self.assertIn('cursor=', response.data['next'])
+
+    def test_project_detail(self):
+        url = reverse('project_detail', args=[self.project.id])
+        self.client.force_login(self.user)
+        response = self.client.get(url, {'page_size': 20})
+        self.assertEqual(len(response.context['cases']), 20)
+
+        response = self.client.get(url, {'page_size': 20, 'cursor': response.context['page'].next_cursor})
+        self.assertEqual(len(response.context['cases']), 5)
+        self.assertContains(response, 'Newer')
+
+
+class CaseNameUniqueTest(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user(username='unique')
+        self.project = Project.objects.create(name='Unique', created_by=user)
+        self.other_project = Project.objects.create(name='Other', created_by=user)
+        self.case = Case.objects.create(project=self.project, name='U1')
+
+    def form(self, case, name):
+        return CaseForm({'name': name, 'status': Case.STATUS_RECEIVED}, instance=case)
+
+    def test_case_form(self):
+        self.assertFalse(self.form(Case(project=self.project), 'U1').is_valid())
+        self.assertTrue(self.form(Case(project=self.other_project), 'U1').is_valid())
+        self.assertTrue(self.form(self.case, 'U1').is_valid())
+
+    def test_database_constraint(self):
+        with self.assertRaises(IntegrityError):
+            Case.objects.bulk_create([Case(project=self.project, name='U1')])
+
+
+class BatchCaseCreateTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='batch', password='batch')
+        self.project = Project.objects.create(name='Batch', created_by=self.user)
+        Case.objects.create(project=self.project, name='Lung-3')
+
+    def post(self, first, last):
+        return self.client.post(reverse('batch_case_create', args=[self.project.id]), {
+            'min_case_number': first, 'max_case_number': last, 'batch_name': 'Lung',
+            'status': Case.STATUS_RECEIVED, 'dna_t_coverage': 90, 'dna_n_coverage': 40,
+        })
+
+    def test_skips_existing_names(self):
+        self.client.force_login(self.user)
+        response = self.post(1, 1000)
+        job = Job.objects.get()
+        self.assertRedirects(response, reverse('job_detail', args=[job.id]))
+        self.assertEqual(self.project.cases.count(), 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command('run_jobs', workers=0, once=True, stdout=StringIO())
+
+        # Two name lookups and one INSERT per bulk batch, not two queries per case
+        self.assertLess(len(queries), 30)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_SUCCEEDED)
+        self.assertEqual(job.result, {'created': 999, 'skipped': ['Lung-3']})
+        self.assertContains(self.client.get(reverse('job_detail', args=[job.id])), 'Created 999 cases; 1 were skipped')
+        self.assertEqual(self.project.cases.count(), 1000)
+        self.assertEqual(set(self.project.cases.exclude(name='Lung-3').values_list('tier', flat=True)), {Case.TIER_B})
+        self.assertEqual(get_stored_counts(), count_cases())
+
+    def test_range_limit(self):
+        form = BatchCaseForm({
+            'min_case_number': 1, 'max_case_number': BATCH_CASE_MAX_SIZE + 1, 'batch_name': 'Lung',
+            'status': Case.STATUS_RECEIVED,
+        })
+        self.assertFalse(form.is_valid())
+
+
+class UserRolesTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(username='admin', password='admin')
+        self.user = User.objects.create_user(username='editor', first_name='Ed', last_name='Itor')
+        self.user.groups.add(Group.objects.get_or_create(name='editor')[0])
+        self.project = Project.objects.create(name='Roles', created_by=self.admin)
+
+    def group_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries if 'auth_group' in query['sql']]
+
+    def test_no_role_queries_after_warm_up(self):
+        self.client.force_login(self.user)
+        url = reverse('project_detail', args=[self.project.id])
+
+        self.assertEqual(len(self.group_queries(url)), 1)
+        self.assertEqual(self.group_queries(url), [])
+        self.assertEqual(self.group_queries(reverse('home')), [])
+
+    def test_role_change_invalidates_cache(self):
+        self.client.force_login(self.user)
+        url = reverse('project_detail', args=[self.project.id])
+        self.assertTrue(self.client.get(url).context['can_edit'])
+
+        self.client.force_login(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('user_update', args=[self.user.id]), {
+                'first_name': 'Ed', 'last_name': 'Itor', 'is_active': 'on', 'role': 'viewer',
+            })
+
+        self.client.force_login(self.user)
+        self.assertFalse(self.client.get(url).context['can_edit'])
+
+
+class UserListTest(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='admin')
+        editors = Group.objects.get_or_create(name='editor')[0]
+        viewers = Group.objects.get_or_create(name='viewer')[0]
+        for i in range(30):
+            user = User.objects.create_user(username=f'user{i:02d}', last_name='Batch' if i % 2 else 'Other')
+            user.groups.add(editors if i % 3 else viewers)
+
+    def test_constant_queries(self):
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('user_list'), {'page_size': 20})
+
+        self.assertLess(len(queries), 10)
+        self.assertEqual(len(response.context['users_with_roles']), 20)
+        self.assertEqual(
+            (response.context['total_admins'], response.context['total_editors'], response.context['total_viewers']),
+            (1, 20, 10)
+        )
+        roles = {info['user'].username: info['role'] for info in response.context['users_with_roles']}
+        self.assertEqual((roles['admin'], roles['user00'], roles['user01']), ('Admin', 'Viewer', 'Editor'))
+
+        response = self.client.get(reverse('user_list'), {'page_size': 20, 'cursor': response.context['page'].next_cursor})
+        self.assertEqual(len(response.context['users_with_roles']), 11)
+
+    def test_search(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('user_list'), {'q': 'batch'})
+        self.assertEqual(response.context['matching_users'], 15)
+        self.assertEqual(len(response.context['users_with_roles']), 15)
+
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetTest(TestCase):
+    """Budgeted views stay within @query_budget and do not grow with the data."""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='admin', password='admin')
+        self.project = Project.objects.create(name='Budget', created_by=self.user)
+
+    def add_cases(self, count, comments_per_case):
+        """Create cases with an accession and comments by distinct users; return the last case."""
+        start = self.project.cases.count()
+        for i in range(start, start + count):
+            case = Case.objects.create(project=self.project, name=f'CASE-{i:04d}', dna_t_coverage=90, dna_n_coverage=40)
+            Accession.objects.create(case=case, accession_number=f'ACC-{i:04d}')
+            for j in range(comments_per_case):
+                author = User.objects.create_user(username=f'author{i}-{j}')
+                Comment.objects.create(case=case, user=author, text=f'Comment {j}')
+        return case
+
+    def get_query_counts(self, case):
+        urls = [
+            reverse('home'),
+            reverse('project_detail', args=[self.project.id]),
+            reverse('case_detail', args=[case.id]),
+            reverse('user_list'),
+            reverse('csv_case_export', args=[self.project.id]),
+        ]
+        counts = []
+        for url in urls:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertIn('sql;dur=', response['Server-Timing'])
+            counts.append(len(queries))
+        return counts
+
+    def test_views_within_budget(self):
+        self.client.force_login(self.user)
+        small = self.get_query_counts(self.add_cases(2, comments_per_case=1))
+        large = self.get_query_counts(self.add_cases(60, comments_per_case=5))
+        self.assertEqual(small, large)
+
+    def test_over_budget_fails(self):
+        self.client.force_login(self.user)
+        case = self.add_cases(1, comments_per_case=1)
+        with patch('core.views.case_detail.query_budget', 1):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('case_detail', args=[case.id]))
+
+    def test_fingerprint(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM "core_case" WHERE "id" IN (%s, %s, %s) LIMIT 21'),
+            fingerprint('SELECT * FROM "core_case" WHERE "id" IN (%s) LIMIT 51'),
+        )
+
+
+class SQLiteLockTest(SimpleTestCase):
+    databases = {'default'}
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite pragmas')
+    def test_pragmas_applied(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 10000)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+    def flaky(self, errors):
+        calls = []
+
+        @retry_on_lock
+        def write():
+            calls.append(1)
+            if len(calls) <= len(errors):
+                raise OperationalError(errors[len(calls) - 1])
+            return 'written'
+        return write, calls
+
+    @patch('core.sqlite.time.sleep')
+    def test_retries_lock_errors(self, sleep):
+        write, calls = self.flaky(['database is locked', 'database is locked'])
+        with self.assertLogs('core.sqlite', 'WARNING'):
+            self.assertEqual(write(), 'written')
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(sleep.call_count, 2)
+
+    @patch('core.sqlite.time.sleep')
+    def test_gives_up(self, sleep):
+        write, calls = self.flaky(['database is locked'] * 10)
+        with self.assertRaises(OperationalError), self.assertLogs('core.sqlite', 'WARNING'):
+            write()
+        self.assertEqual(len(calls), 4)
+
+        write, calls = self.flaky(['no such table: core_case'])
+        with self.assertRaises(OperationalError):
+            write()
+        self.assertEqual(len(calls), 1)
+
+    @patch('core.sqlite.time.sleep')
+    def test_no_retry_inside_transaction(self, sleep):
+        write, calls = self.flaky(['database is locked'])
+        with patch.object(connection, 'in_atomic_block', True):
+            with self.assertRaises(OperationalError):
+                write()
+        self.assertEqual(len(calls), 1)
+
+
+class TransferToPostgresTest(TestCase):
+
+    @skipUnless(connection.vendor == 'sqlite', 'needs a non-PostgreSQL default database')
+    def test_refuses_non_postgres_target(self):
+        with self.assertRaisesMessage(CommandError, 'not PostgreSQL'):
+            call_command('transfer_sqlite_to_postgres', stdout=StringIO())
+
+
+class CaseFragmentCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser(username='admin', password='admin')
+        self.project = Project.objects.create(name='Cached', created_by=self.user)
+        self.cases = [
+            Case.objects.create(project=self.project, name=f'CASE-{i}', dna_t_coverage=90, dna_n_coverage=40)
+            for i in range(5)
+        ]
+        self.client.force_login(self.user)
+        self.url = reverse('project_detail', args=[self.project.id])
+
+    def get_page(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        case_queries = [query for query in queries if 'FROM "core_case"' in query['sql']]
+        return response.content.decode(), case_queries
+
+    def test_unchanged_page_served_from_cache(self):
+        first, first_queries = self.get_page()
+        second, second_queries = self.get_page()
+        # Identical apart from the CSRF token of the logout form
+        csrf = re.compile(r'name="csrfmiddlewaretoken" value="[^"]*"')
+        self.assertEqual(csrf.sub('', first), csrf.sub('', second))
+        self.assertTrue(first_queries)
+        self.assertEqual(second_queries, [])
+
+    def test_case_writes_change_the_page(self):
+        self.get_page()
+
+        case = self.cases[2]
+        case.name = 'RENAMED'
+        case.save()
+        content, queries = self.get_page()
+        self.assertIn('RENAMED', content)
+        self.assertTrue(queries)
+
+        version = get_case_list_version(self.project.id)
+        Comment.objects.create(case=case, user=self.user, text='New comment')
+        self.assertNotEqual(get_case_list_version(self.project.id), version)
+
+        version = get_case_list_version(self.project.id)
+        self.cases[0].delete()
+        self.assertNotEqual(get_case_list_version(self.project.id), version)
+        self.assertNotIn('CASE-0<', self.get_page()[0].replace(' ', '').replace('\n', ''))
+
+    def test_bulk_writes_change_the_version(self):
+        version = get_case_list_version(self.project.id)
+        import_cases(self.project, [
+            {'CaseID': 'CASE-1', 'Other_ID': '', 'Status': 'Created', 'DNAT': '20', 'DNAN': '20', 'RNA': ''},
+        ], self.user)
+        self.assertNotEqual(get_case_list_version(self.project.id), version)
+
+
+class ConditionalGetTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser(username='poller', password='poller')
+        self.project = Project.objects.create(name='Polled', created_by=self.user)
+        self.other = Project.objects.create(name='Other', created_by=self.user)
+        self.case = Case.objects.create(project=self.project, name='POLL-1', dna_t_coverage=90, dna_n_coverage=40)
+
+    def get(self, view, path, params=None, **headers):
+        request = APIRequestFactory().get(path, params, **headers)
+        force_authenticate(request, user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request)
+        return response, len(queries)
+
+    def assert_revalidates(self, view, path, params, write):
+        response, _ = self.get(view, path, params)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        response, queries = self.get(view, path, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        # Only the validator, nothing serialized
+        self.assertEqual(queries, 1)
+
+        write()
+        response, _ = self.get(view, path, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_case_list(self):
+        view = CaseViewSet.as_view({'get': 'list'})
+        params = {'project': self.project.id}
+        self.assert_revalidates(view, '/api/cases/', params, lambda: Comment.objects.create(
+            case=self.case, user=self.user, text='Counters and nested comments change'
+        ))
+        self.assert_revalidates(view, '/api/cases/', params, lambda: self.case.delete())
+
+    def test_other_project_writes_keep_the_etag(self):
+        view = CaseViewSet.as_view({'get': 'list'})
+        response, _ = self.get(view, '/api/cases/', {'project': self.project.id})
+        Case.objects.create(project=self.other, name='ELSEWHERE')
+        response, _ = self.get(view, '/api/cases/', {'project': self.project.id}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_renamed_user_changes_project_case_list(self):
+        Comment.objects.create(case=self.case, user=self.user, text='Signed by the poller')
+        view = CaseViewSet.as_view({'get': 'list'})
+        params = {'project': self.project.id, 'include': 'comments'}
+
+        def rename():
+            self.user.username = 'renamed'
+            self.user.save()
+
+        self.assert_revalidates(view, '/api/cases/', params, rename)
+        response, _ = self.get(view, '/api/cases/', params)
+        self.assertEqual(response.data['results'][0]['comments'][0]['user']['username'], 'renamed')
+
+    def test_project_list_and_statistics(self):
+        list_view = ProjectViewSet.as_view({'get': 'list'})
+        statistics_view = ProjectViewSet.as_view({'get': 'statistics'})
+        new_case = lambda: Case.objects.create(project=self.other, name='NEW', dna_t_coverage=90, dna_n_coverage=40)
+        self.assert_revalidates(list_view, '/api/projects/', None, new_case)
+        self.assert_revalidates(statistics_view, '/api/projects/statistics/', None, lambda: self.other.delete())
+
+    def test_if_modified_since(self):
+        view = CaseViewSet.as_view({'get': 'list'})
+        response, _ = self.get(view, '/api/cases/')
+        response, _ = self.get(view, '/api/cases/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_depends_on_the_page(self):
+        view = CaseViewSet.as_view({'get': 'list'})
+        first, _ = self.get(view, '/api/cases/')
+        second, _ = self.get(view, '/api/cases/', {'page_size': 5})
+        self.assertNotEqual(first['ETag'], second['ETag'])
+
+
+class CaseListFieldsTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='lister', password='lister')
+        self.project = Project.objects.create(name='Sparse', created_by=self.user)
+        for i in range(3):
+            case = Case.objects.create(project=self.project, name=f'SPARSE-{i}', dna_t_coverage=90, dna_n_coverage=40)
+            Comment.objects.create(case=case, user=self.user, text='Comment')
+            Accession.objects.create(case=case, accession_number=f'ACC-{i}')
+
+    def get(self, params):
+        view = CaseViewSet.as_view({'get': 'list'})
+        request = APIRequestFactory().get('/api/cases/', params)
+        force_authenticate(request, user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request)
+            response.render()
+        return response, [query['sql'] for query in queries]
+
+    def test_flat_by_default(self):
+        response, queries = self.get({})
+        case = response.data['results'][0]
+        self.assertNotIn('comments', case)
+        self.assertEqual(case['comments_count'], 1)
+        self.assertEqual(case['project'], self.project.id)
+        self.assertFalse([sql for sql in queries if 'core_comment' in sql or 'core_accession' in sql])
+
+    def test_sparse_fields(self):
+        response, _ = self.get({'fields': 'id,name,tier'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name', 'tier'})
+
+    def test_include(self):
+        response, queries = self.get({'include': 'comments', 'fields': 'id'})
+        case = response.data['results'][0]
+        self.assertEqual(set(case), {'id', 'comments'})
+        self.assertEqual(case['comments'][0]['user']['username'], 'lister')
+        # One query for the page's comments, one for their users
+        self.assertEqual(len([sql for sql in queries if 'core_comment' in sql]), 1)
+        self.assertFalse([sql for sql in queries if 'core_accession' in sql])
+
+    def test_unknown_names(self):
+        response, _ = self.get({'include': 'project'})
+        self.assertEqual(response.status_code, 400)
+        response, _ = self.get({'fields': 'id,secret'})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class ProjectCasesRouteTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='nested', password='nested')
+        self.project = Project.objects.create(name='Nested', created_by=self.user)
+        self.other = Project.objects.create(name='Other', created_by=self.user)
+        Case.objects.create(project=self.other, name='ELSEWHERE')
+
+    def add_cases(self, count):
+        for i in range(count):
+            case = Case.objects.create(project=self.project, name=f'N-{i}-{Case.objects.count()}', dna_t_coverage=90, dna_n_coverage=40)
+            Comment.objects.create(case=case, user=self.user, text='Comment')
+
+    def get(self, view, path, params=None, **kwargs):
+        request = APIRequestFactory().get(path, params)
+        force_authenticate(request, user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request, **kwargs)
+            response.render()
+        return response, len(queries)
+
+    def test_project_detail_summary(self):
+        view = ProjectViewSet.as_view({'get': 'retrieve'})
+        self.add_cases(3)
+        response, small = self.get(view, f'/api/projects/{self.project.id}/', pk=self.project.id)
+        self.assertNotIn('cases', response.data)
+        self.assertEqual(response.data['cases_count'], 3)
+        self.assertEqual(response.data['cases_by_tier'], [{'tier': Case.TIER_B, 'count': 3}])
+        self.assertTrue(response.data['cases_url'].endswith(f'/api/projects/{self.project.id}/cases/'))
+
+        self.add_cases(30)
+        response, large = self.get(view, f'/api/projects/{self.project.id}/', pk=self.project.id)
+        self.assertEqual(response.data['cases_count'], 33)
+        self.assertEqual(small, large)
+
+    def test_nested_cases(self):
+        view = CaseViewSet.as_view({'get': 'list'})
+        self.add_cases(5)
+        path = f'/api/projects/{self.project.id}/cases/'
+        response, _ = self.get(view, path, {'page_size': 2, 'name': 'N-'}, project_pk=self.project.id)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIn('cursor=', response.data['next'])
+        self.assertEqual({case['project'] for case in response.data['results']}, {self.project.id})
+
+        response, _ = self.get(view, path, {'name': 'ELSEWHERE'}, project_pk=self.project.id)
+        self.assertEqual(response.data['results'], [])
+
+        response, _ = self.get(view, '/api/projects/0/cases/', project_pk=0)
+        self.assertEqual(response.status_code, 404)
+
+
+class CaseBulkUpsertTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='pipeline', password='pipeline')
+        self.project = Project.objects.create(name='Bulk', created_by=self.user)
+        self.case = Case.objects.create(project=self.project, name='BULK-1', dna_t_coverage=20, dna_n_coverage=40)
+
+    def post(self, records):
+        view = CaseViewSet.as_view({'post': 'bulk'})
+        request = APIRequestFactory().post('/api/cases/bulk/', records, format='json')
+        force_authenticate(request, user=self.user)
+        return view(request)
+
+    def test_upsert(self):
+        response = self.post([
+            {'project': self.project.id, 'name': 'BULK-1', 'dna_t_coverage': 90},
+            {'project': self.project.id, 'name': 'BULK-2', 'status': 'sequenced', 'dna_t_coverage': 90, 'dna_n_coverage': 40},
+            {'project': self.project.id, 'name': 'BULK-2', 'dna_n_coverage': 40},
+            {'project': self.project.id, 'name': 'BULK-3', 'status': 'nonsense'},
+            {'project': 0, 'name': 'BULK-4'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {key: response.data[key] for key in ('created', 'updated', 'unchanged', 'errors')},
+            {'created': 1, 'updated': 1, 'unchanged': 1, 'errors': 2}
+        )
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results], ['updated', 'created', 'unchanged', 'error', 'error'])
+        self.assertIn('status', results[3]['errors'])
+        self.assertIn('project', results[4]['errors'])
+
+        self.case.refresh_from_db()
+        self.assertEqual((self.case.dna_t_coverage, self.case.tier), (90, Case.TIER_B))
+        created = Case.objects.get(pk=results[1]['id'])
+        self.assertEqual((created.name, created.status, created.tier), ('BULK-2', 'sequenced', Case.TIER_B))
+
+        # The rollup saw the tier change and the new case
+        self.assertEqual(get_stored_counts(), count_cases())
+
+    def test_rejects_non_list(self):
+        response = self.post({'project': self.project.id, 'name': 'BULK-1'})
+        self.assertEqual(response.status_code, 400)
+
+
+class AccessionResolveTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='reception', password='reception')
+        self.project = Project.objects.create(name='Reception', created_by=self.user)
+        self.case = Case.objects.create(project=self.project, name='R-1', status=Case.STATUS_RECEIVED)
+        self.other = Case.objects.create(project=self.project, name='R-2')
+        Accession.objects.create(case=self.case, accession_number='TUBE-1')
+        Accession.objects.create(case=self.case, accession_number='TUBE-2')
+        Accession.objects.create(case=self.other, accession_number='TUBE-2')
+
+    def post(self, view, path, data):
+        request = APIRequestFactory().post(path, data, format='json')
+        force_authenticate(request, user=self.user)
+        return view(request)
+
+    def test_resolve(self):
+        view = AccessionViewSet.as_view({'post': 'resolve'})
+        with self.assertNumQueries(1):
+            response = self.post(view, '/api/accessions/resolve/', ['TUBE-1\n', 'TUBE-2', 'TUBE-9', 'TUBE-1', 7])
+        self.assertEqual(
+            {key: response.data[key] for key in ('found', 'unknown', 'duplicated', 'errors', 'repeated')},
+            {'found': 2, 'unknown': 1, 'duplicated': 1, 'errors': 1, 'repeated': ['TUBE-1']}
+        )
+        found = response.data['results'][0]
+        self.assertEqual(found['accession_number'], 'TUBE-1')
+        self.assertEqual(found['cases'], [{
+            'id': self.case.id, 'name': 'R-1', 'status': Case.STATUS_RECEIVED, 'tier': self.case.tier,
+            'project': self.project.id, 'project_name': 'Reception',
+        }])
+        self.assertEqual([case['id'] for case in response.data['results'][1]['cases']], [self.case.id, self.other.id])
+        self.assertEqual(response.data['results'][2]['cases'], [])
+
+        self.assertEqual(self.post(view, '/api/accessions/resolve/', {'numbers': []}).status_code, 400)
+        with patch('core.api_views.ACCESSION_RESOLVE_MAX_NUMBERS', 2):
+            self.assertEqual(self.post(view, '/api/accessions/resolve/', ['A', 'B', 'C']).status_code, 400)
+
+    def test_number_once_per_case(self):
+        view = CaseViewSet.as_view({'post': 'add_accession'})
+        request = APIRequestFactory().post('/', {'accession_number': 'TUBE-1'}, format='json')
+        force_authenticate(request, user=self.user)
+        self.assertEqual(view(request, pk=self.case.id).status_code, 400)
+        self.case.refresh_from_db()
+        self.assertEqual(self.case.accessions_count, 2)
+
+        formset = AccessionFormSet({
+            'accessions-TOTAL_FORMS': '1', 'accessions-INITIAL_FORMS': '0',
+            'accessions-0-accession_number': 'TUBE-2',
+        }, instance=self.case)
+        self.assertFalse(formset.is_valid())
+        formset = AccessionFormSet({
+            'accessions-TOTAL_FORMS': '1', 'accessions-INITIAL_FORMS': '0',
+            'accessions-0-accession_number': 'TUBE-2',
+        }, instance=Case.objects.create(project=self.project, name='R-3'))
+        self.assertTrue(formset.is_valid())
+
+
+def run_or_crash_worker(job_id):
+    """``run_job`` of the worker processes in the crash test: dies on one job, hangs on another."""
+    if job_id == int(os.environ['TEST_CRASHING_JOB']):
+        os._exit(1)
+    if job_id == int(os.environ['TEST_HANGING_JOB']):
+        time.sleep(60)
+    return Job.STATUS_SUCCEEDED
+
+
+class JobRunnerTest(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='admin')
+        self.editor = User.objects.create_user(username='editor', password='editor')
+        self.project = Project.objects.create(name='Jobs', created_by=self.admin)
+        self.client.force_login(self.admin)
+
+    def run_jobs(self):
+        call_command('run_jobs', workers=0, once=True, stdout=StringIO(), stderr=StringIO())
+
+    def test_csv_import(self):
+        upload = StringIO('CaseID,Other_ID,Status,DNAT,DNAN,RNA\nJOB-1,,Received,90,40,85\nJOB-2,,Bogus,90,40,85\n')
+        upload.name = 'cases.csv'
+        response = self.client.post(reverse('csv_case_import', args=[self.project.id]), {'csv_file': upload})
+        job = Job.objects.get()
+        self.assertRedirects(response, reverse('job_detail', args=[job.id]))
+        self.assertEqual((job.kind, job.status, job.project), ('csv_case_import', Job.STATUS_QUEUED, self.project))
+
+        self.run_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_SUCCEEDED)
+        self.assertEqual((job.result['created'], job.result['updated']), (1, 0))
+        self.assertEqual(len(job.result['errors']), 1)
+        self.assertEqual((job.progress_done, job.progress_percent), (2, 100))
+        self.assertEqual(list(self.project.cases.values_list('name', 'tier')), [('JOB-1', Case.TIER_A)])
+
+    def test_claimed_once_and_one_per_project(self):
+        job = enqueue('batch_case_create', self.admin, project=self.project, params={})
+        same_project = enqueue('batch_case_create', self.admin, project=self.project, params={})
+        other = Project.objects.create(name='Other', created_by=self.admin)
+        other_project = enqueue('batch_case_create', self.admin, project=other, params={})
+        self.assertEqual(claim_next_job(), job.id)
+        self.assertEqual(claim_next_job(), other_project.id)
+        self.assertIsNone(claim_next_job())
+
+        Job.objects.filter(pk=job.id).update(status=Job.STATUS_SUCCEEDED)
+        self.assertEqual(claim_next_job(), same_project.id)
+
+    def test_failure_is_recorded(self):
+        job = enqueue('batch_case_create', self.admin, project=self.project, params={'batch_name': 'X'})
+        claim_next_job()
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.assertEqual(run_job(job.id), Job.STATUS_FAILED)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertIn('min_case_number', job.error)
+
+    def test_interrupted_jobs_fail(self):
+        job = enqueue('batch_case_create', self.admin, project=self.project, params={})
+        claim_next_job()
+        self.run_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertIn('Interrupted', job.error)
+
+    def test_runner_survives_a_crashed_worker(self):
+        crashing, hanging, later = (enqueue('batch_case_create', self.admin, params={}) for _ in range(3))
+        stdout, stderr = StringIO(), StringIO()
+        with patch('core.management.commands.run_jobs.run_job', run_or_crash_worker), \
+                patch.dict(os.environ, TEST_CRASHING_JOB=str(crashing.id), TEST_HANGING_JOB=str(hanging.id)):
+            call_command('run_jobs', workers=2, once=True, poll_interval=0.1, stdout=stdout, stderr=stderr)
+
+        crashing.refresh_from_db()
+        hanging.refresh_from_db()
+        self.assertEqual((crashing.status, hanging.status), (Job.STATUS_FAILED, Job.STATUS_FAILED))
+        self.assertIn('Worker crashed', crashing.error)
+        self.assertIn('Worker pool crashed', stderr.getvalue())
+        # The queue goes on in a new pool
+        self.assertIn(f'Job {later.id} succeeded', stdout.getvalue())
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_batch_user_create(self):
+        response = self.client.post(reverse('batch_user_create'), {
+            'users_data': 'Ada, Lovelace\nAlan, Turing', 'role': 'viewer',
+        })
+        job = Job.objects.get()
+        self.assertRedirects(response, reverse('job_detail', args=[job.id]))
+        # No password is stored before its user exists
+        self.assertNotIn('password', str(job.params))
+        self.assertNotContains(self.client.get(reverse('job_detail', args=[job.id])), 'Download credentials')
+
+        # Taken while the job was queued
+        User.objects.create_user(username='alant')
+        self.run_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.result, {'created': ['adal'], 'errors': ['alant: username already taken']})
+        self.assertNotIn('credentials', str(job.result))
+        self.assertContains(self.client.get(reverse('job_detail', args=[job.id])), 'Download credentials')
+
+        # Only the users created are listed, and only once
+        response = self.client.post(reverse('job_credentials', args=[job.id]))
+        credentials = dict(
+            line.split(':') for line in response.content.decode().splitlines() if line and not line.startswith('#')
+        )
+        self.assertEqual(set(credentials), {'adal'})
+        self.assertTrue(User.objects.get(username='adal').check_password(credentials['adal']))
+        job.refresh_from_db()
+        self.assertNotIn('credentials', job.params)
+        response = self.client.post(reverse('job_credentials', args=[job.id]))
+        self.assertRedirects(response, reverse('job_detail', args=[job.id]))
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_user_job_credentials_expire(self):
+        job = enqueue('batch_user_create', self.admin, params={
+            'role': 'viewer', 'users': [{'username': 'adal', 'first_name': 'Ada', 'last_name': 'Lovelace'}],
+        })
+        self.run_jobs()
+        job.refresh_from_db()
+        self.assertIn('credentials', job.params)
+
+        self.assertEqual(forget_expired_credentials(), 0)
+        Job.objects.filter(pk=job.id).update(finished_at=timezone.now() - timedelta(seconds=BATCH_USER_CREDENTIALS_EXPIRY + 1))
+        self.assertEqual(forget_expired_credentials(), 1)
+        job.refresh_from_db()
+        self.assertNotIn('credentials', job.params)
+        self.assertTrue(User.objects.filter(username='adal').exists())
+
+    def test_jobs_visible_to_their_creator(self):
+        job = enqueue('batch_case_create', self.admin, project=self.project, params={})
+        self.client.force_login(self.editor)
+        self.assertEqual(self.client.get(reverse('job_detail', args=[job.id])).status_code, 404)
+        self.assertContains(self.client.get(reverse('job_list')), 'No background jobs yet.')
+
+
+class SearchTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='searcher', password='searcher')
+        self.project = Project.objects.create(name='Lung', created_by=self.user)
+        self.named = Case.objects.create(project=self.project, name='Lung-5', other_id='EXT-77')
+        self.commented = Case.objects.create(project=self.project, name='Lung-6')
+        Comment.objects.create(case=self.commented, user=self.user, text='Library failed, see Lung-5 for the rerun')
+        Accession.objects.create(case=self.commented, accession_number='ACC-2024-001')
+
+    def found(self, query):
+        return [(hit.case.name, hit.kind) for hit in search_cases(query)]
+
+    def test_parse_query(self):
+        self.assertEqual(parse_query(' ACC-2024-001  rerun '), [['ACC', '2024', '001'], ['rerun']])
+        self.assertEqual(parse_query('- "'), [])
+
+    def test_sources_and_ranking(self):
+        self.assertEqual(self.found('acc-2024'), [('Lung-6', 'accession')])
+        self.assertEqual(self.found('ext-77'), [('Lung-5', 'case')])
+        self.assertEqual(self.found('library RERUN'), [('Lung-6', 'comment')])
+        # A name hit ranks above the same words in a comment
+        self.assertEqual(self.found('lung-5'), [('Lung-5', 'case'), ('Lung-6', 'comment')])
+        self.assertEqual(self.found('lung-5 library'), [('Lung-6', 'comment')])
+        self.assertEqual(self.found('nothing'), [])
+
+    def test_index_follows_writes(self):
+        Case.objects.filter(pk=self.named.pk).update(name='Breast-1')
+        self.assertEqual(self.found('breast'), [('Breast-1', 'case')])
+        self.assertEqual(self.found('lung-5'), [('Lung-6', 'comment')])
+
+        import_cases(self.project, [
+            {'CaseID': 'Imported-9', 'Other_ID': '', 'Status': 'Received', 'DNAT': '', 'DNAN': '', 'RNA': ''},
+        ], self.user)
+        self.assertEqual(self.found('imported'), [('Imported-9', 'case')])
+
+        self.commented.delete()
+        self.assertEqual(self.found('acc'), [])
+        self.assertEqual(self.found('rerun'), [])
+
+    def test_rebuild_command(self):
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.found('acc-2024'), [('Lung-6', 'accession')])
+
+    def test_api_and_page(self):
+        view = SearchViewSet.as_view({'get': 'list'})
+        request = APIRequestFactory().get('/api/search/', {'q': 'lung', 'limit': 1})
+        force_authenticate(request, user=self.user)
+        response = view(request)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['project_name'], 'Lung')
+
+        request = APIRequestFactory().get('/api/search/', {'q': ' - '})
+        force_authenticate(request, user=self.user)
+        self.assertEqual(view(request).status_code, 400)
+
+        self.client.force_login(self.user)
+        with override_settings(QUERY_BUDGET_STRICT=True):
+            response = self.client.get(reverse('search'), {'q': 'acc-2024'})
+        self.assertContains(response, 'ACC-2024-001')
+        self.assertContains(response, reverse('case_detail', args=[self.commented.id]))
+
+
+class ChangeFeedTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='mirror', password='mirror')
+        self.project = Project.objects.create(name='Feed', created_by=self.user)
+        self.case = Case.objects.create(project=self.project, name='F-1')
+        Accession.objects.create(case=self.case, accession_number='F-ACC-1')
+        Comment.objects.create(case=self.case, user=self.user, text='Received')
+
+    def read(self, since=0, **params):
+        if connection.vendor == 'postgresql':
+            # The test never commits: run the deferred triggers that number its changes
+            with connection.cursor() as cursor:
+                cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+                cursor.execute('SET CONSTRAINTS ALL DEFERRED')
+        request = APIRequestFactory().get('/api/changes/', {'since': since, **params})
+        force_authenticate(request, user=self.user)
+        return ChangeViewSet.as_view({'get': 'list'})(request)
+
+    def test_writes_are_recorded_once_per_row(self):
+        feed = self.read().data
+        # Adding the comment updated the case counters after it
+        self.assertEqual(
+            [(change['kind'], change['deleted']) for change in feed['results']],
+            [('project', False), ('accession', False), ('comment', False), ('case', False)]
+        )
+        case = feed['results'][3]
+        self.assertEqual((case['parent'], case['data']['name'], case['data']['comments_count']), (self.project.id, 'F-1', 1))
+        self.assertFalse(feed['has_more'])
+
+        Case.objects.filter(pk=self.case.pk).update(tier='A')
+        changes = self.read(feed['last_seq']).data['results']
+        self.assertEqual([(change['kind'], change['data']['tier']) for change in changes], [('case', 'A')])
+        self.assertEqual(Change.objects.filter(kind=Change.KIND_CASE).count(), 1)
+        self.assertEqual(self.read(changes[0]['seq']).data['results'], [])
+
+    def test_imports_and_cascades(self):
+        since = self.read().data['last_seq']
+        import_cases(self.project, [
+            {'CaseID': 'F-2', 'Other_ID': '', 'Status': 'Received', 'DNAT': '', 'DNAN': '', 'RNA': ''},
+        ], self.user)
+        changes = self.read(since).data['results']
+        self.assertEqual([(change['kind'], change['data']['name']) for change in changes], [('case', 'F-2')])
+
+        since = changes[-1]['seq']
+        self.client.force_login(self.user)
+        self.client.post(reverse('project_delete', args=[self.project.id]))
+        tombstones = self.read(since).data['results']
+        self.assertEqual(
+            sorted(change['kind'] for change in tombstones), ['accession', 'case', 'case', 'comment', 'project']
+        )
+        self.assertTrue(all(change['deleted'] and change['data'] is None for change in tombstones))
+
+    def test_batches(self):
+        Case.objects.bulk_create([Case(project=self.project, name=f'F-{number}') for number in range(2, 8)])
+        seen = []
+        # The changes, then the rows of each kind among them
+        with self.assertNumQueries(4):
+            feed = self.read(limit=3).data
+        while True:
+            seen += [change['seq'] for change in feed['results']]
+            if not feed['has_more']:
+                break
+            self.assertIn(f"since={feed['last_seq']}", feed['next'])
+            feed = self.read(feed['last_seq'], limit=3).data
+        self.assertEqual(seen, list(Change.objects.order_by('seq').values_list('seq', flat=True)))
+        self.assertEqual(self.read('latest').status_code, 400)
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite triggers')
+    def test_triggers_survive_migrations(self):
+        # A later migration that rebuilds a table drops its triggers
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'core_change_%'")
+            self.assertEqual(cursor.fetchone()[0], 12)
+
+
+class CaseTransitionTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='lab', password='lab')
+        self.lead = ProjectLead.objects.create(name='Dr Lead')
+        self.project = Project.objects.create(name='Stages', created_by=self.user, project_lead=self.lead)
+        self.case = Case.objects.create(project=self.project, name='S-1', status=Case.STATUS_SEQUENCED)
+
+    def age_transitions(self, days):
+        CaseTransition.objects.update(changed_at=F('changed_at') - timedelta(days=days))
+
+    def log(self, case):
+        return list(case.transitions.order_by('changed_at', 'id').values_list('from_status', 'to_status'))
+
+    def test_every_write_path_is_logged(self):
+        self.assertEqual(self.log(self.case), [('', 'sequenced')])
+
+        # CaseForm and the API save the case
+        self.case.status = Case.STATUS_TRANSFERRED
+        self.case.save()
+        self.case.save()
+        Case.objects.filter(pk=self.case.pk).update(status=Case.STATUS_BIOINFO)
+        import_cases(self.project, [
+            {'CaseID': 'S-1', 'Other_ID': '', 'Status': 'Completed', 'DNAT': '', 'DNAN': '', 'RNA': ''},
+        ], self.user)
+        self.assertEqual(self.log(self.case), [
+            ('', 'sequenced'), ('sequenced', 'transferred_to_nfl'),
+            ('transferred_to_nfl', 'bioinfo_analysis'), ('bioinfo_analysis', 'completed'),
+        ])
+        self.assertTrue(all(
+            duration >= timedelta(0)
+            for duration in self.case.transitions.exclude(from_status='').values_list('time_in_previous', flat=True)
+        ))
+
+    def test_stage_durations(self):
+        other = Case.objects.create(project=self.project, name='S-2', status=Case.STATUS_SEQUENCED)
+        self.age_transitions(3)
+        Case.objects.filter(pk=self.case.pk).update(status=Case.STATUS_TRANSFERRED)
+        self.age_transitions(1)
+        Case.objects.filter(pk=other.pk).update(status=Case.STATUS_TRANSFERRED)
+
+        stages = get_stage_durations(get_transitions(), group_by='lead')
+        self.assertEqual(len(stages), 1)
+        stage = stages[0]
+        self.assertEqual(
+            (stage['group_name'], stage['from_status'], stage['to_status'], stage['count']),
+            ('Dr Lead', 'sequenced', 'transferred_to_nfl', 2)
+        )
+        self.assertAlmostEqual(stage['average'] / 86400, 3.5, places=2)
+        self.assertAlmostEqual(stage['longest'] / 86400, 4, places=2)
+
+    def test_api(self):
+        view = ProjectViewSet.as_view({'get': 'stage_statistics'})
+        Case.objects.filter(pk=self.case.pk).update(status=Case.STATUS_COMPLETED)
+
+        def get(**params):
+            request = APIRequestFactory().get('/api/projects/statistics/stages/', params)
+            force_authenticate(request, user=self.user)
+            return view(request)
+
+        response = get(project=self.project.id, by='project', since='2000-01-01')
+        self.assertEqual([stage['to_status'] for stage in response.data['stages']], ['completed'])
+        self.assertEqual(
+            sorted((entry['status'], entry['count']) for entry in response.data['throughput']),
+            [('completed', 1), ('sequenced', 1)]
+        )
+        self.assertEqual(get(until='2000-01-01').data['throughput'], [])
+        self.assertEqual(get(by='week').status_code, 400)
+        self.assertEqual(get(since='yesterday').status_code, 400)
+
+
+class TransitionRollupTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='manager', password='manager')
+        self.lead = ProjectLead.objects.create(name='Dr Trend')
+        self.project = Project.objects.create(name='Trends', created_by=self.user, project_lead=self.lead)
+        self.cases = [Case.objects.create(project=self.project, name=f'T-{number}') for number in range(3)]
+        Case.objects.filter(pk__in=[case.pk for case in self.cases[:2]]).update(status=Case.STATUS_SEQUENCED)
+
+    def counts(self, period=TransitionRollup.PERIOD_WEEK):
+        rows = TransitionRollup.objects.filter(period=period).exclude(count=0)
+        return sorted(rows.values_list('status', 'tier', 'count'))
+
+    def test_rollups_follow_the_log(self):
+        expected = [('received', 'FAIL', 3), ('sequenced', 'FAIL', 2)]
+        self.assertEqual(self.counts(), expected)
+        self.assertEqual(self.counts(TransitionRollup.PERIOD_DAY), expected)
+        week = TransitionRollup.objects.filter(period=TransitionRollup.PERIOD_WEEK).first().bucket
+        self.assertEqual(week.weekday(), 0)
+
+        TransitionRollup.objects.update(count=99)
+        call_command('rebuild_transition_rollups', chunk_size=2, stdout=StringIO())
+        self.assertEqual(self.counts(), expected)
+
+    def test_history_outlives_cases_and_projects(self):
+        expected = [('received', 'FAIL', 3), ('sequenced', 'FAIL', 2)]
+        self.cases[0].delete()
+        self.assertEqual(CaseTransition.objects.count(), 5)
+        self.assertEqual(self.counts(), expected)
+
+        project_id = self.project.id
+        self.project.delete()
+        self.assertEqual(CaseTransition.objects.filter(project_id=project_id).count(), 5)
+        self.assertEqual(self.counts(), expected)
+        self.assertEqual(
+            sorted((entry['status'], entry['count']) for entry in get_throughput(get_transitions())),
+            [('received', 3), ('sequenced', 2)]
+        )
+
+    def test_api(self):
+        view = ProjectViewSet.as_view({'get': 'timeseries'})
+
+        def get(**params):
+            request = APIRequestFactory().get('/api/projects/statistics/timeseries/', params)
+            force_authenticate(request, user=self.user)
+            return view(request)
+
+        with self.assertNumQueries(1):
+            response = get(status='sequenced,completed', by='lead', project_lead=self.lead.id)
+        self.assertEqual(response.data['period'], 'week')
+        self.assertEqual(len(response.data['buckets']), 53)
+        series = response.data['series']
+        self.assertEqual([(entry['status'], entry['group_name']) for entry in series], [('sequenced', 'Dr Trend')])
+        self.assertEqual(series[0]['counts'][-1], 2)
+        self.assertEqual(sum(series[0]['counts']), 2)
+
+        today = timezone.now().date()
+        response = get(period='day', since=str(today - timedelta(days=6)), by='tier')
+        self.assertEqual(len(response.data['buckets']), 7)
+        self.assertEqual(sorted(entry['counts'][-1] for entry in response.data['series']), [2, 3])
+        self.assertEqual(get(period='month').status_code, 400)
+        self.assertEqual(get(since=str(today), until=str(today - timedelta(days=1))).status_code, 400)
+
+
+    def test_api_rejects_long_periods_before_querying(self):
+        view = ProjectViewSet.as_view({'get': 'timeseries'})
+
+        def get(**params):
+            request = APIRequestFactory().get('/api/projects/statistics/timeseries/', params)
+            force_authenticate(request, user=self.user)
+            return view(request)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get(since='0001-01-01').status_code, 400)
+        # The last day of the calendar has no day after it
+        response = get(period='day', since='9999-12-30', until='9999-12-31')
+        self.assertEqual(response.data['buckets'], [date(9999, 12, 30), date(9999, 12, 31)])
+        self.assertEqual(get(period='day', until='9999-12-31').status_code, 200)
+        self.assertEqual(len(get(until='0001-01-10').data['buckets']), 2)
+        self.assertEqual(get(since='9999-01-01').status_code, 400)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite triggers')
+class SQLiteTriggersTest(TestCase):
+
+    def test_every_trigger_exists(self):
+        self.assertEqual(get_missing_triggers(connection), {})
+        self.assertEqual(check_sqlite_triggers(None, databases=['default']), [])
+
+    def test_rebuild_triggers(self):
+        user = User.objects.create_user(username='rebuilt', password='rebuilt')
+        project = Project.objects.create(name='Rebuilt', created_by=user)
+        # What a table rebuild of core_case leaves
+        with connection.cursor() as cursor:
+            for name in ('core_change_case_update', 'core_casetransition_insert', 'core_search_case_insert'):
+                cursor.execute(f'DROP TRIGGER {name}')
+        Case.objects.create(project=project, name='UNSEEN-1')
+        [warning] = check_sqlite_triggers(None, databases=['default'])
+        self.assertEqual(warning.id, 'core.W001')
+        self.assertIn('core_casetransition_insert', warning.msg)
+
+        stdout = StringIO()
+        call_command('rebuild_triggers', stdout=stdout)
+        self.assertIn('changes: core_change_case_update were missing', stdout.getvalue())
+        self.assertEqual(get_missing_triggers(connection), {})
+        # The search index is filled again; the other sets record the next writes
+        self.assertEqual([hit.case.name for hit in search_cases('unseen')], ['UNSEEN-1'])
+        case = Case.objects.create(project=project, name='SEEN-2')
+        Case.objects.filter(pk=case.pk).update(status='sequenced')
+        self.assertTrue(Change.objects.filter(kind=Change.KIND_CASE, object_id=case.pk).exists())
+        self.assertEqual(list(case.transitions.values_list('to_status', flat=True)), ['received', 'sequenced'])
 
-# Create your tests here.
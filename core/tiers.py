@@ -0,0 +1,137 @@
+"""
+Batch tier classification.
+
+``classify_tiers`` applies the rules of ``Case.calculate_tier`` to whole
+arrays of coverage values at once; missing values are passed as NaN.
+``retier_cases`` uses it to recalculate stored tiers in chunks and is safe
+to call from data migrations with a historical ``Case`` model:
+
+    def recalculate_tiers(apps, schema_editor):
+        from core.tiers import retier_cases
+        retier_cases(apps.get_model('core', 'Case').objects.all())
+"""
+from collections import Counter
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .fragments import invalidate_case_lists
+from .models import Case, record_case_stats
+
+# Cases read and written per round trip by retier_cases
+RETIER_CHUNK_SIZE = 1000
+
+
+def coverage_array(values):
+    """Convert coverage values to a float array, with NaN for None."""
+    return np.array(values, dtype=float)
+
+
+def classify_tiers(dna_t_coverage, dna_n_coverage, rna_coverage):
+    """
+    Return the tier of every case as an array of strings.
+    Arguments are arrays of the same length, NaN standing for a missing value.
+    """
+    dna_t = coverage_array(dna_t_coverage)
+    dna_n = coverage_array(dna_n_coverage)
+    rna = coverage_array(rna_coverage)
+
+    # Comparisons with NaN are False, which matches the None checks of
+    # Case.calculate_tier
+    with np.errstate(invalid='ignore'):
+        # Tier FAIL: DNA missing, DNA(T) < 30X OR DNA(N) < 30X
+        fail = np.isnan(dna_t) | np.isnan(dna_n) | (dna_t < 30) | (dna_n < 30)
+
+        # Tier A: DNA(T) >= 80X, DNA(N) >= 30X, RNA >= 80M reads
+        high_dna = (dna_t >= 80) & (dna_n >= 30)
+        tier_a = high_dna & (rna >= 80)
+
+        # Tier B: 30X <= DNA(T) <= 80X, DNA(N) >= 30X, any RNA
+        # or DNA(T) >= 80X, DNA(N) >= 30X, RNA missing or < 80M
+        tier_b = (
+            ((dna_t >= 30) & (dna_t <= 80) & (dna_n >= 30)) |
+            (high_dna & np.isnan(rna)) |
+            (high_dna & (rna < 80))
+        )
+
+    return np.select(
+        [fail, tier_a, tier_b],
+        [Case.TIER_FA, Case.TIER_A, Case.TIER_B],
+        default=Case.TIER_FA
+    )
+
+
+def assign_tiers(cases):
+    """Set ``tier`` on a list of Case instances without saving them."""
+    if not cases:
+        return
+
+    tiers = classify_tiers(
+        [case.dna_t_coverage for case in cases],
+        [case.dna_n_coverage for case in cases],
+        [case.rna_coverage for case in cases],
+    )
+    for case, tier in zip(cases, tiers.tolist()):
+        case.tier = tier
+
+
+class RetierResult:
+    """Summary of a retier run: cases scanned and tier transitions."""
+
+    def __init__(self):
+        self.scanned = 0
+        self.transitions = Counter()
+
+    @property
+    def changed(self):
+        return sum(self.transitions.values())
+
+
+def retier_cases(queryset, chunk_size=RETIER_CHUNK_SIZE, dry_run=False):
+    """
+    Recalculate the tier of every case in ``queryset`` and store the ones
+    that changed.
+
+    Cases are read in primary key order, ``chunk_size`` at a time, and only
+    tier columns are loaded. Changed rows are written with one UPDATE per
+    target tier and chunk. With ``dry_run`` nothing is written.
+    """
+    result = RetierResult()
+    model = queryset.model
+    last_pk = None
+
+    while True:
+        chunk = queryset.order_by('pk')
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        rows = list(chunk.values_list(
+            'pk', 'dna_t_coverage', 'dna_n_coverage', 'rna_coverage', 'tier', 'project_id', 'status'
+        )[:chunk_size])
+        if not rows:
+            break
+
+        pks, dna_t, dna_n, rna, old_tiers, project_ids, statuses = zip(*rows)
+        new_tiers = classify_tiers(dna_t, dna_n, rna).tolist()
+
+        changed_pks = {}
+        stats_deltas = Counter()
+        for pk, old_tier, new_tier, project_id, status in zip(pks, old_tiers, new_tiers, project_ids, statuses):
+            if old_tier != new_tier:
+                result.transitions[(old_tier, new_tier)] += 1
+                changed_pks.setdefault(new_tier, []).append(pk)
+                stats_deltas[(project_id, status, old_tier)] -= 1
+                stats_deltas[(project_id, status, new_tier)] += 1
+
+        if changed_pks and not dry_run:
+            now = timezone.now()
+            with transaction.atomic():
+                for tier, tier_pks in changed_pks.items():
+                    model._default_manager.filter(pk__in=tier_pks).update(tier=tier, updated_at=now)
+                record_case_stats(stats_deltas)
+                invalidate_case_lists({project_id for project_id, status, tier in stats_deltas})
+
+        result.scanned += len(rows)
+        last_pk = pks[-1]
+
+    return result
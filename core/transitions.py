@@ -0,0 +1,176 @@
+"""
+Turnaround and throughput reports from the case status log.
+
+``CaseTransition`` gets a row for each new case and each status change,
+written by triggers on ``core_case`` (migration ``0027_case_transitions``)
+with the time the case spent in the status it left. A report is then one
+GROUP BY over the transitions of a period, read from an index holding the
+columns it aggregates, rather than a replay of each case's history.
+
+Cases created before the log start in their status at their last write,
+so the first time counted for them in that status may be short. The log
+keeps the transitions of deleted cases and projects.
+
+Trend charts read ``TransitionRollup`` instead: the number of transitions
+per day and per week, project, status and tier, kept in step with the log
+by triggers on ``core_casetransition`` (migration ``0028_transition_rollups``).
+A year of weeks is a few hundred rows, whatever the number of cases.
+"""
+from datetime import date, timedelta
+
+from django.db.models import Avg, Count, Max, Min, Sum
+from django.utils import timezone
+
+from .models import Case, CaseTransition, TransitionRollup
+
+# Dimensions a report can be split by, as CaseTransition lookups
+REPORT_GROUPS = {
+    'project': ('project', 'project__name'),
+    'lead': ('project__project_lead', 'project__project_lead__name'),
+}
+
+
+# Time series can also be split by tier
+TIMESERIES_GROUPS = {**REPORT_GROUPS, 'tier': ('tier',)}
+
+# Days shown by default in a time series
+TIMESERIES_DAYS = 364
+
+
+def get_transitions(since=None, until=None, projects=None):
+    """The transitions of the period ``[since, until)``, of some projects or all."""
+    transitions = CaseTransition.objects.order_by()
+    if since is not None:
+        transitions = transitions.filter(changed_at__gte=since)
+    if until is not None:
+        transitions = transitions.filter(changed_at__lt=until)
+    if projects is not None:
+        transitions = transitions.filter(project__in=projects)
+    return transitions
+
+
+def get_stage_durations(transitions, group_by=None):
+    """
+    Time cases spent in a status before moving to the next one: count,
+    average, shortest and longest per (status left, status entered), in
+    seconds, most frequent first.
+    """
+    columns = REPORT_GROUPS[group_by] if group_by else ()
+    rows = transitions.exclude(from_status='').values(*columns, 'from_status', 'to_status').annotate(
+        count=Count('*'),
+        average=Avg('time_in_previous'),
+        shortest=Min('time_in_previous'),
+        longest=Max('time_in_previous'),
+    )
+    status_display = dict(Case.STATUS_CHOICES)
+    return sorted((
+        {
+            **_group(row, columns),
+            'from_status': row['from_status'],
+            'from_status_display': status_display.get(row['from_status'], row['from_status']),
+            'to_status': row['to_status'],
+            'to_status_display': status_display.get(row['to_status'], row['to_status']),
+            'count': row['count'],
+            **{
+                name: None if row[name] is None else row[name].total_seconds()
+                for name in ('average', 'shortest', 'longest')
+            },
+        }
+        for row in rows
+    ), key=lambda stage: -stage['count'])
+
+
+def get_throughput(transitions, group_by=None):
+    """Cases that entered each status in the period, most first."""
+    columns = REPORT_GROUPS[group_by] if group_by else ()
+    rows = transitions.values(*columns, 'to_status').annotate(count=Count('*'))
+    status_display = dict(Case.STATUS_CHOICES)
+    return sorted((
+        {
+            **_group(row, columns),
+            'status': row['to_status'],
+            'status_display': status_display.get(row['to_status'], row['to_status']),
+            'count': row['count'],
+        }
+        for row in rows
+    ), key=lambda entry: -entry['count'])
+
+
+def get_bucket(day, period):
+    """The first day of the period holding ``day``; weeks start on Monday."""
+    if period == TransitionRollup.PERIOD_WEEK:
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def get_period(since=None, until=None):
+    """
+    The ``(since, until)`` dates of a time series: the last TIMESERIES_DAYS
+    up to ``until`` by default, and today as ``until``.
+    """
+    until = until or timezone.now().date()
+    # The default start cannot go back before the first day of the calendar
+    since = since or until - timedelta(days=min(TIMESERIES_DAYS, (until - date.min).days))
+    return since, until
+
+
+def count_buckets(since, until, period):
+    """Number of buckets from the one holding ``since`` to the one holding ``until``."""
+    days = (get_bucket(until, period) - get_bucket(since, period)).days
+    if days < 0:
+        return 0
+    return days // (7 if period == TransitionRollup.PERIOD_WEEK else 1) + 1
+
+
+def get_buckets(since, until, period):
+    """The buckets from the one holding ``since`` to the one holding ``until``."""
+    step = timedelta(days=7 if period == TransitionRollup.PERIOD_WEEK else 1)
+    first = get_bucket(since, period)
+    # Counted rather than stepped past ``until``, which may be the last day of the calendar
+    return [first + step * position for position in range(count_buckets(since, until, period))]
+
+
+def get_timeseries(period=TransitionRollup.PERIOD_WEEK, since=None, until=None, statuses=None,
+                   tier=None, projects=None, group_by=None):
+    """
+    Cases that entered each status per day or week from ``since`` to
+    ``until`` (dates, in UTC; the last TIMESERIES_DAYS by default), as
+    ``(buckets, series)``. Each series has a status, its group if split,
+    and one count per bucket.
+    """
+    buckets = get_buckets(*get_period(since, until), period)
+    if not buckets:
+        return [], []
+
+    rows = TransitionRollup.objects.filter(period=period, bucket__gte=buckets[0], bucket__lte=buckets[-1])
+    if statuses:
+        rows = rows.filter(status__in=statuses)
+    if tier:
+        rows = rows.filter(tier=tier)
+    if projects is not None:
+        rows = rows.filter(project__in=projects)
+    columns = TIMESERIES_GROUPS[group_by] if group_by else ()
+    rows = rows.values('bucket', 'status', *columns).annotate(count=Sum('count')).order_by()
+
+    status_display = dict(Case.STATUS_CHOICES)
+    positions = {bucket: position for position, bucket in enumerate(buckets)}
+    series = {}
+    for row in rows:
+        key = (row['status'],) + tuple(row[column] for column in columns)
+        if key not in series:
+            series[key] = {
+                'status': row['status'],
+                'status_display': status_display.get(row['status'], row['status']),
+                **_group(row, columns),
+                'counts': [0] * len(buckets),
+            }
+        series[key]['counts'][positions[row['bucket']]] += row['count']
+    return buckets, sorted(series.values(), key=lambda entry: -sum(entry['counts']))
+
+
+def _group(row, columns):
+    """The id and name of the project, lead or tier of a report row."""
+    if not columns:
+        return {}
+    group_id, group_name = columns[0], columns[-1]
+    return {'group': row[group_id], 'group_name': row[group_name]}
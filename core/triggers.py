@@ -0,0 +1,111 @@
+"""
+The SQLite triggers that keep derived tables in step with the LIMS tables.
+
+Four sets of triggers are created by migrations:
+- the full-text search tables (``0024_search_index``), on cases,
+  accessions and comments;
+- the change feed (``0026_change_feed``), on projects, cases, accessions
+  and comments;
+- the status log (``0027_case_transitions``, with the tier since
+  ``0028_transition_rollups``), on cases;
+- the status rollups (``0028_transition_rollups``), on the status log.
+
+SQLite rebuilds a table for most schema changes (a NOT NULL column, a
+constraint) and the rebuild drops the table's triggers without an error.
+The ``core.W001`` check lists the triggers that are missing, and
+``manage.py rebuild_triggers`` creates them again. A migration that
+rebuilds one of these tables runs ``drop_sqlite_triggers`` before its
+operations and ``create_sqlite_triggers`` after them.
+
+PostgreSQL keeps the triggers of an altered table, so this is SQLite only.
+"""
+import importlib
+import re
+
+from django.core.checks import Tags, Warning, register
+from django.db import connections
+from django.db.migrations.recorder import MigrationRecorder
+
+_search = importlib.import_module('core.migrations.0024_search_index')
+_changes = importlib.import_module('core.migrations.0026_change_feed')
+_transitions = importlib.import_module('core.migrations.0027_case_transitions')
+_rollups = importlib.import_module('core.migrations.0028_transition_rollups')
+
+_ROLLUP_DROP_STATEMENTS = [
+    'DROP TRIGGER IF EXISTS core_transitionrollup_insert',
+    'DROP TRIGGER IF EXISTS core_transitionrollup_delete',
+]
+
+
+def get_trigger_sets():
+    """
+    ``(name, migration, drop statements, create statements)`` of each set,
+    as its latest migration defines it. The search set recreates its tables
+    with their rows, so a rebuild also indexes the rows written without it.
+    """
+    return [
+        ('search', '0024_search_index', _search.sqlite_drop_statements(), _search.sqlite_create_statements()),
+        ('changes', '0026_change_feed', _changes.sqlite_drop_statements(), _changes.sqlite_create_statements()),
+        (
+            'transitions', '0028_transition_rollups',
+            _transitions.SQLITE_DROP_STATEMENTS + _ROLLUP_DROP_STATEMENTS, _rollups.sqlite_statements(),
+        ),
+    ]
+
+
+def get_applied_trigger_sets(connection):
+    """The sets whose migration is applied to the database."""
+    applied = {name for app, name in MigrationRecorder(connection).applied_migrations() if app == 'core'}
+    return [trigger_set for trigger_set in get_trigger_sets() if trigger_set[1] in applied]
+
+
+def get_missing_triggers(connection):
+    """``{set name: trigger names}`` of the applied sets that the SQLite database lacks."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        present = {row[0] for row in cursor.fetchall()}
+    missing = {}
+    for name, migration, drop, create in get_applied_trigger_sets(connection):
+        names = [trigger for trigger in _trigger_names(create) if trigger not in present]
+        if names:
+            missing[name] = names
+    return missing
+
+
+def drop_sqlite_triggers(apps, schema_editor):
+    """RunPython operation dropping every set, before a migration rebuilds their tables."""
+    if schema_editor.connection.vendor == 'sqlite':
+        for name, migration, drop, create in get_trigger_sets():
+            for statement in drop:
+                schema_editor.execute(statement)
+
+
+def create_sqlite_triggers(apps, schema_editor):
+    """RunPython operation creating every set again, after the rebuild."""
+    if schema_editor.connection.vendor == 'sqlite':
+        for name, migration, drop, create in get_trigger_sets():
+            for statement in drop + create:
+                schema_editor.execute(statement)
+
+
+def _trigger_names(statements):
+    return [match.group(1) for statement in statements for match in re.finditer(r'CREATE TRIGGER (\w+)', statement)]
+
+
+@register(Tags.database)
+def check_sqlite_triggers(app_configs, databases=None, **kwargs):
+    """Warn about the triggers dropped by a table rebuild; run by migrate and check --database."""
+    warnings = []
+    for alias in databases or ():
+        connection = connections[alias]
+        if connection.vendor != 'sqlite':
+            continue
+        missing = get_missing_triggers(connection)
+        if missing:
+            names = [trigger for triggers in missing.values() for trigger in triggers]
+            warnings.append(Warning(
+                f"Missing triggers in the '{alias}' database: {', '.join(names)}",
+                hint='A migration rebuilt their tables. Run manage.py rebuild_triggers.',
+                id='core.W001',
+            ))
+    return warnings
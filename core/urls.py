@@ -10,6 +10,7 @@ urlpatterns = [
     path('projects/create/', views.project_create, name='project_create'),
     path('projects/<int:project_id>/update/', views.project_update, name='project_update'),
     path('projects/<int:project_id>/delete/', views.project_delete, name='project_delete'),
+    path('projects/export-csv/', views.csv_projects_export, name='csv_projects_export'),
     
     # Case URLs
     path('cases/<int:case_id>/', views.case_detail, name='case_detail'),
@@ -31,4 +32,12 @@ urlpatterns = [
     path('users/batch-create/', views.batch_user_create, name='batch_user_create'),
     path('users/<int:user_id>/update/', views.user_update, name='user_update'),
     path('users/<int:user_id>/delete/', views.user_delete, name='user_delete'),
+    
+    # Search
+    path('search/', views.search, name='search'),
+    
+    # Background job URLs
+    path('jobs/', views.job_list, name='job_list'),
+    path('jobs/<int:job_id>/', views.job_detail, name='job_detail'),
+    path('jobs/<int:job_id>/credentials/', views.job_credentials, name='job_credentials'),
 ] 
\ No newline at end of file
@@ -1,19 +1,33 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required, permission_required
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.contrib import messages
 from django.utils.translation import gettext_lazy as _
-from django.db.models import Count
-from django.contrib.auth.models import User, Group
+from django.db.models import Count, Q
+from django.contrib.auth.models import User
+from django.utils.functional import SimpleLazyObject
 import csv
-from io import TextIOWrapper
+import io
 from datetime import datetime
 import string
 import random
 
-from .models import Project, Case, Accession, Comment, ProjectLead
+from .models import Project, Case, Job, ProjectLead
+from .importers import REQUIRED_HEADERS
+from .jobs import enqueue, pop_credentials
+from .exporters import stream_project_csv, stream_projects_zip
+from .fragments import CASE_FRAGMENT_TIMEOUT, get_case_list_version
+from .stats import annotate_cases_count, get_case_statistics
+from .pagination import InvalidCursor, KeysetPaginator, get_page_size
+from .instrumentation import query_budget
+from .search import SEARCH_MAX_LIMIT, search_cases
+from .roles import (
+    ROLE_BADGES, ROLE_EDITOR, ROLE_VIEWER, annotate_user_roles, assign_user_role, get_annotated_roles,
+    get_user_roles
+)
 from .forms import ProjectForm, CaseForm, CommentForm, AccessionFormSet, ProjectLeadForm, ProjectFilterForm, CaseFilterForm, BatchCaseForm, CSVImportForm, UserCreateForm, BatchUserCreateForm, UserUpdateForm
 
+@query_budget(8)
 @login_required
 def home(request):
     """
@@ -37,28 +51,19 @@ def home(request):
             projects = projects.filter(project_lead=project_lead)
     
     # Annotate with case count
-    projects = projects.annotate(cases_count=Count('cases'))
+    projects = annotate_cases_count(projects)
     
     # Statistics for all projects
     total_projects = Project.objects.count()
-    total_cases = Case.objects.count()
     
     # Projects by project lead
     projects_by_lead = Project.objects.values('project_lead__name').annotate(count=Count('id')).order_by('-count')
     
-    # Cases by status and tier
-    # Get status statistics with proper display names
-    cases_by_status_raw = Case.objects.values('status').annotate(count=Count('id')).order_by('-count')
-    cases_by_status = []
-    status_choices_dict = dict(Case.STATUS_CHOICES)
-    for stat in cases_by_status_raw:
-        cases_by_status.append({
-            'status': stat['status'],
-            'status_display': status_choices_dict.get(stat['status'], stat['status']),
-            'count': stat['count']
-        })
-    
-    cases_by_tier = Case.objects.values('tier').annotate(count=Count('id')).order_by('-count')
+    # Cases by status and tier, read from the statistics rollup
+    case_statistics = get_case_statistics()
+    total_cases = case_statistics['total_cases']
+    cases_by_status = case_statistics['cases_by_status']
+    cases_by_tier = case_statistics['cases_by_tier']
     
     return render(request, 'core/home.html', {
         'projects': projects,
@@ -70,6 +75,7 @@ def home(request):
         'filter_form': filter_form,
     })
 
+@query_budget(8)
 @login_required
 def project_detail(request, project_id):
     """
@@ -98,29 +104,34 @@ def project_detail(request, project_id):
         if case_tier:
             cases = cases.filter(tier=case_tier)
     
-    # Project statistics - always based on all cases
-    all_cases = project.cases.all()
-    total_cases = all_cases.count()
-    
-    # Get status statistics with proper display names
-    cases_by_status_raw = all_cases.values('status').annotate(count=Count('id'))
-    cases_by_status = []
-    status_choices_dict = dict(Case.STATUS_CHOICES)
-    for stat in cases_by_status_raw:
-        cases_by_status.append({
-            'status': stat['status'],
-            'status_display': status_choices_dict.get(stat['status'], stat['status']),
-            'count': stat['count']
-        })
+    # One page of cases, newest first, continuing after the cursor if any.
+    # Only fetched when the cached case list of this version is missing
+    paginator = KeysetPaginator(cases, get_page_size(request.GET.get('page_size')))
+    
+    def get_page():
+        try:
+            return paginator.get_page(request.GET.get('cursor'))
+        except InvalidCursor:
+            return paginator.get_page()
     
-    cases_by_tier = all_cases.values('tier').annotate(count=Count('id'))
+    page = SimpleLazyObject(get_page)
+    
+    # Project statistics - always based on all cases, read from the statistics rollup
+    case_statistics = get_case_statistics(project)
+    total_cases = case_statistics['total_cases']
+    cases_by_status = case_statistics['cases_by_status']
+    cases_by_tier = case_statistics['cases_by_tier']
     
     # Check if user is part of the 'editor' group for editing permissions
-    can_edit = request.user.groups.filter(name='editor').exists() or request.user.is_superuser
+    can_edit = get_user_roles(request.user).can_edit
     
     return render(request, 'core/project_detail.html', {
         'project': project,
-        'cases': cases,
+        'cases': page,
+        'page': page,
+        'results_count': cases.count,
+        'case_list_version': get_case_list_version(project.id),
+        'case_fragment_timeout': CASE_FRAGMENT_TIMEOUT,
         'total_cases': total_cases,
         'cases_by_status': cases_by_status,
         'cases_by_tier': cases_by_tier,
@@ -128,17 +139,18 @@ def project_detail(request, project_id):
         'filter_form': filter_form,
     })
 
+@query_budget(6)
 @login_required
 def case_detail(request, case_id):
     """
     View for showing case details
     """
-    case = get_object_or_404(Case, id=case_id)
-    comments = case.comments.all().order_by('-created_at')
+    case = get_object_or_404(Case.objects.select_related('project'), id=case_id)
+    comments = case.comments.select_related('user').order_by('-created_at')
     accessions = case.accessions.all()
     
     # Check if user is part of the 'editor' group for editing permissions
-    can_edit = request.user.groups.filter(name='editor').exists() or request.user.is_superuser
+    can_edit = get_user_roles(request.user).can_edit
     
     # Initialize forms
     comment_form = None
@@ -258,11 +270,9 @@ def case_create(request, project_id):
     project = get_object_or_404(Project, id=project_id)
     
     if request.method == 'POST':
-        form = CaseForm(request.POST)
+        form = CaseForm(request.POST, instance=Case(project=project))
         if form.is_valid():
-            case = form.save(commit=False)
-            case.project = project
-            case.save()
+            case = form.save()
             messages.success(request, _('Case created successfully!'))
             return redirect('case_detail', case_id=case.id)
     else:
@@ -293,44 +303,24 @@ def batch_case_create(request, project_id):
             dna_t_coverage = form.cleaned_data['dna_t_coverage']
             dna_n_coverage = form.cleaned_data['dna_n_coverage']
             
-            cases_created = 0
-            
-            # Create cases with numbers from min to max (inclusive)
-            for i in range(min_case_number, max_case_number + 1):
-                case_name = f"{batch_name}-{i}"
-                
-                # Check if a case with this name already exists in the project
-                if Case.objects.filter(project=project, name=case_name).exists():
-                    continue
-                
-                case = Case(
-                    project=project,
-                    name=case_name,
-                    status=status,
-                    rna_coverage=rna_coverage,
-                    dna_t_coverage=dna_t_coverage,
-                    dna_n_coverage=dna_n_coverage
-                )
-                case.save()
-                cases_created += 1
-            
-            if cases_created > 0:
-                messages.success(
-                    request, 
-                    _('Successfully created {count} cases in batch "{batch}" (from {min} to {max})!').format(
-                        count=cases_created, 
-                        batch=batch_name,
-                        min=min_case_number,
-                        max=max_case_number
-                    )
-                )
-            else:
-                messages.warning(
-                    request, 
-                    _('No new cases were created. Cases with these names may already exist.')
+            # Cases with numbers from min to max (inclusive) are created by
+            # a background job; names already taken in the project are skipped
+            job = enqueue('batch_case_create', request.user, project=project, params={
+                'batch_name': batch_name,
+                'min_case_number': min_case_number,
+                'max_case_number': max_case_number,
+                'status': status,
+                'rna_coverage': rna_coverage,
+                'dna_t_coverage': dna_t_coverage,
+                'dna_n_coverage': dna_n_coverage,
+            })
+            messages.info(
+                request,
+                _('Creating cases {min} to {max} of batch "{batch}" in the background.').format(
+                    batch=batch_name, min=min_case_number, max=max_case_number
                 )
-                
-            return redirect('project_detail', project_id=project.id)
+            )
+            return redirect('job_detail', job_id=job.id)
     else:
         form = BatchCaseForm()
     
@@ -463,113 +453,24 @@ def csv_case_import(request, project_id):
             
             # Process the file
             try:
-                # Read the CSV file
-                csv_data = TextIOWrapper(csv_file.file, encoding='utf-8')
-                reader = csv.DictReader(csv_data)
-                
-                # Validate CSV headers
-                required_headers = ['CaseID', 'Other_ID', 'Status', 'DNAT', 'DNAN', 'RNA']
-                optional_headers = ['source_other_comments']
-                csv_headers = reader.fieldnames
-                
-                if not all(header in csv_headers for header in required_headers):
-                    messages.error(
-                        request, 
-                        _('CSV file is missing required headers. Please use the template.')
-                    )
-                    return redirect('csv_case_import', project_id=project.id)
-                
-                # Track counts
-                created_count = 0
-                updated_count = 0
-                error_rows = []
-                
-                # Map CSV status to model status
-                # Accept both lowercase (from export) and display values (legacy)
-                status_mapping = {}
-                for status_value, status_display in Case.STATUS_CHOICES:
-                    status_mapping[status_display] = status_value  # Accept display values (e.g., "Completed")
-                    status_mapping[status_value] = status_value    # Accept storage values (e.g., "completed")
-                
-                # Process each row
-                for row_num, row in enumerate(reader, start=2):  # Start at 2 to account for header row
-                    case_id = row['CaseID'].strip()
-                    
-                    # Skip empty rows
-                    if not case_id:
-                        continue
-                    
-                    # Get Other_ID (optional field)
-                    other_id = row['Other_ID'].strip() if row['Other_ID'].strip() else None
-                    
-                    # Get source_other_comments (optional field)
-                    source_comment = row.get('source_other_comments', '').strip() if 'source_other_comments' in row else None
-                    
-                    # Map CSV status to model status
-                    status = row['Status'].strip()
-                    if status not in status_mapping:
-                        error_rows.append(f"Row {row_num}: Invalid status '{status}'")
-                        continue
-                    
-                    # Parse coverage values
-                    try:
-                        dna_t = float(row['DNAT']) if row['DNAT'].strip() else None
-                        dna_n = float(row['DNAN']) if row['DNAN'].strip() else None
-                        rna = float(row['RNA']) if row['RNA'].strip() else None
-                    except ValueError:
-                        error_rows.append(f"Row {row_num}: Invalid numeric values")
-                        continue
-                    
-                    # Check if case exists
-                    case, created = Case.objects.get_or_create(
-                        project=project,
-                        name=case_id,
-                        defaults={
-                            'other_id': other_id,
-                            'status': status_mapping[status],
-                            'dna_t_coverage': dna_t,
-                            'dna_n_coverage': dna_n,
-                            'rna_coverage': rna
-                        }
-                    )
-                    
-                    if created:
-                        created_count += 1
-                    else:
-                        # Update existing case
-                        case.other_id = other_id
-                        case.status = status_mapping[status]
-                        case.dna_t_coverage = dna_t
-                        case.dna_n_coverage = dna_n
-                        case.rna_coverage = rna
-                        case.save()
-                        updated_count += 1
-                    
-                    # Add comment if source_other_comments is provided
-                    if source_comment:
-                        # Store only the comment text, timestamp and user info are handled by the model
-                        Comment.objects.create(
-                            case=case,
-                            text=source_comment,
-                            user=request.user
-                        )
-                
-                # Show success message with counts
-                if error_rows:
-                    messages.warning(
-                        request, 
-                        _('Import completed with some errors: {}').format(', '.join(error_rows))
-                    )
-                
-                messages.success(
-                    request,
-                    _('CSV import complete! Created: {}, Updated: {}').format(created_count, updated_count)
+                csv_text = csv_file.read().decode('utf-8-sig')
+            except UnicodeDecodeError:
+                messages.error(request, _('Error processing CSV file: {}').format(_('the file is not UTF-8 text')))
+                return redirect('csv_case_import', project_id=project.id)
+            
+            # Validate CSV headers
+            csv_headers = csv.DictReader(io.StringIO(csv_text)).fieldnames or []
+            if not all(header in csv_headers for header in REQUIRED_HEADERS):
+                messages.error(
+                    request, 
+                    _('CSV file is missing required headers. Please use the template.')
                 )
-                return redirect('project_detail', project_id=project.id)
-                
-            except Exception as e:
-                messages.error(request, _('Error processing CSV file: {}').format(str(e)))
                 return redirect('csv_case_import', project_id=project.id)
+            
+            # Cases are created and updated by a background job
+            job = enqueue('csv_case_import', request.user, project=project, input_text=csv_text)
+            messages.info(request, _('Importing {} in the background.').format(csv_file.name))
+            return redirect('job_detail', job_id=job.id)
     else:
         form = CSVImportForm()
     
@@ -578,30 +479,34 @@ def csv_case_import(request, project_id):
         'project': project,
     })
 
+@query_budget(5)
 @login_required
 def csv_case_export(request, project_id):
     """
-    Export all cases of a project to CSV
+    Export all cases of a project to CSV, streamed row by row
     """
     project = get_object_or_404(Project, id=project_id)
     
-    # Create the HttpResponse object with the appropriate CSV header.
-    response = HttpResponse(content_type='text/csv')
+    response = StreamingHttpResponse(stream_project_csv(project), content_type='text/csv')
     response['Content-Disposition'] = f'attachment; filename="cases_{project.name}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv"'
     
-    writer = csv.writer(response)
-    writer.writerow(['CaseID', 'Other_ID', 'Status', 'DNAT', 'DNAN', 'RNA', 'Tier'])
+    return response
+
+@login_required
+def csv_projects_export(request):
+    """
+    Export the cases of several projects as a zip of CSV files, one per project.
+    Projects are selected with repeated ?project=<id> parameters; all projects
+    are exported when none is given.
+    """
+    projects = Project.objects.order_by('name')
+    
+    project_ids = [project_id for project_id in request.GET.getlist('project') if project_id.isdigit()]
+    if project_ids:
+        projects = projects.filter(id__in=project_ids)
     
-    for case in project.cases.all():
-        writer.writerow([
-            case.name,
-            case.other_id or '',
-            case.status,
-            case.dna_t_coverage or '',
-            case.dna_n_coverage or '',
-            case.rna_coverage or '',
-            case.tier
-        ])
+    response = StreamingHttpResponse(stream_projects_zip(projects), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="cases_{datetime.now().strftime("%Y%m%d_%H%M%S")}.zip"'
     
     return response
 
@@ -612,24 +517,7 @@ def _generate_password(length=12):
     chars = string.ascii_letters + string.digits
     return ''.join(random.choices(chars, k=length))
 
-def _assign_user_role(user, role):
-    """Assign role to user by adding to appropriate group."""
-    # Clear existing groups
-    user.groups.clear()
-    
-    if role == 'admin':
-        user.is_superuser = True
-        user.is_staff = True
-        user.save()
-    else:
-        user.is_superuser = False
-        user.is_staff = False
-        user.save()
-        
-        # Add to appropriate group
-        group, created = Group.objects.get_or_create(name=role)
-        user.groups.add(group)
-
+@query_budget(6)
 @login_required
 def user_list(request):
     """
@@ -639,40 +527,47 @@ def user_list(request):
         messages.error(request, _('You do not have permission to access user management.'))
         return redirect('home')
     
-    users = User.objects.all().order_by('username')
+    # Server-side search on username, names and email
+    search = request.GET.get('q', '').strip()
+    search_filter = Q()
+    if search:
+        search_filter = (
+            Q(username__icontains=search) | Q(first_name__icontains=search) |
+            Q(last_name__icontains=search) | Q(email__icontains=search)
+        )
+    
+    # One page of users, with their role groups flagged in the same query
+    users = annotate_user_roles(User.objects.filter(search_filter))
+    paginator = KeysetPaginator(users, get_page_size(request.GET.get('page_size')), ordering=('username',))
+    try:
+        page = paginator.get_page(request.GET.get('cursor'))
+    except InvalidCursor:
+        page = paginator.get_page()
     
     # Add role information to each user
     users_with_roles = []
-    for user in users:
-        if user.is_superuser:
-            role = 'Admin'
-            role_class = 'danger'
-        elif user.groups.filter(name='editor').exists():
-            role = 'Editor'
-            role_class = 'success'
-        elif user.groups.filter(name='viewer').exists():
-            role = 'Viewer'
-            role_class = 'primary'
-        else:
-            role = 'No Role'
-            role_class = 'secondary'
-        
+    for user in page:
+        role, role_class = ROLE_BADGES[get_annotated_roles(user).role]
         users_with_roles.append({
             'user': user,
             'role': role,
             'role_class': role_class
         })
     
-    # Calculate statistics
-    total_admins = User.objects.filter(is_superuser=True).count()
-    total_editors = User.objects.filter(groups__name='editor').count()
-    total_viewers = User.objects.filter(groups__name='viewer').count()
+    # Calculate statistics (one query)
+    totals = User.objects.aggregate(
+        total_users=Count('pk', distinct=True),
+        matching_users=Count('pk', filter=search_filter, distinct=True),
+        total_admins=Count('pk', filter=Q(is_superuser=True), distinct=True),
+        total_editors=Count('pk', filter=Q(groups__name=ROLE_EDITOR), distinct=True),
+        total_viewers=Count('pk', filter=Q(groups__name=ROLE_VIEWER), distinct=True),
+    )
     
     return render(request, 'core/user_list.html', {
         'users_with_roles': users_with_roles,
-        'total_admins': total_admins,
-        'total_editors': total_editors,
-        'total_viewers': total_viewers,
+        'page': page,
+        'search': search,
+        **totals,
     })
 
 @login_required
@@ -702,7 +597,7 @@ def user_create(request):
             
             # Assign role
             role = form.cleaned_data['role']
-            _assign_user_role(user, role)
+            assign_user_role(user, role)
             
             # Store credentials for display
             credentials = f"{user.username}:{password}"
@@ -736,46 +631,16 @@ def batch_user_create(request):
             users_data = form.cleaned_data['users_data']
             role = form.cleaned_data['role']
             
-            created_users = []
-            credentials = []
-            
-            for user_data in users_data:
-                # Create user
-                user = User(
-                    username=user_data['username'],
-                    first_name=user_data['first_name'],
-                    last_name=user_data['last_name'],
-                    email=''  # Email is optional
-                )
-                
-                # Generate password
-                password = _generate_password()
-                user.set_password(password)
-                user.save()
-                
-                # Assign role
-                _assign_user_role(user, role)
-                
-                created_users.append(user)
-                credentials.append(f"{user.username}:{password}")
-            
-            # Create downloadable credentials file
-            response = HttpResponse(content_type='text/plain')
-            response['Content-Disposition'] = f'attachment; filename="user_credentials_{datetime.now().strftime("%Y%m%d_%H%M%S")}.txt"'
-            
-            response.write("# User Credentials - TerryFox LIMS\n")
-            response.write(f"# Created on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            response.write(f"# Total users created: {len(created_users)}\n")
-            response.write("# Format: username:password\n\n")
-            
-            for credential in credentials:
-                response.write(credential + '\n')
+            # Hashing the passwords takes about half a second per user, so
+            # the users are created by a background job. It generates their
+            # passwords, and the credentials file is downloaded from its page
+            job = enqueue('batch_user_create', request.user, params={'role': role, 'users': users_data})
             
             messages.success(request, _(
-                '{} users created successfully! Credentials file will be downloaded automatically.'
-            ).format(len(created_users)))
+                '{} users are being created in the background (job #{}). Download their credentials file from this page once the job ends.'
+            ).format(len(users_data), job.id))
             
-            return response
+            return redirect('job_detail', job_id=job.id)
     else:
         form = BatchUserCreateForm()
     
@@ -808,6 +673,7 @@ def user_delete(request, user_id):
     
     return render(request, 'core/user_delete.html', {
         'user_to_delete': user_to_delete,
+        'user_to_delete_roles': get_user_roles(user_to_delete),
     })
 
 @login_required
@@ -835,7 +701,7 @@ def user_update(request, user_id):
             
             # Update role
             role = form.cleaned_data['role']
-            _assign_user_role(user, role)
+            assign_user_role(user, role)
             
             # Reset password if requested
             new_password = None
@@ -859,19 +725,8 @@ def user_update(request, user_id):
     else:
         form = UserUpdateForm(instance=user_to_update)
     
-    # Get current role information from database
-    if user_to_update.is_superuser:
-        current_role = 'Admin'
-        current_role_class = 'danger'
-    elif user_to_update.groups.filter(name='editor').exists():
-        current_role = 'Editor'
-        current_role_class = 'success'
-    elif user_to_update.groups.filter(name='viewer').exists():
-        current_role = 'Viewer'
-        current_role_class = 'primary'
-    else:
-        current_role = 'No Role'
-        current_role_class = 'secondary'
+    # Get current role information
+    current_role, current_role_class = ROLE_BADGES[get_user_roles(user_to_update).role]
     
     return render(request, 'core/user_update.html', {
         'form': form,
@@ -880,3 +735,84 @@ def user_update(request, user_id):
         'current_role_class': current_role_class,
         'title': _('Update User'),
     })
+
+# Up to two queries per source and kind of match, and the cases found
+@query_budget(16)
+@login_required
+def search(request):
+    """
+    View for searching cases by name, other ID, accession number or comment words
+    """
+    query = request.GET.get('q', '').strip()
+    hits = search_cases(query, SEARCH_MAX_LIMIT) if query else []
+    
+    return render(request, 'core/search.html', {
+        'query': query,
+        'hits': hits,
+        'limit': SEARCH_MAX_LIMIT,
+    })
+
+def _visible_jobs(user):
+    """Jobs a user may follow: their own, or all of them for an admin."""
+    jobs = Job.objects.select_related('project', 'created_by')
+    if user.is_superuser:
+        return jobs
+    return jobs.filter(created_by=user)
+
+@login_required
+def job_list(request):
+    """
+    View for listing the background jobs of the user, newest first
+    """
+    jobs = _visible_jobs(request.user).defer('input_text', 'params')
+    paginator = KeysetPaginator(jobs, get_page_size(request.GET.get('page_size')))
+    try:
+        page = paginator.get_page(request.GET.get('cursor'))
+    except InvalidCursor:
+        page = paginator.get_page()
+    
+    return render(request, 'core/job_list.html', {
+        'jobs': page,
+        'page': page,
+        'running': any(not job.is_finished for job in page),
+    })
+
+@login_required
+def job_detail(request, job_id):
+    """
+    View for following the progress and result of a background job
+    """
+    job = get_object_or_404(_visible_jobs(request.user).defer('input_text', 'params'), id=job_id)
+    # Only the creator of a batch user job may download the credentials
+    credentials_pending = (
+        job.kind == 'batch_user_create' and job.is_finished and job.created_by_id == request.user.id
+        and Job.objects.filter(pk=job.pk, params__has_key='credentials').exists()
+    )
+    return render(request, 'core/job_detail.html', {'job': job, 'credentials_pending': credentials_pending})
+
+@login_required
+def job_credentials(request, job_id):
+    """
+    Download, once, the credentials file of the users a batch user job created
+    """
+    job = get_object_or_404(Job, id=job_id, kind='batch_user_create', created_by=request.user)
+    if request.method != 'POST' or not job.is_finished:
+        return redirect('job_detail', job_id=job.id)
+    
+    credentials = pop_credentials(job.id)
+    if credentials is None:
+        messages.error(request, _('The credentials of this job were already downloaded or have expired.'))
+        return redirect('job_detail', job_id=job.id)
+    
+    response = HttpResponse(content_type='text/plain')
+    response['Content-Disposition'] = f'attachment; filename="user_credentials_{datetime.now().strftime("%Y%m%d_%H%M%S")}.txt"'
+    
+    response.write("# User Credentials - TerryFox LIMS\n")
+    response.write(f"# Created on: {job.finished_at.strftime('%Y-%m-%d %H:%M:%S')}\n")
+    response.write(f"# Total users: {len(credentials)} (creation job #{job.id})\n")
+    response.write("# Format: username:password\n\n")
+    
+    for username, password in credentials:
+        response.write(f"{username}:{password}\n")
+    
+    return response
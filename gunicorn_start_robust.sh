@@ -62,6 +62,12 @@ fi
 echo "=== COLLECTE DES FICHIERS STATIQUES ==="
 python manage.py collectstatic --noinput --settings=terryfox_lims.settings_prod
 
+# Démarrage du traitement des tâches de fond (imports CSV, créations en lot)
+echo "=== DÉMARRAGE DU RUNNER DE TÂCHES ==="
+pkill -f "manage.py run_jobs" || true
+nohup python manage.py run_jobs --workers=2 --settings=terryfox_lims.settings_prod \
+  >> /var/log/terryfox-lims/jobs.log 2>&1 &
+
 # Démarrage de Gunicorn avec SSL
 echo "=== DÉMARRAGE DE GUNICORN ==="
 echo "Lancement de Gunicorn avec SSL sur 0.0.0.0:443..."
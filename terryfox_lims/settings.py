@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 
 from pathlib import Path
 import os
+from decouple import config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -48,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.instrumentation.SQLInstrumentationMiddleware',  # SQL counts, Server-Timing, query budgets
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -70,6 +72,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.context_processors.user_roles',
             ],
         },
     },
@@ -80,11 +83,51 @@ WSGI_APPLICATION = 'terryfox_lims.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
+# SQLite by default; DB_ENGINE=postgresql selects PostgreSQL (docs/POSTGRESQL.md)
+DB_ENGINE = config('DB_ENGINE', default='sqlite')
+
+if DB_ENGINE == 'postgresql':
+    # With DB_POOL each gunicorn worker keeps a psycopg connection pool;
+    # otherwise connections are kept open for DB_CONN_MAX_AGE seconds
+    DB_POOL = config('DB_POOL', default=False, cast=bool)
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DB_NAME', default='terryfox_lims'),
+            'USER': config('DB_USER', default='terryfox'),
+            'PASSWORD': config('DB_PASSWORD', default=''),
+            'HOST': config('DB_HOST', default='localhost'),
+            'PORT': config('DB_PORT', default='5432'),
+            'CONN_MAX_AGE': 0 if DB_POOL else config('DB_CONN_MAX_AGE', default=60, cast=int),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+                    'max_size': config('DB_POOL_MAX_SIZE', default=4, cast=int),
+                },
+            } if DB_POOL else {},
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                # Writers take the lock at BEGIN and wait for it (core/sqlite.py
+                # also enables WAL and sets busy_timeout on every connection)
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
+    }
 
-DATABASES = {
+# Cache
+# Holds user roles (core/roles.py) and rendered case lists (core/fragments.py);
+# a single development process can use memory
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
@@ -136,6 +179,42 @@ LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'
 LOGOUT_REDIRECT_URL = 'login'
 
+# Page size of case, comment, accession and project lists (HTML and API);
+# clients may ask for up to MAX_LIST_PAGE_SIZE rows with ?page_size=
+LIST_PAGE_SIZE = 50
+MAX_LIST_PAGE_SIZE = 500
+
+# SQL instrumentation (core/instrumentation.py): one JSON line per request in
+# logs/sql.log; with QUERY_BUDGET_STRICT a view over its @query_budget fails
+QUERY_BUDGET_STRICT = False
+
+# Checkouts without a logs/ directory do not write the SQL log, and neither
+# do test runs (core.test_runner)
+SQL_LOG_FILE = BASE_DIR / 'logs' / 'sql.log'
+SQL_LOG_ENABLED = SQL_LOG_FILE.parent.is_dir()
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'sql_file': {
+            'class': 'logging.FileHandler',
+            'filename': SQL_LOG_FILE,
+            'delay': True,
+        } if SQL_LOG_ENABLED else {
+            'class': 'logging.NullHandler',
+        },
+    },
+    'loggers': {
+        'core.sql': {
+            'handlers': ['sql_file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 # Crispy Forms
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
@@ -53,6 +53,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.instrumentation.SQLInstrumentationMiddleware',  # SQL counts, Server-Timing, query budgets
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Added for static file handling
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -76,6 +77,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.context_processors.user_roles',
             ],
         },
     },
@@ -84,13 +86,68 @@ TEMPLATES = [
 WSGI_APPLICATION = 'terryfox_lims.wsgi_prod.application'
 
 # Database
-# Using SQLite for now (can be changed to PostgreSQL if needed)
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite by default; DB_ENGINE=postgresql selects PostgreSQL (docs/POSTGRESQL.md)
+DB_ENGINE = config('DB_ENGINE', default='sqlite')
+
+if DB_ENGINE == 'postgresql':
+    # With DB_POOL each gunicorn worker keeps a psycopg connection pool;
+    # otherwise connections are kept open for DB_CONN_MAX_AGE seconds
+    DB_POOL = config('DB_POOL', default=False, cast=bool)
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DB_NAME', default='terryfox_lims'),
+            'USER': config('DB_USER', default='terryfox'),
+            'PASSWORD': config('DB_PASSWORD', default=''),
+            'HOST': config('DB_HOST', default='localhost'),
+            'PORT': config('DB_PORT', default='5432'),
+            'CONN_MAX_AGE': 0 if DB_POOL else config('DB_CONN_MAX_AGE', default=60, cast=int),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+                    'max_size': config('DB_POOL_MAX_SIZE', default=4, cast=int),
+                },
+            } if DB_POOL else {},
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                # Writers take the lock at BEGIN and wait for it (core/sqlite.py
+                # also enables WAL and sets busy_timeout on every connection)
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
+    }
+
+# Cache
+# Shared by all gunicorn workers, so a role change or a new case list version
+# seen by one is seen by all. Redis when REDIS_URL is set (pip install redis),
+# otherwise files under CACHE_DIR; rendered case cards need more than the
+# default 300 entries
+REDIS_URL = config('REDIS_URL', default='')
+CACHE_DIR = config('CACHE_DIR', default=str(BASE_DIR / 'cache'))
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_DIR,
+            'OPTIONS': {
+                'MAX_ENTRIES': 5000,
+            },
+        }
     }
-}
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -130,6 +187,37 @@ LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'
 LOGOUT_REDIRECT_URL = 'login'
 
+# SQL instrumentation (core/instrumentation.py): one JSON line per request in
+# logs/sql.log; with QUERY_BUDGET_STRICT a view over its @query_budget fails
+QUERY_BUDGET_STRICT = False
+
+# Checkouts without a logs/ directory do not write the SQL log, and neither
+# do test runs (core.test_runner)
+SQL_LOG_FILE = BASE_DIR / 'logs' / 'sql.log'
+SQL_LOG_ENABLED = SQL_LOG_FILE.parent.is_dir()
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'sql_file': {
+            'class': 'logging.FileHandler',
+            'filename': SQL_LOG_FILE,
+            'delay': True,
+        } if SQL_LOG_ENABLED else {
+            'class': 'logging.NullHandler',
+        },
+    },
+    'loggers': {
+        'core.sql': {
+            'handlers': ['sql_file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 # Crispy Forms
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
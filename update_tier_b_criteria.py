@@ -11,6 +11,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'terryfox_lims.settings')
 django.setup()
 
 from core.models import Case
+from core.tiers import retier_cases
 
 def update_tier_b_criteria():
     """Met à jour tous les cases avec les nouveaux critères Tier B."""
@@ -19,34 +20,16 @@ def update_tier_b_criteria():
     print("Nouveau critère ajouté: DNA(T) >= 80X, DNA(N) >= 30X, pas de valeur RNA = Tier B")
     print()
     
-    # Recalculer tous les tiers
-    cases_to_update = []
+    # Recalculer tous les tiers par lots (seuls les tiers modifiés sont écrits)
+    result = retier_cases(Case.objects.all())
     
-    for case in Case.objects.all():
-        old_tier = case.tier
-        # Forcer le recalcul en sauvegardant (cela utilisera la nouvelle logique)
-        case.save()
-        new_tier = case.tier
-        
-        if old_tier != new_tier:
-            cases_to_update.append({
-                'case': case,
-                'old_tier': old_tier,
-                'new_tier': new_tier
-            })
+    print(f"Cases mis à jour: {result.changed}")
     
-    print(f"Cases mis à jour: {len(cases_to_update)}")
-    
-    if cases_to_update:
+    if result.transitions:
         print("\nDétails des changements:")
         print("-" * 80)
-        for update in cases_to_update[:10]:  # Afficher les 10 premiers
-            case = update['case']
-            print(f"{case.name:20} | {update['old_tier']:4} -> {update['new_tier']:4} | "
-                  f"DNA(T)={case.dna_t_coverage}, DNA(N)={case.dna_n_coverage}, RNA={case.rna_coverage}")
-        
-        if len(cases_to_update) > 10:
-            print(f"... et {len(cases_to_update) - 10} autres cases")
+        for (old_tier, new_tier), count in sorted(result.transitions.items()):
+            print(f"{old_tier:4} -> {new_tier:4} | {count} cases")
     
     # Statistiques finales
     print("\n=== Statistiques finales ===")